@@ -1,11 +1,24 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import os
+import uuid
+import time
+import datetime
 from utils.calculator import ProductRatingCalculator
 from utils.data_processor import MPStatsDataProcessor
-from utils.visualizations import create_radar_chart, create_metrics_bar_chart
+from utils.memory_manager import DataFrameMemoryManager
+from utils.jobs import AnalysisJobManager, FINISHED_STATUSES, STATUS_FAILED, STATUS_CANCELLED
+from utils.history_store import NicheHistoryStore, METRIC_COLUMNS
+from utils.anomaly_detector import detect_against_history
+from utils.weight_fitting import load_weights_config
+from utils.visualizations import create_radar_chart, create_metrics_bar_chart, create_trend_chart
+from utils import instrumentation
 from data.sample_data import get_sample_data
 
+# Интервал автообновления прогресса фоновой задачи анализа (секунды)
+JOB_REFRESH_SECONDS = 1.0
+
 # Конфигурация страницы
 st.set_page_config(
     page_title="Анализатор ниш MPStats",
@@ -23,6 +36,29 @@ def init_calculator():
 def init_data_processor():
     return MPStatsDataProcessor()
 
+@st.cache_resource
+def init_memory_manager():
+    # Лимиты памяти задаются переменными окружения (в мегабайтах)
+    return DataFrameMemoryManager(
+        session_limit_bytes=int(os.environ.get('MPSTATS_SESSION_MEMORY_MB', 512)) * 1024 ** 2,
+        global_limit_bytes=int(os.environ.get('MPSTATS_GLOBAL_MEMORY_MB', 2048)) * 1024 ** 2,
+        spill_dir=os.environ.get('MPSTATS_SPILL_DIR')
+    )
+
+@st.cache_resource
+def init_job_manager():
+    return AnalysisJobManager(init_data_processor(), memory_manager=init_memory_manager())
+
+@st.cache_resource
+def init_history_store():
+    return NicheHistoryStore(os.environ.get('MPSTATS_HISTORY_DB'))
+
+def get_session_id():
+    """Идентификатор текущей сессии пользователя"""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
 def main():
     """Основная функция приложения"""
     
@@ -55,11 +91,15 @@ def setup_sidebar(calculator):
     
     # Веса для метрик
     st.sidebar.subheader("Веса метрик (%)")
+    # Значения слайдеров хранятся в session_state: их может заменить загруженный файл весов
+    for key, value in {'demand': 30, 'revenue': 25, 'ads': 25, 'organic': 20}.items():
+        st.session_state.setdefault(f'weight_{key}', value)
+    load_weights_file()
     weights = {}
-    weights['demand'] = st.sidebar.slider("Соотношение запросов/товары", 0, 100, 30)
-    weights['revenue'] = st.sidebar.slider("Объем выручки", 0, 100, 25)
-    weights['ads'] = st.sidebar.slider("Эффективность рекламы", 0, 100, 25)
-    weights['organic'] = st.sidebar.slider("Процент органики", 0, 100, 20)
+    weights['demand'] = st.sidebar.slider("Соотношение запросов/товары", 0, 100, key='weight_demand')
+    weights['revenue'] = st.sidebar.slider("Объем выручки", 0, 100, key='weight_revenue')
+    weights['ads'] = st.sidebar.slider("Эффективность рекламы", 0, 100, key='weight_ads')
+    weights['organic'] = st.sidebar.slider("Процент органики", 0, 100, key='weight_organic')
     
     # Проверка суммы весов
     total_weight = sum(weights.values())
@@ -87,11 +127,129 @@ def setup_sidebar(calculator):
     
     calculator.update_thresholds(thresholds)
     
+    display_memory_usage()
+    display_instrumentation_panel()
+    
     # Информация о версии
     st.sidebar.markdown("---")
     st.sidebar.markdown("**Версия:** MVP 1.0")
     st.sidebar.markdown("**Автор:** AI Assistant")
 
+def load_weights_file():
+    """Загрузка весов, подобранных по исходам (python -m utils.weight_fitting), в слайдеры"""
+    uploaded = st.sidebar.file_uploader(
+        "Файл весов (JSON)",
+        type=['json'],
+        help="Результат python -m utils.weight_fitting"
+    )
+    if uploaded is None:
+        return
+    
+    # Значения подставляются один раз на файл, дальше слайдеры можно двигать вручную
+    file_key = (uploaded.name, uploaded.size)
+    if st.session_state.get('weights_file') == file_key:
+        return
+    
+    try:
+        weights = load_weights_config(uploaded)
+    except ValueError as e:
+        st.sidebar.error(f"❌ {str(e)}")
+        return
+    
+    for key, value in weights.items():
+        st.session_state[f'weight_{key}'] = int(round(value))
+    st.session_state['weights_file'] = file_key
+
+def display_memory_usage():
+    """Отображение занятой данными памяти в боковой панели"""
+    memory_manager = init_memory_manager()
+    session_usage = memory_manager.usage(get_session_id())
+    global_usage = memory_manager.usage()
+    
+    st.sidebar.subheader("Память")
+    st.sidebar.progress(
+        min(session_usage['memory_bytes'] / session_usage['limit_bytes'], 1.0),
+        text=f"Сессия: {session_usage['memory_bytes'] / 1024 ** 2:,.1f} из "
+             f"{session_usage['limit_bytes'] / 1024 ** 2:,.0f} МБ"
+    )
+    st.sidebar.progress(
+        min(global_usage['memory_bytes'] / global_usage['limit_bytes'], 1.0),
+        text=f"Всего: {global_usage['memory_bytes'] / 1024 ** 2:,.1f} из "
+             f"{global_usage['limit_bytes'] / 1024 ** 2:,.0f} МБ"
+    )
+    if session_usage['spilled_frames']:
+        st.sidebar.caption(
+            f"Выгружено на диск: {session_usage['spilled_frames']} табл., "
+            f"{session_usage['spilled_bytes'] / 1024 ** 2:,.1f} МБ"
+        )
+
+def display_instrumentation_panel():
+    """Панель отладки производительности: замеры этапов обработки"""
+    # Сбор замеров общий для процесса и включается только на сервере (MPSTATS_INSTRUMENTATION=1);
+    # флажок лишь показывает панель в этой сессии и не влияет на другие
+    shown = st.sidebar.checkbox(
+        "🐞 Отладка производительности",
+        key='instrumentation_panel',
+        help="Время и количество строк по этапам: чтение, извлечение метрик, расчет, диаграммы"
+    )
+    if not shown:
+        return
+    
+    if not instrumentation.is_enabled():
+        st.sidebar.caption("Сбор замеров выключен. Запустите приложение с MPSTATS_INSTRUMENTATION=1")
+        return
+    
+    # "Сбросить" запоминает точку отсчета сессии, не очищая общие замеры
+    baseline = st.session_state.get('instrumentation_baseline', {'stats': {}, 'time': 0.0})
+    stats = {}
+    for name, item in instrumentation.get_stats().items():
+        previous = baseline['stats'].get(name, {'count': 0, 'seconds': 0.0, 'rows': 0})
+        count = item['count'] - previous['count']
+        if count > 0:
+            seconds = item['seconds'] - previous['seconds']
+            stats[name] = {
+                'count': count,
+                'seconds': seconds,
+                'avg_seconds': seconds / count,
+                'max_seconds': item['max_seconds'],
+                'rows': item['rows'] - previous['rows']
+            }
+    
+    if not stats:
+        st.sidebar.caption("Замеров пока нет")
+        return
+    
+    stats_df = pd.DataFrame([
+        {
+            'Этап': name,
+            'Вызовов': item['count'],
+            'Всего, мс': round(item['seconds'] * 1000, 1),
+            'Среднее, мс': round(item['avg_seconds'] * 1000, 2),
+            'Макс., мс': round(item['max_seconds'] * 1000, 1),
+            'Строк': item['rows']
+        }
+        for name, item in stats.items()
+    ]).sort_values('Всего, мс', ascending=False)
+    st.sidebar.dataframe(stats_df, hide_index=True, use_container_width=True)
+    
+    with st.sidebar.expander("Последние события"):
+        events = [event for event in instrumentation.get_recent_events() if event['time'] > baseline['time']]
+        st.dataframe(pd.DataFrame(events[:50]), hide_index=True)
+    
+    col1, col2 = st.sidebar.columns(2)
+    col1.download_button(
+        "Prometheus",
+        instrumentation.to_prometheus(),
+        file_name="mpstats_metrics.prom",
+        mime="text/plain"
+    )
+    if col2.button("Сбросить"):
+        st.session_state['instrumentation_baseline'] = {
+            'stats': instrumentation.get_stats(),
+            'time': time.time()
+        }
+        st.rerun()
+
 def manual_analysis_tab(calculator):
     """Вкладка ручного анализа"""
     st.header("🔧 Ручной ввод метрик")
@@ -103,7 +261,7 @@ def manual_analysis_tab(calculator):
             "Соотношение запросов/товары", 
             value=5.2, 
             step=0.1,
-            help="Количество поисковых запросов на один товар в категории"
+            help="Количество поисковых запросов в сутки на один товар в категории"
         )
         revenue = st.number_input(
             "Выручка категории (₽/мес)", 
@@ -154,7 +312,7 @@ def manual_analysis_tab(calculator):
         
         display_analysis_results(calculator, metrics)
 
-def display_analysis_results(calculator, metrics):
+def display_analysis_results(calculator, metrics, anomalies=None):
     """Отображение результатов анализа"""
     result = calculator.calculate_rating(metrics)
     
@@ -179,7 +337,7 @@ def display_analysis_results(calculator, metrics):
     display_visualizations(result)
     
     # Рекомендации
-    display_recommendations(result)
+    display_recommendations(result, anomalies)
 
 def display_metrics_breakdown(result, metrics):
     """Отображение детализации по метрикам"""
@@ -231,11 +389,11 @@ def display_visualizations(result):
         bar_fig = create_metrics_bar_chart(result)
         st.plotly_chart(bar_fig, use_container_width=True)
 
-def display_recommendations(result):
-    """Отображение рекомендаций"""
+def display_recommendations(result, anomalies=None):
+    """Отображение рекомендаций (и резких изменений метрик относительно истории ниши)"""
     st.subheader("💡 Рекомендации")
     
-    recommendations = []
+    recommendations = [anomaly['message'] for anomaly in anomalies or []]
     
     if result['breakdown']['demand'] < 40:
         recommendations.append("⚠️ Низкое соотношение спроса к предложению. Рассмотрите более узкую нишу.")
@@ -259,6 +417,8 @@ def file_upload_tab(data_processor, calculator):
     """Вкладка загрузки файлов"""
     st.header("📁 Загрузка и обработка файлов MPStats")
     
+    job_manager = init_job_manager()
+    
     uploaded_files = st.file_uploader(
         "Выберите отчеты MPStats",
         accept_multiple_files=True,
@@ -270,24 +430,207 @@ def file_upload_tab(data_processor, calculator):
         st.subheader("📄 Загруженные файлы")
         
         for file in uploaded_files:
-            with st.expander(f"📄 {file.name}"):
-                try:
-                    # Попытка обработки файла
-                    file_info = data_processor.analyze_file(file)
-                    st.write(f"**Тип файла:** {file_info['type']}")
-                    st.write(f"**Строк:** {file_info['rows']}")
-                    st.write(f"**Столбцов:** {file_info['columns']}")
-                    
-                    if file_info['preview']:
-                        st.write("**Превью данных:**")
-                        st.dataframe(file_info['preview'])
-                
-                except Exception as e:
-                    st.error(f"Ошибка обработки файла: {str(e)}")
+            # Тип по заголовку файла: переименованные выгрузки тоже распознаются
+            schema = data_processor.detect_file_schema(file)
+            source = "по столбцам" if schema['source'] == 'content' else "по имени файла"
+            st.write(f"📄 **{file.name}** — {file.size / 1024:,.0f} КБ, "
+                     f"тип: {schema['type']} ({source})")
         
-        # Кнопка анализа
+        # Кнопка анализа - обработка выполняется в фоне
         if st.button("🔍 Анализировать загруженные файлы"):
-            st.info("🚧 Автоматический анализ файлов будет реализован в следующей версии")
+            files = [(file.name, file.getvalue()) for file in uploaded_files]
+            st.session_state['analysis_job_id'] = job_manager.submit(
+                files,
+                weights=calculator.weights,
+                thresholds=calculator.thresholds,
+                owner=get_session_id()
+            )
+    
+    job_id = st.session_state.get('analysis_job_id')
+    if job_id:
+        display_analysis_job(job_manager, calculator, job_id)
+
+@st.fragment(run_every=JOB_REFRESH_SECONDS)
+def display_job_progress(job_manager, job_id):
+    """
+    Прогресс выполняющейся задачи
+    
+    Фрагмент перезапускается по таймеру сам по себе, без сна в основном скрипте
+    и без перерисовки остальных вкладок. Когда задача завершается, запускается
+    полный перезапуск страницы для вывода результатов.
+    """
+    status = job_manager.get_status(job_id)
+    if status is None or status['status'] in FINISHED_STATUSES:
+        st.rerun()
+    
+    st.progress(status['progress'], text=f"{status['stage_name'] or 'Ожидание'}: {status['message']}")
+    
+    if st.button("⛔ Отменить анализ"):
+        job_manager.cancel(job_id)
+        st.rerun()
+
+def display_analysis_job(job_manager, calculator, job_id):
+    """Отображение прогресса и результатов фоновой задачи анализа"""
+    status = job_manager.get_status(job_id)
+    
+    if status is None:
+        st.warning("Результаты анализа больше недоступны. Запустите анализ повторно.")
+        del st.session_state['analysis_job_id']
+        return
+    
+    if status['status'] not in FINISHED_STATUSES:
+        display_job_progress(job_manager, job_id)
+        return
+    
+    if status['status'] == STATUS_CANCELLED:
+        st.info("Анализ отменен")
+        return
+    
+    if status['status'] == STATUS_FAILED:
+        st.error(f"Ошибка анализа файлов: {status['error']}")
+        return
+    
+    result = job_manager.get_result(job_id)
+    
+    for file_index, file_info in enumerate(result['files']):
+        with st.expander(f"📄 {file_info['name']}"):
+            if file_info['error']:
+                st.error(f"Ошибка обработки файла: {file_info['error']}")
+                continue
+            
+            st.write(f"**Тип файла:** {file_info['type']}")
+            if file_info.get('column_roles'):
+                st.write("**Столбцы:** " + ", ".join(
+                    f"{role} → {column}" for role, column in file_info['column_roles'].items()
+                ))
+            if file_info.get('kept_rows') is not None and file_info['kept_rows'] < file_info['rows']:
+                st.write(f"**Строк:** {file_info['rows']} (без повторов из предыдущих файлов: {file_info['kept_rows']})")
+            else:
+                st.write(f"**Строк:** {file_info['rows']}")
+            if file_info.get('total_columns', file_info['columns']) > file_info['columns']:
+                st.write(f"**Столбцов:** {file_info['columns']} из {file_info['total_columns']} "
+                         f"(загружены только нужные для анализа)")
+            else:
+                st.write(f"**Столбцов:** {file_info['columns']}")
+            
+            if file_info['preview'] is not None:
+                st.write("**Превью данных:**")
+                st.dataframe(file_info['preview'])
+            
+            # Имена файлов в одной задаче могут совпадать, поэтому файл определяется номером
+            if st.checkbox("Показать все данные", key=f"full_{job_id}_{file_index}"):
+                df = job_manager.get_frame(job_id, file_index)
+                if df is not None:
+                    st.dataframe(df)
+                else:
+                    st.info("Полные данные файла больше недоступны")
+    
+    display_deduplication_stats(result.get('deduplication'))
+    
+    if not result['is_valid']:
+        for error in result['validation_errors']:
+            st.warning(error)
+        return
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        niche = st.text_input("Название ниши", key=f"history_niche_{job_id}",
+                              help="Для сравнения с историей ниши и сохранения результатов")
+    with col2:
+        date = st.date_input("Дата выгрузки", key=f"history_date_{job_id}")
+    
+    anomalies = detect_niche_anomalies(niche, date, result['metrics']) if niche else None
+    display_analysis_results(calculator, result['metrics'], anomalies)
+    display_history_section(calculator, result['metrics'], niche, date, job_id)
+    
+    if st.button("🗑️ Очистить результаты"):
+        job_manager.evict(job_id)
+        del st.session_state['analysis_job_id']
+        st.rerun()
+
+def display_deduplication_stats(deduplication):
+    """Пересечения загруженных выгрузок одного типа по артикулам"""
+    if not deduplication:
+        return
+    
+    for file_type, stats in deduplication.items():
+        dropped = stats['total_rows'] - stats['kept_rows']
+        with st.expander(f"🔁 Пересечение выгрузок ({file_type}): исключено повторов - {dropped:,}"):
+            st.dataframe(pd.DataFrame([
+                {
+                    'Файл': item['name'],
+                    'Строк': item['rows'],
+                    'Уникальных артикулов': item['unique_keys'],
+                    'Уже были в предыдущих файлах': item['overlap_rows'],
+                    'Учтено строк': item['kept_rows']
+                }
+                for item in stats['files']
+            ]), hide_index=True)
+            for pair in stats['overlap']:
+                first, second = pair['files']
+                st.caption(f"{first} ∩ {second}: {pair['common_keys']:,} общих артикулов "
+                           f"(Жаккар {pair['jaccard']:.0%})")
+
+def detect_niche_anomalies(niche, date, metrics):
+    """Резкие изменения метрик относительно сохраненной истории ниши до указанной даты"""
+    rows = init_history_store().query(
+        [niche], end=date - datetime.timedelta(days=1), columns=METRIC_COLUMNS
+    )
+    history = [dict(zip(METRIC_COLUMNS, row[2:])) for row in rows]
+    return detect_against_history(history, metrics)
+
+def display_history_section(calculator, metrics, niche, date, job_id):
+    """Сохранение результатов в историю и тренд ниши по сохраненным данным"""
+    st.subheader("🗂️ История ниши")
+    history_store = init_history_store()
+    
+    save = st.button("💾 Сохранить в историю", disabled=not niche, key=f"history_save_{job_id}")
+    if not niche:
+        st.caption("Укажите название ниши, чтобы сохранить результаты и увидеть тренд")
+        return
+    
+    if save:
+        history_store.append(niche, metrics, rating=calculator.calculate_rating(metrics), date=date)
+        st.success(f"Результаты сохранены в историю ниши «{niche}» за {date}")
+    
+    historical_data = history_store.to_historical_data(niche)
+    if historical_data is not None and len(historical_data['dates']) > 1:
+        display_trend_chart(historical_data, key=f"history_trend_{job_id}")
+    elif historical_data is not None:
+        st.caption("Для графика тренда нужны записи хотя бы за две даты")
+
+def display_trend_chart(historical_data, key):
+    """
+    График тренда с приближением по выделению
+    
+    Выделенный рамкой диапазон дат передается в create_trend_chart(x_range=...):
+    ряд обрезается до диапазона и прореживается заново, поэтому при приближении
+    видно больше точек. Номер версии в ключе графика сбрасывает выделение
+    после каждого приближения.
+    """
+    zoom = st.session_state.setdefault(f"{key}_zoom", {'range': None, 'version': 0})
+    
+    event = st.plotly_chart(
+        create_trend_chart(historical_data, x_range=zoom['range']),
+        use_container_width=True,
+        key=f"{key}_{zoom['version']}",
+        on_select='rerun',
+        selection_mode='box'
+    )
+    
+    boxes = event.selection.get('box') if event else None
+    if boxes and boxes[0].get('x'):
+        low, high = sorted(pd.to_datetime(boxes[0]['x']))
+        zoom['range'] = (low.to_datetime64(), high.to_datetime64())
+        zoom['version'] += 1
+        st.rerun()
+    
+    if zoom['range'] is None:
+        st.caption("Выделите диапазон на графике, чтобы приблизить его с большей детализацией")
+    elif st.button("🔍 Показать весь период", key=f"{key}_reset"):
+        zoom['range'] = None
+        zoom['version'] += 1
+        st.rerun()
 
 def instructions_tab():
     """Вкладка с инструкциями"""
@@ -0,0 +1,103 @@
+"""
+Бенчмарк времени холодного импорта пакета utils
+
+Каждый замер выполняется в отдельном процессе интерпретатора, поэтому
+учитывается полная стоимость загрузки модулей. Скрипт завершается с кодом 1,
+если медианное время импорта превышает бюджет или если вместе с модулем
+загрузились тяжелые зависимости (pandas, NumPy, plotly).
+
+Запуск из корня репозитория:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module utils.calculator --budget-ms 30 --repeat 7
+    python -m benchmarks.import_time --module utils.data_processor --budget-ms 800 --allow-heavy
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджет по умолчанию можно переопределить переменной окружения
+DEFAULT_BUDGET_MS = float(os.environ.get('MPSTATS_IMPORT_BUDGET_MS', 50))
+
+# Модули, которые не должны загружаться при импорте расчетного ядра
+HEAVY_MODULES = ['pandas', 'numpy', 'plotly']
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{'seconds': elapsed, 'heavy': heavy}}))
+"""
+
+
+def measure_cold_import(module, repeat=5):
+    """
+    Замер времени холодного импорта модуля
+
+    Args:
+        module (str): Имя модуля, например 'utils.calculator'
+        repeat (int): Количество запусков в отдельных процессах
+
+    Returns:
+        dict: Медиана и все замеры в миллисекундах, загруженные тяжелые модули
+    """
+    samples = []
+    heavy = set()
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+
+    for _ in range(repeat):
+        # -B: без записи .pyc, чтобы не влиять на соседние замеры
+        completed = subprocess.run(
+            [sys.executable, '-B', '-c', code],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.append(probe['seconds'] * 1000)
+        heavy.update(probe['heavy'])
+
+    return {
+        'module': module,
+        'median_ms': statistics.median(samples),
+        'samples_ms': samples,
+        'heavy_modules': sorted(heavy)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бюджет времени холодного импорта')
+    parser.add_argument('--module', default='utils.calculator')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--allow-heavy', action='store_true',
+                        help='Не считать ошибкой загрузку pandas/NumPy/plotly')
+    args = parser.parse_args(argv)
+
+    result = measure_cold_import(args.module, repeat=args.repeat)
+    result['budget_ms'] = args.budget_ms
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    failed = False
+    if result['median_ms'] > args.budget_ms:
+        print(f"Превышен бюджет импорта {args.module}: "
+              f"{result['median_ms']:.1f} мс > {args.budget_ms:.1f} мс", file=sys.stderr)
+        failed = True
+    if result['heavy_modules'] and not args.allow_heavy:
+        print(f"При импорте {args.module} загружены тяжелые зависимости: "
+              f"{', '.join(result['heavy_modules'])}", file=sys.stderr)
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Профиль памяти чтения файлов MPStats
+
+Для каждого типа файла и размера генерируется синтетическая выгрузка, после
+чего в отдельном процессе замеряются этапы обработки: чтение байтов файла,
+разбор в DataFrame (load_dataframe) и извлечение метрик. По каждому этапу
+сохраняются пик и удержанная память по tracemalloc, а также пик RSS по
+периодическому опросу процесса.
+
+Скрипт завершается с кодом 1, если пиковая память превышает заданную
+кратность размера файла (--max-peak-ratio, --max-rss-ratio).
+
+Запуск из корня репозитория:
+    python -m benchmarks.memory_profile --sizes 10000,100000 --output memory.json
+    python -m benchmarks.memory_profile --formats csv --max-peak-ratio 8 --max-rss-ratio 0
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = [10000, 100000]
+DEFAULT_FORMATS = ['csv', 'xlsx']
+
+# Запись xlsx медленная, поэтому размер файлов Excel ограничен отдельно
+DEFAULT_XLSX_MAX_ROWS = 20000
+
+# Допустимая кратность пиковой памяти к размеру файла. xlsx - сжатый архив,
+# поэтому для него кратность выше
+DEFAULT_MAX_PEAK_RATIO = os.environ.get('MPSTATS_MAX_PEAK_RATIO', 'csv=12,xlsx=25')
+DEFAULT_MAX_RSS_RATIO = os.environ.get('MPSTATS_MAX_RSS_RATIO', 'csv=30,xlsx=60')
+
+STAGES = ['read', 'parse', 'extract']
+
+
+def _read_rss():
+    """Текущий RSS процесса в байтах (Linux); None, если недоступно"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RSSSampler:
+    """Фоновый опрос RSS процесса для оценки пикового значения"""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = _read_rss() or 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _read_rss() or 0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _read_rss() or 0)
+
+
+def _measure_stage(func, trace):
+    """
+    Замер памяти одного этапа
+
+    Args:
+        func (callable): Этап обработки
+        trace (bool): Замерять ли память tracemalloc (иначе только RSS)
+
+    Returns:
+        tuple: (результат, замер) - пик и удержанная память, для RSS или tracemalloc
+    """
+    if trace:
+        tracemalloc.reset_peak()
+        current_before = tracemalloc.get_traced_memory()[0]
+    rss_before = _read_rss() or 0
+    start = time.perf_counter()
+
+    with RSSSampler() as sampler:
+        result = func()
+
+    measure = {
+        'seconds': time.perf_counter() - start,
+        'rss_peak_bytes': max(sampler.peak - rss_before, 0),
+        'rss_retained_bytes': (_read_rss() or 0) - rss_before
+    }
+    if trace:
+        current_after, peak = tracemalloc.get_traced_memory()
+        measure['peak_bytes'] = peak - current_before
+        measure['retained_bytes'] = current_after - current_before
+
+    return result, measure
+
+
+def _run_stages(processor, path, file_type, trace):
+    """Чтение, разбор и извлечение метрик с замером каждого этапа"""
+    file_size = os.path.getsize(path)
+    stages = {}
+
+    def read():
+        with open(path, 'rb') as f:
+            buffer = io.BytesIO(f.read())
+        buffer.name = os.path.basename(path)
+        buffer.size = file_size
+        return buffer
+
+    # Результаты этапов удерживаются до конца, как в реальном конвейере
+    buffer, stages['read'] = _measure_stage(read, trace)
+    df, stages['parse'] = _measure_stage(lambda: processor.load_dataframe(buffer), trace)
+    _, stages['extract'] = _measure_stage(
+        lambda: processor.extract_metrics_from_files([{'type': file_type, 'dataframe': df}]), trace
+    )
+    return stages, len(df)
+
+
+def _warm_up(processor, path):
+    """
+    Прогрев: загрузка модулей чтения (openpyxl, парсеры pandas) до замеров,
+    чтобы их память не относилась к первому этапу
+    """
+    import pandas as pd
+
+    pd.read_csv(io.StringIO('a;b\n1;2\n'), sep=';')
+    if path.endswith('.xlsx'):
+        buffer = io.BytesIO()
+        pd.DataFrame({'a': [1], 'b': [2]}).to_excel(buffer, index=False)
+        buffer.seek(0)
+        buffer.name = 'warm_up.xlsx'
+        processor.load_dataframe(buffer)
+
+
+def profile_file(path, file_type):
+    """
+    Профиль памяти обработки одного файла в текущем процессе
+
+    Выполняются два прохода: сначала без tracemalloc (его служебные структуры
+    искажают RSS), затем с tracemalloc для пика и удержанной памяти Python/NumPy.
+
+    Args:
+        path (str): Путь к файлу (csv или xlsx)
+        file_type (str): Тип файла для извлечения метрик
+
+    Returns:
+        dict: Размер файла, замеры по этапам и суммарный пик от начала обработки
+    """
+    from utils.data_processor import MPStatsDataProcessor
+
+    processor = MPStatsDataProcessor()
+    file_size = os.path.getsize(path)
+    _warm_up(processor, path)
+
+    rss_baseline = _read_rss() or 0
+    with RSSSampler() as overall:
+        rss_stages, rows = _run_stages(processor, path, file_type, trace=False)
+    rss_peak = max(overall.peak - rss_baseline, 0)
+
+    tracemalloc.start()
+    try:
+        stages, _ = _run_stages(processor, path, file_type, trace=True)
+    finally:
+        tracemalloc.stop()
+
+    # Пик от начала обработки: удержанное предыдущими этапами плюс пик текущего
+    peak = 0
+    retained = 0
+    for stage in STAGES:
+        item = stages[stage]
+        peak = max(peak, retained + item['peak_bytes'])
+        retained += item['retained_bytes']
+
+        item['rss_peak_bytes'] = rss_stages[stage]['rss_peak_bytes']
+        item['rss_retained_bytes'] = rss_stages[stage]['rss_retained_bytes']
+        item['peak_ratio'] = item['peak_bytes'] / file_size
+        item['rss_peak_ratio'] = item['rss_peak_bytes'] / file_size
+
+    return {
+        'file_size': file_size,
+        'rows': rows,
+        'stages': stages,
+        'peak_bytes': peak,
+        'peak_ratio': peak / file_size,
+        'rss_peak_bytes': rss_peak,
+        'rss_peak_ratio': rss_peak / file_size
+    }
+
+
+def profile_in_subprocess(path, file_type):
+    """Профиль файла в отдельном процессе, чтобы RSS не зависел от предыдущих замеров"""
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.memory_profile', '--child', path, file_type],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def parse_ratio_limits(value):
+    """
+    Разбор пределов кратности: '12' (для всех форматов) или 'csv=12,xlsx=25'
+
+    Returns:
+        dict: Формат -> предел ('*' - для всех форматов); 0 отключает проверку
+    """
+    limits = {}
+    for part in str(value).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        fmt, sep, ratio = part.rpartition('=')
+        try:
+            limits[fmt.strip() if sep else '*'] = float(ratio)
+        except ValueError:
+            raise ValueError(f"Некорректный предел кратности: {part}")
+    return limits
+
+
+def check_limits(results, max_peak_ratio, max_rss_ratio):
+    """
+    Проверка кратности пиковой памяти к размеру файла
+
+    Args:
+        results (dict): Замеры по случаям вида 'формат/тип/строк'
+        max_peak_ratio (dict): Пределы пика tracemalloc по форматам
+        max_rss_ratio (dict): Пределы пика RSS по форматам
+
+    Returns:
+        list: Нарушения (случай, показатель, значение, предел)
+    """
+    violations = []
+    for name, result in results.items():
+        fmt = name.split('/', 1)[0]
+        for measure, limits in (('peak_ratio', max_peak_ratio), ('rss_peak_ratio', max_rss_ratio)):
+            limit = limits.get(fmt, limits.get('*'))
+            if limit and result[measure] > limit:
+                violations.append({
+                    'case': name,
+                    'measure': measure,
+                    'value': result[measure],
+                    'limit': limit
+                })
+    return violations
+
+
+def _mb(value):
+    return value / 1024 ** 2
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == '--child':
+        print(json.dumps(profile_file(argv[1], argv[2])))
+        return 0
+
+    from data.synthetic_generator import FILE_COLUMNS, SyntheticMPStatsGenerator
+
+    parser = argparse.ArgumentParser(description='Профиль памяти чтения файлов MPStats')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help='Количество строк через запятую')
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS),
+                        help='Форматы файлов через запятую (csv, xlsx)')
+    parser.add_argument('--types', help='Типы файлов через запятую (по умолчанию все)')
+    parser.add_argument('--xlsx-max-rows', type=int, default=DEFAULT_XLSX_MAX_ROWS)
+    parser.add_argument('--max-peak-ratio', default=DEFAULT_MAX_PEAK_RATIO,
+                        help="Кратность пика tracemalloc к размеру файла: '12' или 'csv=12,xlsx=25' (0 - без проверки)")
+    parser.add_argument('--max-rss-ratio', default=DEFAULT_MAX_RSS_RATIO,
+                        help="Кратность пика RSS к размеру файла: '30' или 'csv=30,xlsx=60' (0 - без проверки)")
+    parser.add_argument('--output', help='Файл для сохранения результатов (JSON)')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    formats = [fmt for fmt in args.formats.split(',') if fmt]
+    file_types = args.types.split(',') if args.types else list(FILE_COLUMNS)
+
+    try:
+        max_peak_ratio = parse_ratio_limits(args.max_peak_ratio)
+        max_rss_ratio = parse_ratio_limits(args.max_rss_ratio)
+    except ValueError as e:
+        parser.error(str(e))
+
+    unknown = set(file_types) - set(FILE_COLUMNS)
+    if unknown:
+        parser.error(f"Неизвестные типы файлов: {', '.join(sorted(unknown))}")
+
+    generator = SyntheticMPStatsGenerator()
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix='mpstats-memory-') as tmp_dir:
+        for n in sizes:
+            for fmt in formats:
+                if fmt == 'xlsx' and n > args.xlsx_max_rows:
+                    continue
+                for file_type in file_types:
+                    path = os.path.join(tmp_dir, f"{file_type}_{n}.{fmt}")
+                    generator.write(file_type, n, path)
+                    result = profile_in_subprocess(path, file_type)
+                    os.remove(path)
+
+                    name = f"{fmt}/{file_type}/{n}"
+                    results[name] = result
+                    stages = '  '.join(
+                        f"{stage} {_mb(result['stages'][stage]['peak_bytes']):.1f}/"
+                        f"{_mb(result['stages'][stage]['retained_bytes']):.1f}"
+                        for stage in STAGES
+                    )
+                    print(f"{name:<36} файл {_mb(result['file_size']):>7.1f} МБ  "
+                          f"пик x{result['peak_ratio']:>5.1f}  RSS x{result['rss_peak_ratio']:>5.1f}  "
+                          f"[пик/удержано, МБ: {stages}]")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'python': sys.version.split()[0],
+                    'sizes': sizes,
+                    'formats': formats,
+                    'max_peak_ratio': max_peak_ratio,
+                    'max_rss_ratio': max_rss_ratio
+                },
+                'results': results
+            }, f, ensure_ascii=False, indent=2)
+
+    violations = check_limits(results, max_peak_ratio, max_rss_ratio)
+    for violation in violations:
+        print(f"Превышен предел памяти {violation['case']}: {violation['measure']} "
+              f"x{violation['value']:.1f} > x{violation['limit']:.1f}", file=sys.stderr)
+
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
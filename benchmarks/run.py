@@ -0,0 +1,414 @@
+"""
+Набор бенчмарков: расчет рейтинга, чтение файлов, извлечение метрик, диаграммы
+
+Результаты сохраняются в JSON. При указании базового прогона (--baseline)
+каждый замер сравнивается с ним, и скрипт завершается с кодом 1, если
+какой-либо случай стал медленнее больше чем на --threshold.
+
+Запуск из корня репозитория:
+    python -m benchmarks.run --sizes 1000,100000 --output bench.json
+    python -m benchmarks.run --baseline bench.json --threshold 0.25
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.synthetic_generator import FILE_COLUMNS, SyntheticMPStatsGenerator
+from utils.calculator import ProductRatingCalculator
+from utils.anomaly_detector import NicheAnomalyDetector
+from utils.data_processor import MPStatsDataProcessor
+from utils.percentiles import CategoryPercentileIndex
+from utils.rollup_cube import RollupCube
+from utils.seasonality import decompose_seasonal
+from utils.similarity import NicheSimilarityIndex
+from utils.weight_fitting import fit_weights
+from utils.excel_exporter import export_ranking
+from utils import visualizations
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Запись xlsx медленная, поэтому размер файлов Excel ограничен отдельно
+DEFAULT_XLSX_MAX_ROWS = 20000
+
+
+def _best_of(func, repeat):
+    """Минимальное время из repeat запусков (в секундах)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _named_buffer(content, name):
+    buffer = io.BytesIO(content)
+    buffer.name = name
+    return buffer
+
+
+def _random_metrics(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'demand_ratio': rng.lognormal(1.5, 0.7, n),
+        'revenue': rng.lognormal(np.log(2500000), 1.2, n),
+        'price_ad_ratio': rng.lognormal(np.log(20), 0.6, n),
+        'organic_percent': rng.uniform(0, 100, n)
+    }
+
+
+def bench_scoring(sizes, repeat):
+    """
+    Скалярный расчет (calculate_rating в цикле) против векторного calculate_ratings_batch,
+    разложение сезонности для матрицы ниши × 36 месяцев, дневной пакет детектора аномалий,
+    построение индекса похожих ниш и запрос 20 ближайших, процентили в категориях,
+    заполнение куба агрегатов и раскрытие категории, подбор весов с 5-блочной кросс-валидацией,
+    потоковая выгрузка рейтинга с рекомендациями в xlsx
+    """
+    calculator = ProductRatingCalculator()
+    results = {}
+
+    for n in sizes:
+        metrics = _random_metrics(n)
+        rows = [
+            {key: float(values[i]) for key, values in metrics.items()}
+            for i in range(n)
+        ]
+
+        results[f"scoring/scalar/{n}"] = {
+            'seconds': _best_of(lambda: [calculator.calculate_rating(row) for row in rows], repeat),
+            'rows': n
+        }
+        results[f"scoring/batch/{n}"] = {
+            'seconds': _best_of(lambda: calculator.calculate_ratings_batch(**metrics), repeat),
+            'rows': n
+        }
+        
+        monthly = np.random.default_rng(1).lognormal(14, 1, (n, 36))
+        results[f"seasonality/{n}x36"] = {
+            'seconds': _best_of(lambda: decompose_seasonal(monthly), repeat),
+            'rows': n
+        }
+        
+        detector = NicheAnomalyDetector()
+        niches = [f"Ниша {i}" for i in range(n)]
+        results[f"anomaly/batch/{n}"] = {
+            'seconds': _best_of(lambda: detector.update_batch(niches, metrics), repeat),
+            'rows': n
+        }
+        
+        scores = calculator.calculate_ratings_batch(**metrics)
+        index = NicheSimilarityIndex()
+        results[f"similarity/build/{n}"] = {
+            'seconds': _best_of(lambda: NicheSimilarityIndex().add_batch(niches, scores), repeat),
+            'rows': n
+        }
+        index.add_batch(niches, scores)
+        results[f"similarity/knn/{n}"] = {
+            'seconds': _best_of(lambda: index.similar_to(niches[0], k=20), repeat),
+            'rows': n
+        }
+        
+        categories = np.random.default_rng(2).integers(0, 50, n)
+        percentiles = CategoryPercentileIndex(calculator)
+        results[f"percentiles/build/{n}"] = {
+            'seconds': _best_of(lambda: percentiles.build(categories, metrics), repeat),
+            'rows': n
+        }
+        results[f"percentiles/batch/{n}"] = {
+            'seconds': _best_of(lambda: percentiles.percentiles_batch(categories, metrics), repeat),
+            'rows': n
+        }
+        
+        category_names = [f"Категория {c}" for c in categories]
+        subcategory_names = [f"Подкатегория {c}.{i % 20}" for i, c in enumerate(categories)]
+        cube = RollupCube(calculator)
+        results[f"rollup/upsert/{n}"] = {
+            'seconds': _best_of(
+                lambda: RollupCube(calculator).upsert(niches, category_names, subcategory_names, metrics, scores),
+                repeat
+            ),
+            'rows': n
+        }
+        cube.upsert(niches, category_names, subcategory_names, metrics, scores)
+        results[f"rollup/drill_down/{n}"] = {
+            'seconds': _best_of(lambda: cube.drill_down((category_names[0],)), repeat),
+            'rows': n
+        }
+        
+        outcomes = np.random.default_rng(3).uniform(size=n) < scores['final_rating'] / 100
+        results[f"weights/fit/{n}"] = {
+            'seconds': _best_of(lambda: fit_weights(scores, outcomes, baseline=calculator.weights), repeat),
+            'rows': n
+        }
+        
+        results[f"export/xlsx/{n}"] = {
+            'seconds': _best_of(lambda: export_ranking(niches, metrics, io.BytesIO()), repeat),
+            'rows': n
+        }
+
+    return results
+
+
+def bench_ingestion(sizes, repeat, xlsx_max_rows):
+    """
+    Чтение CSV/xlsx каждого типа (все столбцы и только нужные обработчику),
+    определение типа по заголовку, склейка пересекающихся выгрузок и извлечение метрик
+    """
+    generator = SyntheticMPStatsGenerator()
+    processor = MPStatsDataProcessor()
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix='mpstats-bench-') as tmp_dir:
+        for n in sizes:
+            frames = []
+            for file_type in FILE_COLUMNS:
+                csv_path = os.path.join(tmp_dir, f"{file_type}_{n}.csv")
+                generator.write(file_type, n, csv_path)
+                with open(csv_path, 'rb') as f:
+                    content = f.read()
+
+                def parse_csv():
+                    return processor.load_dataframe(_named_buffer(content, csv_path))
+
+                results[f"parse/csv/{file_type}/{n}"] = {
+                    'seconds': _best_of(parse_csv, repeat),
+                    'rows': n,
+                    'bytes': len(content)
+                }
+                results[f"sniff/csv/{file_type}/{n}"] = {
+                    'seconds': _best_of(
+                        lambda: processor.detect_file_schema(_named_buffer(content, csv_path)), repeat
+                    ),
+                    'rows': n,
+                    'bytes': len(content)
+                }
+                schema = processor.detect_file_schema(_named_buffer(content, csv_path))
+                usecols = processor.select_columns(schema)
+                if usecols:
+                    results[f"parse_projected/csv/{file_type}/{n}"] = {
+                        'seconds': _best_of(
+                            lambda: processor.load_dataframe(
+                                _named_buffer(content, csv_path), usecols=usecols, separator=schema['separator']
+                            ),
+                            repeat
+                        ),
+                        'rows': n,
+                        'bytes': len(content)
+                    }
+                if file_type == 'keyword_frequency':
+                    # Потоковое чтение блоками со сверткой по предметам (как в задачах анализа)
+                    results[f"stream/csv/{file_type}/{n}"] = {
+                        'seconds': _best_of(
+                            lambda: processor.process_keyword_frequency_file(
+                                processor.iter_dataframe_chunks(
+                                    _named_buffer(content, csv_path), usecols=usecols, separator=schema['separator']
+                                ),
+                                columns=schema['columns']
+                            ),
+                            repeat
+                        ),
+                        'rows': n,
+                        'bytes': len(content)
+                    }
+                frames.append({'type': file_type, 'dataframe': parse_csv()})
+
+                if n <= xlsx_max_rows:
+                    xlsx_path = os.path.join(tmp_dir, f"{file_type}_{n}.xlsx")
+                    generator.write(file_type, n, xlsx_path)
+                    with open(xlsx_path, 'rb') as f:
+                        xlsx_content = f.read()
+
+                    results[f"parse/xlsx/{file_type}/{n}"] = {
+                        'seconds': _best_of(
+                            lambda: processor.load_dataframe(_named_buffer(xlsx_content, xlsx_path)), repeat
+                        ),
+                        'rows': n,
+                        'bytes': len(xlsx_content)
+                    }
+                    if usecols:
+                        results[f"parse_projected/xlsx/{file_type}/{n}"] = {
+                            'seconds': _best_of(
+                                lambda: processor.load_dataframe(
+                                    _named_buffer(xlsx_content, xlsx_path), usecols=usecols
+                                ),
+                                repeat
+                            ),
+                            'rows': n,
+                            'bytes': len(xlsx_content)
+                        }
+                    results[f"sniff/xlsx/{file_type}/{n}"] = {
+                        'seconds': _best_of(
+                            lambda: processor.detect_file_schema(_named_buffer(xlsx_content, xlsx_path)), repeat
+                        ),
+                        'rows': n,
+                        'bytes': len(xlsx_content)
+                    }
+
+            # Две SEO-выгрузки соседних запросов: вторая половина первой совпадает с началом второй
+            seo = next(item['dataframe'] for item in frames if item['type'] == 'seo_results')
+            half = len(seo) // 2
+            overlapping = [
+                {'type': 'seo_results', 'dataframe': seo, 'name': 'first'},
+                {'type': 'seo_results', 'dataframe': pd.concat([seo.iloc[half:], seo.iloc[:half]]), 'name': 'second'}
+            ]
+            results[f"dedup/seo_results/2x{n}"] = {
+                'seconds': _best_of(lambda: processor.merge_overlapping_files(overlapping), repeat),
+                'rows': 2 * n
+            }
+
+            results[f"extract_metrics/{n}"] = {
+                'seconds': _best_of(lambda: processor.extract_metrics_from_files(frames), repeat),
+                'rows': n * len(frames)
+            }
+
+    return results
+
+
+def bench_charts(sizes, repeat):
+    """Построение и сериализация диаграмм"""
+    calculator = ProductRatingCalculator()
+    result = calculator.calculate_rating({
+        'demand_ratio': 5.2,
+        'revenue': 2500000,
+        'price_ad_ratio': 25.0,
+        'organic_percent': 65.0
+    })
+    results = {}
+
+    fixed_builders = {
+        'radar': lambda: visualizations.create_radar_chart(result['breakdown']),
+        'metrics_bar': lambda: visualizations.create_metrics_bar_chart(result),
+        'gauge': lambda: visualizations.create_rating_gauge(result['final_rating'])
+    }
+    for name, build in fixed_builders.items():
+        fig = build()
+        results[f"chart/build/{name}"] = {'seconds': _best_of(build, repeat)}
+        results[f"chart/serialize/{name}"] = {'seconds': _best_of(fig.to_json, repeat)}
+
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        competitive = {
+            'names': [f"Конкурент {i}" for i in range(n)],
+            'prices': rng.lognormal(7, 0.7, n),
+            'sales': rng.pareto(1.2, n) * 100,
+            'market_share': rng.pareto(1.2, n),
+            'ratings': rng.uniform(3, 5, n)
+        }
+        trend = {
+            'dates': np.datetime64('2020-01-01T00') + np.arange(n).astype('timedelta64[h]'),
+            'demand': np.cumsum(rng.normal(size=n)),
+            'revenue': np.cumsum(rng.normal(size=n))
+        }
+        distribution = rng.lognormal(7, 1, n)
+
+        sized_builders = {
+            'competitive': lambda: visualizations.create_competitive_analysis_chart(competitive),
+            'trend': lambda: visualizations.create_trend_chart(trend),
+            'distribution': lambda: visualizations.create_distribution_chart(distribution, 'Цена')
+        }
+        for name, build in sized_builders.items():
+            fig = build()
+            results[f"chart/build/{name}/{n}"] = {'seconds': _best_of(build, repeat), 'rows': n}
+            results[f"chart/serialize/{name}/{n}"] = {
+                'seconds': _best_of(fig.to_json, repeat),
+                'rows': n,
+                'bytes': len(fig.to_json())
+            }
+
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Сравнение с базовым прогоном
+
+    Returns:
+        list: Случаи, замедлившиеся больше чем на threshold (доля)
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or previous['seconds'] <= 0:
+            continue
+
+        ratio = current['seconds'] / previous['seconds']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'case': name,
+                'baseline_seconds': previous['seconds'],
+                'seconds': current['seconds'],
+                'ratio': ratio
+            })
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарки анализатора ниш MPStats')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help='Размеры данных через запятую')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--xlsx-max-rows', type=int, default=DEFAULT_XLSX_MAX_ROWS)
+    parser.add_argument('--only', choices=['scoring', 'ingestion', 'charts'], action='append',
+                        help='Запустить только указанные группы')
+    parser.add_argument('--output', help='Файл для сохранения результатов (JSON)')
+    parser.add_argument('--baseline', help='Результаты предыдущего прогона для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Допустимое замедление относительно базового прогона (доля)')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    groups = args.only or ['scoring', 'ingestion', 'charts']
+
+    results = {}
+    if 'scoring' in groups:
+        results.update(bench_scoring(sizes, args.repeat))
+    if 'ingestion' in groups:
+        results.update(bench_ingestion(sizes, args.repeat, args.xlsx_max_rows))
+    if 'charts' in groups:
+        results.update(bench_charts(sizes, args.repeat))
+
+    report = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+
+    for name, value in results.items():
+        print(f"{name:<50} {value['seconds'] * 1000:>12.2f} мс")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Регрессия {regression['case']}: {regression['baseline_seconds'] * 1000:.2f} мс -> "
+                  f"{regression['seconds'] * 1000:.2f} мс (x{regression['ratio']:.2f})", file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
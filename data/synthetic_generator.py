@@ -0,0 +1,406 @@
+"""
+Генератор синтетических выгрузок MPStats для нагрузочного тестирования
+
+Данные генерируются потоково, блоками по chunk_rows строк, поэтому объем
+выгрузки ограничен только диском. Все распределения воспроизводимы при
+одинаковом seed, и выгрузка не зависит от chunk_rows: случайные числа
+берутся из потоков фиксированных блоков по rng_block_rows строк.
+
+Запуск из корня репозитория:
+    python -m data.synthetic_generator seo_results 1000000 seo_1m.csv
+    python -m data.synthetic_generator products_report 5000000 products.parquet --seed 7
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.sample_data import get_category_examples
+
+# Заголовки колонок в стиле выгрузок MPStats
+FILE_COLUMNS = {
+    'niche_selection': [
+        'Категория', 'Предмет', 'Товары', 'Бренды', 'Продавцы',
+        'Продажи', 'Выручка, ₽', 'Средний чек, ₽', 'Рейтинг', 'Отзывы'
+    ],
+    'seo_results': [
+        'Запрос', 'Позиция', 'Позиция без рекламы', 'Реклама', 'Ставка, ₽',
+        'Артикул', 'Название', 'Бренд', 'Продавец', 'Цена, ₽',
+        'Продажи', 'Выручка, ₽', 'Рейтинг', 'Отзывы'
+    ],
+    'brands_report': [
+        'Бренд', 'Товары', 'Продавцы', 'Продажи', 'Выручка, ₽',
+        'Средняя цена, ₽', 'Доля выручки, %'
+    ],
+    'sellers_report': [
+        'Продавец', 'ИНН', 'Товары', 'Бренды', 'Продажи', 'Выручка, ₽',
+        'Средняя цена, ₽', 'Доля выручки, %'
+    ],
+    'products_report': [
+        'Артикул', 'Название', 'Предмет', 'Бренд', 'Продавец', 'Цена, ₽',
+        'Цена со скидкой, ₽', 'Продажи', 'Выручка, ₽', 'Рейтинг', 'Отзывы', 'Остаток'
+    ],
+    'keyword_frequency': [
+        'Запрос', 'Предмет', 'Частота', 'Количество товаров'
+    ]
+}
+
+# Количество позиций выдачи на один поисковый запрос
+SEO_POSITIONS_PER_QUERY = 100
+
+# Лимит строк на лист Excel (с учетом строки заголовка)
+XLSX_MAX_ROWS = 1048575
+
+FIRST_ARTICLE = 10000000
+
+# Строк на один поток случайных чисел (кратно SEO_POSITIONS_PER_QUERY, чтобы запрос не делился)
+RNG_BLOCK_ROWS = 50000
+
+
+class SyntheticMPStatsGenerator:
+    """Генератор синтетических выгрузок MPStats"""
+
+    def __init__(self, seed=42, n_brands=20000, n_sellers=15000, catalogue_size=5000000,
+                 zipf_exponent=1.1, rng_block_rows=RNG_BLOCK_ROWS):
+        """
+        Args:
+            seed (int): Зерно генератора случайных чисел
+            n_brands (int): Количество брендов на рынке
+            n_sellers (int): Количество продавцов на рынке
+            catalogue_size (int): Размер каталога артикулов для SEO-выдачи
+            zipf_exponent (float): Показатель распределения Ципфа для долей брендов и продавцов
+            rng_block_rows (int): Строк на один поток случайных чисел (кратно
+                SEO_POSITIONS_PER_QUERY); выгрузка зависит от него, но не от chunk_rows
+        """
+        if rng_block_rows <= 0 or rng_block_rows % SEO_POSITIONS_PER_QUERY:
+            raise ValueError(f"Размер блока должен быть кратен {SEO_POSITIONS_PER_QUERY}: {rng_block_rows}")
+
+        self.seed = seed
+        self.n_brands = n_brands
+        self.n_sellers = n_sellers
+        self.catalogue_size = catalogue_size
+        self.zipf_exponent = zipf_exponent
+        self.rng_block_rows = rng_block_rows
+        self._harmonic_cache = {}
+
+        self._brand_probs = self._zipf_probabilities(n_brands)
+        self._seller_probs = self._zipf_probabilities(n_sellers)
+        self._brand_names = np.array([f"Бренд {i + 1}" for i in range(n_brands)], dtype=object)
+        self._seller_names = np.array([f"Продавец {i + 1}" for i in range(n_sellers)], dtype=object)
+
+        categories = get_category_examples()
+        self._categories = np.array([c['name'] for c in categories.values()], dtype=object)
+        self._subjects = np.array(
+            [example for c in categories.values() for example in c['examples']], dtype=object
+        )
+
+    def _zipf_probabilities(self, n):
+        ranks = np.arange(1, n + 1, dtype=float)
+        weights = ranks ** -self.zipf_exponent
+        return weights / weights.sum()
+
+    def _rng(self, file_type, block_index):
+        """
+        Поток случайных чисел блока строк
+
+        Ключ потомка (тип, номер блока) совпадает с тем, что дает SeedSequence.spawn,
+        но поток любого блока создается без генерации предыдущих.
+        """
+        type_index = list(FILE_COLUMNS).index(file_type)
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(type_index, block_index)))
+
+    def _iter_blocks(self, file_type, rows):
+        """Блоки по rng_block_rows строк, каждый со своим потоком случайных чисел"""
+        build = getattr(self, f"_build_{file_type}")
+        for block_index, start in enumerate(range(0, rows, self.rng_block_rows)):
+            size = min(self.rng_block_rows, rows - start)
+            yield build(self._rng(file_type, block_index), start, size, rows)
+
+    def _subject_names(self, idx):
+        """Названия предметов: сначала реальные примеры, затем пронумерованные ниши"""
+        names = np.empty(len(idx), dtype=object)
+        known = idx < len(self._subjects)
+        names[known] = self._subjects[idx[known]]
+        names[~known] = np.char.add('Ниша ', (idx[~known] + 1).astype(str)).astype(object)
+        return names
+
+    def iter_chunks(self, file_type, rows, chunk_rows=200000):
+        """
+        Потоковая генерация выгрузки блоками
+
+        Args:
+            file_type (str): Тип выгрузки (ключ FILE_COLUMNS)
+            rows (int): Общее количество строк
+            chunk_rows (int): Размер блока
+
+        Yields:
+            pandas.DataFrame: Очередной блок строк
+        """
+        if file_type not in FILE_COLUMNS:
+            raise ValueError(f"Неизвестный тип выгрузки: {file_type}")
+
+        if file_type == 'seo_results':
+            # Запрос не должен разрываться между блоками
+            chunk_rows = max(chunk_rows // SEO_POSITIONS_PER_QUERY, 1) * SEO_POSITIONS_PER_QUERY
+
+        # Блоки потоков случайных чисел перенарезаются в блоки по chunk_rows строк
+        columns = FILE_COLUMNS[file_type]
+        pending, pending_rows = [], 0
+        for block in self._iter_blocks(file_type, rows):
+            pending.append(block)
+            pending_rows += len(block)
+            if pending_rows < chunk_rows:
+                continue
+
+            buffer = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+            offset = 0
+            while pending_rows - offset >= chunk_rows:
+                yield buffer.iloc[offset:offset + chunk_rows][columns].reset_index(drop=True)
+                offset += chunk_rows
+            pending = [buffer.iloc[offset:]] if offset < pending_rows else []
+            pending_rows -= offset
+
+        if pending_rows:
+            yield pd.concat(pending, ignore_index=True)[columns]
+
+    def generate(self, file_type, rows):
+        """Генерация выгрузки целиком в один DataFrame (для небольших объемов)"""
+        return pd.concat(list(self.iter_chunks(file_type, rows)), ignore_index=True)
+
+    def _build_niche_selection(self, rng, start, size, total):
+        idx = np.arange(start, start + size)
+        revenue = rng.lognormal(np.log(2000000), 1.5, size)
+        avg_check = rng.lognormal(np.log(1200), 0.6, size)
+        products = np.maximum(rng.lognormal(np.log(800), 1.2, size), 1).astype(np.int64)
+
+        return pd.DataFrame({
+            'Категория': self._categories[idx % len(self._categories)],
+            'Предмет': self._subject_names(idx),
+            'Товары': products,
+            'Бренды': np.maximum((products * rng.uniform(0.05, 0.4, size)).astype(np.int64), 1),
+            'Продавцы': np.maximum((products * rng.uniform(0.05, 0.3, size)).astype(np.int64), 1),
+            'Продажи': (revenue / avg_check).astype(np.int64),
+            'Выручка, ₽': revenue.round(0),
+            'Средний чек, ₽': avg_check.round(0),
+            'Рейтинг': rng.uniform(3.8, 4.9, size).round(1),
+            'Отзывы': (rng.pareto(1.3, size) * 10).astype(np.int64)
+        })
+
+    def _build_seo_results(self, rng, start, size, total):
+        idx = np.arange(start, start + size)
+        query = idx // SEO_POSITIONS_PER_QUERY
+        position = idx % SEO_POSITIONS_PER_QUERY + 1
+
+        # Реклама чаще встречается в верхней части выдачи
+        is_ad = rng.random(size) < 0.6 * np.exp(-position / 25) + 0.05
+
+        # Позиция без рекламы - порядковый номер среди органических в своем запросе
+        organic_rank = np.cumsum(~is_ad)
+        query_start = np.flatnonzero(position == 1)
+        offsets = np.repeat(organic_rank[query_start] - (~is_ad[query_start]), np.diff(np.r_[query_start, size]))
+        organic_position = np.where(is_ad, np.nan, organic_rank - offsets)
+
+        price = rng.lognormal(np.log(1200), 0.7, size)
+        bid = np.where(is_ad, price / rng.lognormal(np.log(25), 0.5, size), np.nan)
+        sales = (rng.pareto(1.2, size) * 20).astype(np.int64)
+
+        return pd.DataFrame({
+            'Запрос': np.char.add('запрос ', (query + 1).astype(str)).astype(object),
+            'Позиция': position,
+            'Позиция без рекламы': organic_position,
+            'Реклама': np.where(is_ad, 'Да', 'Нет'),
+            'Ставка, ₽': bid.round(0),
+            'Артикул': FIRST_ARTICLE + rng.integers(0, self.catalogue_size, size),
+            'Название': np.char.add('Товар ', rng.integers(1, 1000000, size).astype(str)).astype(object),
+            'Бренд': self._brand_names[rng.choice(self.n_brands, size, p=self._brand_probs)],
+            'Продавец': self._seller_names[rng.choice(self.n_sellers, size, p=self._seller_probs)],
+            'Цена, ₽': price.round(0),
+            'Продажи': sales,
+            'Выручка, ₽': (sales * price).round(0),
+            'Рейтинг': rng.uniform(3.5, 5.0, size).round(1),
+            'Отзывы': (rng.pareto(1.1, size) * 15).astype(np.int64)
+        })
+
+    def _harmonic(self, n, block=1000000):
+        """Обобщенное гармоническое число: сумма k^-s для k = 1..n (блоками, без массива длины n)"""
+        if n not in self._harmonic_cache:
+            total = 0.0
+            for start in range(1, n + 1, block):
+                ranks = np.arange(start, min(start + block, n + 1), dtype=float)
+                total += (ranks ** -self.zipf_exponent).sum()
+            self._harmonic_cache[n] = total
+        return self._harmonic_cache[n]
+
+    def _build_market_shares(self, rng, start, size, total):
+        """Выручка участников рынка по закону Ципфа с мультипликативным шумом"""
+        ranks = np.arange(start, start + size) + 1
+        weights = ranks.astype(float) ** -self.zipf_exponent
+        revenue = 5e9 * weights * rng.lognormal(0, 0.3, size)
+        price = rng.lognormal(np.log(1200), 0.6, size)
+        share = 100 * weights / self._harmonic(total)
+        return ranks, revenue, price, share
+
+    def _build_brands_report(self, rng, start, size, total):
+        ranks, revenue, price, share = self._build_market_shares(rng, start, size, total)
+        products = np.maximum((revenue / 2e6 * rng.lognormal(0, 0.5, size)).astype(np.int64), 1)
+
+        return pd.DataFrame({
+            'Бренд': np.char.add('Бренд ', ranks.astype(str)).astype(object),
+            'Товары': products,
+            'Продавцы': np.maximum((products * rng.uniform(0.1, 0.6, size)).astype(np.int64), 1),
+            'Продажи': (revenue / price).astype(np.int64),
+            'Выручка, ₽': revenue.round(0),
+            'Средняя цена, ₽': price.round(0),
+            'Доля выручки, %': share.round(4)
+        })
+
+    def _build_sellers_report(self, rng, start, size, total):
+        ranks, revenue, price, share = self._build_market_shares(rng, start, size, total)
+        products = np.maximum((revenue / 2e6 * rng.lognormal(0, 0.5, size)).astype(np.int64), 1)
+
+        return pd.DataFrame({
+            'Продавец': np.char.add('Продавец ', ranks.astype(str)).astype(object),
+            'ИНН': (7700000000 + ranks).astype(str),
+            'Товары': products,
+            'Бренды': np.maximum((products * rng.uniform(0.02, 0.3, size)).astype(np.int64), 1),
+            'Продажи': (revenue / price).astype(np.int64),
+            'Выручка, ₽': revenue.round(0),
+            'Средняя цена, ₽': price.round(0),
+            'Доля выручки, %': share.round(4)
+        })
+
+    def _build_products_report(self, rng, start, size, total):
+        idx = np.arange(start, start + size)
+        price = rng.lognormal(np.log(1200), 0.7, size)
+        discount = rng.uniform(0, 0.5, size)
+        # Продажи товаров с тяжелым хвостом: большинство почти не продается
+        sales = (rng.pareto(1.1, size) * 5).astype(np.int64)
+        subject_idx = rng.integers(0, len(self._subjects), size)
+
+        return pd.DataFrame({
+            'Артикул': FIRST_ARTICLE + idx,
+            'Название': np.char.add('Товар ', (idx + 1).astype(str)).astype(object),
+            'Предмет': self._subjects[subject_idx],
+            'Бренд': self._brand_names[rng.choice(self.n_brands, size, p=self._brand_probs)],
+            'Продавец': self._seller_names[rng.choice(self.n_sellers, size, p=self._seller_probs)],
+            'Цена, ₽': price.round(0),
+            'Цена со скидкой, ₽': (price * (1 - discount)).round(0),
+            'Продажи': sales,
+            'Выручка, ₽': (sales * price * (1 - discount)).round(0),
+            'Рейтинг': rng.uniform(3.0, 5.0, size).round(1),
+            'Отзывы': (rng.pareto(1.1, size) * 10).astype(np.int64),
+            'Остаток': rng.integers(0, 5000, size)
+        })
+
+    def _build_keyword_frequency(self, rng, start, size, total):
+        idx = np.arange(start, start + size)
+        # Около 2% строк повторяют более ранний запрос (выгрузки пересекаются по запросам)
+        query = np.where(rng.random(size) < 0.02, rng.integers(0, np.maximum(idx, 1)), idx)
+        subject_idx = query % len(self._subjects)
+
+        return pd.DataFrame({
+            'Запрос': np.char.add('запрос ', (query + 1).astype(str)).astype(object),
+            'Предмет': self._subjects[subject_idx],
+            'Частота': np.maximum((rng.pareto(1.2, size) * 300).astype(np.int64), 1),
+            'Количество товаров': np.maximum(rng.lognormal(np.log(3000), 1.3, size), 1).astype(np.int64)
+        })
+
+    def write(self, file_type, rows, path, fmt=None, chunk_rows=200000):
+        """
+        Потоковая запись выгрузки в файл
+
+        Args:
+            file_type (str): Тип выгрузки
+            rows (int): Количество строк
+            path (str): Путь к файлу
+            fmt (str): 'csv', 'xlsx' или 'parquet' (по умолчанию - по расширению)
+            chunk_rows (int): Размер блока генерации
+
+        Returns:
+            dict: Путь, количество строк, размер файла и время записи
+        """
+        fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        writers = {'csv': _write_csv, 'xlsx': _write_xlsx, 'parquet': _write_parquet}
+        if fmt not in writers:
+            raise ValueError(f"Неподдерживаемый формат файла: {fmt}")
+
+        start = time.perf_counter()
+        writers[fmt](self.iter_chunks(file_type, rows, chunk_rows), path)
+
+        return {
+            'path': path,
+            'rows': rows,
+            'bytes': os.path.getsize(path),
+            'seconds': time.perf_counter() - start
+        }
+
+
+def _write_csv(chunks, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, sep=';', index=False, header=(i == 0))
+
+
+def _write_xlsx(chunks, path):
+    from openpyxl import Workbook
+
+    # Write-only режим: строки сразу уходят в поток, в памяти хранится только текущий блок
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = 0
+
+    for chunk in chunks:
+        values = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        for row in values:
+            if sheet is None or sheet_rows >= XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Данные {len(workbook.worksheets) + 1}")
+                sheet.append(list(chunk.columns))
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+
+    workbook.save(path)
+
+
+def _write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Для записи в Parquet установите pyarrow: pip install pyarrow")
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Генерация синтетических выгрузок MPStats')
+    parser.add_argument('file_type', choices=list(FILE_COLUMNS))
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'xlsx', 'parquet'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    generator = SyntheticMPStatsGenerator(seed=args.seed)
+    stats = generator.write(args.file_type, args.rows, args.path, fmt=args.format, chunk_rows=args.chunk_rows)
+    print(f"{stats['path']}: {stats['rows']} строк, {stats['bytes'] / 1024 ** 2:.1f} МБ "
+          f"за {stats['seconds']:.1f} с")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
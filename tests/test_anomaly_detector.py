@@ -0,0 +1,86 @@
+"""
+Потоковое обнаружение аномалий метрик ниш
+"""
+
+import numpy as np
+import pytest
+
+from utils.anomaly_detector import NicheAnomalyDetector, detect_against_history, list_anomalies
+
+_LEVELS = {'price_ad_ratio': 20.0, 'organic_percent': 60.0, 'revenue': 1e6, 'demand_ratio': 5.0}
+
+
+def _noisy_day(rng, n_niches):
+    # Ограниченный шум ±3% уровня: заметно выше минимального разброса детектора
+    return {name: level * (1 + rng.uniform(-0.03, 0.03, n_niches)) for name, level in _LEVELS.items()}
+
+
+def _run(days, detector, niches):
+    return [list_anomalies(detector.update_batch(niches, day)) for day in days]
+
+
+def test_flat_noise_raises_nothing():
+    rng = np.random.default_rng(1)
+    niches = [f"ниша {i}" for i in range(20)]
+    # Прогрев на 20 наблюдениях: разброс по шести значениям у 80 рядов иногда случайно мал
+    detector = NicheAnomalyDetector(warmup=20)
+
+    results = [detector.update_batch(niches, _noisy_day(rng, len(niches))) for _ in range(60)]
+
+    assert not any(result['flags'].any() for result in results)
+    assert max(np.nanmax(np.abs(result['z'])) for result in results[detector.warmup:]) < 3
+    assert detector.state('ниша 0')['revenue']['observations'] == 60
+
+
+def test_single_spike_is_flagged_once():
+    rng = np.random.default_rng(2)
+    niches = [f"ниша {i}" for i in range(20)]
+    days = [_noisy_day(rng, len(niches)) for _ in range(40)]
+    days[30]['organic_percent'][7] = 10.0
+    detector = NicheAnomalyDetector(warmup=20)
+
+    anomalies = _run(days, detector, niches)
+
+    flagged = [(day, item['niche'], item['metric'], item['direction'])
+               for day, items in enumerate(anomalies) for item in items]
+    assert flagged == [(30, 'ниша 7', 'organic_percent', 'down')]
+    # Выброс ограничивается при обновлении и почти не сдвигает базовый уровень
+    assert detector.state('ниша 7')['organic_percent']['expected'] == pytest.approx(60.0, rel=0.05)
+
+
+def test_scale_is_not_underestimated_after_warmup():
+    detector = NicheAnomalyDetector(metrics={'organic_percent': None})
+    for i in range(detector.warmup):
+        detector.update('ниша', {'organic_percent': 60.0 + (-1) ** i})
+
+    # Разброс первых наблюдений - среднее, а не EWMA, начатая с нуля
+    state = detector.state('ниша')['organic_percent']
+    assert state['scale'] > 1.0
+    assert detector.update('ниша', {'organic_percent': 61.0}) == []
+
+
+def test_warmup_and_missing_values():
+    detector = NicheAnomalyDetector(warmup=3)
+    for value in [100.0, 101.0]:
+        assert detector.update('ниша', {'revenue': value}) == []
+    # До накопления warmup наблюдений всплеск не проверяется
+    assert detector.update('ниша', {'revenue': 1e5}) == []
+
+    state = detector.state('ниша')
+    assert state['revenue']['observations'] == 3
+    assert state['organic_percent']['observations'] == 0
+    assert detector.state('другая') is None
+
+
+def test_detect_against_history():
+    history = [{'demand_ratio': 5.0 + 0.1 * (i % 3)} for i in range(10)]
+    anomalies = detect_against_history(history, {'demand_ratio': 50.0})
+    assert [(item['metric'], item['direction']) for item in anomalies] == [('demand_ratio', 'up')]
+    assert detect_against_history(history, {'demand_ratio': 5.1}) == []
+
+
+def test_invalid_input_rejected():
+    with pytest.raises(ValueError):
+        NicheAnomalyDetector(metrics={'revenue': 'sqrt'})
+    with pytest.raises(ValueError):
+        NicheAnomalyDetector().update_batch(['а', 'а'], {'revenue': [1.0, 2.0]})
@@ -0,0 +1,99 @@
+"""
+Извлечение метрик из нескольких выгрузок MPStats
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import MPStatsDataProcessor
+
+
+def _seo_export(first_article, organic_rows, rows=100):
+    """SEO-выгрузка: первые organic_rows позиций органические, остальные - рекламные"""
+    position = np.arange(1, rows + 1)
+    is_ad = position > organic_rows
+    return pd.DataFrame({
+        'Запрос': 'платье',
+        'Позиция': position,
+        'Позиция без рекламы': np.where(is_ad, np.nan, position),
+        'Ставка, ₽': np.where(is_ad, 100.0, np.nan),
+        'Артикул': first_article + position,
+        'Цена, ₽': 2000.0
+    })
+
+
+def test_multi_file_seo_organic_percent_is_combined_share():
+    processor = MPStatsDataProcessor()
+    first = _seo_export(10000000, organic_rows=80)
+    second = _seo_export(20000000, organic_rows=79)
+    assert processor.process_seo_results_file(first)['organic_percent'] == 80.0
+    assert processor.process_seo_results_file(second)['organic_percent'] == 79.0
+
+    metrics = processor.extract_metrics_from_files([
+        {'type': 'seo_results', 'dataframe': first, 'name': 'first.csv'},
+        {'type': 'seo_results', 'dataframe': second, 'name': 'second.csv'}
+    ])
+
+    assert metrics['organic_percent'] == 79.5
+    assert metrics['price_ad_ratio'] == 20.0
+    assert processor.validate_metrics(metrics)[0]
+
+
+def test_overlapping_seo_rows_are_counted_once():
+    processor = MPStatsDataProcessor()
+    first = _seo_export(10000000, organic_rows=80)
+    file_data_list = [
+        {'type': 'seo_results', 'dataframe': first, 'name': 'first.csv'},
+        {'type': 'seo_results', 'dataframe': first.copy(), 'name': 'second.csv'}
+    ]
+
+    merged, stats = processor.merge_overlapping_files(file_data_list)
+    assert [len(item['dataframe']) for item in merged] == [100, 0]
+    assert stats['seo_results']['kept_rows'] == 100
+
+    metrics = processor.extract_metrics_from_files(file_data_list)
+    assert metrics['organic_percent'] == 80.0
+
+
+def test_large_seo_export_organic_percent_stays_in_range():
+    processor = MPStatsDataProcessor()
+    big = pd.concat([_seo_export(10000000 + 1000 * i, organic_rows=90) for i in range(30)], ignore_index=True)
+
+    organic_percent = processor.process_seo_results_file(big)['organic_percent']
+    assert 0 <= organic_percent <= 100
+    assert organic_percent == 90.0
+
+
+def test_keyword_demand_ratio_uses_daily_scale():
+    processor = MPStatsDataProcessor()
+    keywords = pd.DataFrame({
+        'Запрос': ['платье летнее', 'платье женское'],
+        'Частота': [90000, 60000],
+        'Количество товаров': [800, 1000]
+    })
+
+    metrics = processor.extract_metrics_from_files([
+        {'type': 'keyword_frequency', 'dataframe': keywords, 'name': 'keywords.csv'}
+    ])
+
+    # 150 000 запросов в месяц = 5 000 в сутки на 1 000 товаров
+    assert metrics['demand_ratio'] == 5.0
+
+
+def test_organic_percent_uses_top_100_positions():
+    processor = MPStatsDataProcessor()
+    # 500 позиций: из первых 100 органические 80, дальше выдача почти целиком органическая
+    position = np.arange(1, 501)
+    is_ad = ((position <= 100) & (position % 5 == 0)) | (position > 480)
+    organic = np.where(is_ad, np.nan, np.cumsum(~is_ad))
+    export = pd.DataFrame({
+        'Позиция': position,
+        'Позиция без рекламы': organic,
+        'Ставка, ₽': np.where(is_ad, 100.0, np.nan),
+        'Артикул': 10000000 + position,
+        'Цена, ₽': 2000.0
+    })
+
+    metrics = processor.process_seo_results_file(export)
+    assert metrics['top_100_rows'] == 100
+    assert metrics['organic_percent'] == 80.0
@@ -0,0 +1,76 @@
+"""
+Потоковая выгрузка рейтинга в xlsx
+"""
+
+import io
+
+import numpy as np
+import openpyxl
+import pytest
+
+from utils.excel_exporter import EXPORT_COLUMNS, export_ranking, export_ranking_xlsx, iter_ranked_rows
+
+
+def _metrics(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'demand_ratio': rng.lognormal(1.5, 0.7, n),
+        'revenue': rng.lognormal(15, 1, n),
+        'price_ad_ratio': rng.lognormal(3, 0.5, n),
+        'organic_percent': rng.uniform(0, 100, n)
+    }
+
+
+def _read_sheets(output):
+    output.seek(0)
+    workbook = openpyxl.load_workbook(output, read_only=True)
+    try:
+        return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)]
+                for sheet in workbook.worksheets}
+    finally:
+        workbook.close()
+
+
+@pytest.mark.parametrize('count, sheet_rows', [(25, [10, 10, 5]), (20, [10, 10]), (7, [7]), (0, [0])])
+def test_rows_are_split_across_sheets_and_read_back(count, sheet_rows):
+    names = [f"Ниша {i}" for i in range(count)]
+    metrics = _metrics(count)
+    output = io.BytesIO()
+
+    result = export_ranking(names, metrics, output, max_sheet_rows=10)
+
+    assert result['rows'] == count
+    assert result['sheets'] == len(sheet_rows)
+    sheets = _read_sheets(output)
+    assert list(sheets) == ['Рейтинг'] + [f"Рейтинг {n}" for n in range(2, len(sheet_rows) + 1)]
+
+    header = [title for _, title, _ in EXPORT_COLUMNS]
+    data = []
+    for rows, expected_rows in zip(sheets.values(), sheet_rows):
+        assert rows[0] == header
+        assert len(rows) - 1 == expected_rows
+        data.extend(rows[1:])
+
+    expected = [list(row) for row in iter_ranked_rows(names, metrics)]
+    assert [row[0] for row in data] == list(range(1, count + 1))
+    for row, expected_row in zip(data, expected):
+        assert row[1:4] == expected_row[1:4]
+        assert np.allclose(row[4:12], expected_row[4:12])
+        assert (row[12] or '') == expected_row[12]
+
+
+def test_special_values_round_trip():
+    output = io.BytesIO()
+    rows = [(1, 'Ниша <&> "кавычки"\x01', float('nan'), None, np.int64(7), np.float32(1.5), True)]
+    columns = [(f"c{i}", f"Столбец {i}", 10) for i in range(len(rows[0]))]
+
+    export_ranking_xlsx(rows, output, columns=columns, sheet_title='Лист & "1"')
+
+    sheets = _read_sheets(output)
+    assert list(sheets) == ['Лист & "1"']
+    assert sheets['Лист & "1"'][1] == [1, 'Ниша <&> "кавычки"', None, None, 7, 1.5, True]
+
+
+def test_invalid_sheet_size_is_rejected():
+    with pytest.raises(ValueError):
+        export_ranking_xlsx([], io.BytesIO(), max_sheet_rows=0)
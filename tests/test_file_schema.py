@@ -0,0 +1,209 @@
+"""
+Определение типа выгрузки по содержимому и чтение только нужных столбцов
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from utils.data_processor import PROCESSOR_ROLES, MPStatsDataProcessor
+
+# Небольшие выгрузки каждого типа с заголовками MPStats и лишними столбцами
+_EXPORTS = {
+    'niche_selection': {
+        'Категория': ['Женщинам', 'Женщинам', 'Детям'],
+        'Предмет': ['Платья', 'Юбки', 'Игрушки'],
+        'Товаров': [1200, 800, 300],
+        'Брендов': [150, 90, 40],
+        'Продавцов': [300, 200, 70],
+        'Продаж': [5000, 2500, 900],
+        'Выручка, ₽': [9.5e6, 3.1e6, 1.2e6],
+        'Комментарий': ['', 'сезон', '']
+    },
+    'seo_results': {
+        'Запрос': ['платье'] * 4,
+        'Позиция': [1, 2, 3, 4],
+        'Позиция без рекламы': [1, np.nan, 2, 3],
+        'Ставка, ₽': [np.nan, 250.0, np.nan, np.nan],
+        'Реклама': ['нет', 'да', 'нет', 'нет'],
+        'Артикул': [101, 102, 103, 104],
+        'Цена, ₽': [1900.0, 2100.0, 2500.0, 1800.0],
+        'Рейтинг': [4.8, 4.6, 4.9, 4.7]
+    },
+    'brands_report': {
+        'Бренд': ['Alpha', 'Beta', 'Gamma'],
+        'Товаров': [40, 25, 10],
+        'Продавцов': [3, 2, 1],
+        'Продаж': [900, 400, 100],
+        'Выручка, ₽': [2.0e6, 8.0e5, 1.5e5],
+        'Доля выручки, %': [67.0, 28.0, 5.0]
+    },
+    'sellers_report': {
+        'Продавец': ['ИП Иванов', 'ООО Ромашка'],
+        'ИНН': ['771234567890', '7701234567'],
+        'Товаров': [120, 45],
+        'Брендов': [5, 2],
+        'Продаж': [1500, 300],
+        'Выручка, ₽': [3.0e6, 6.0e5],
+        'Доля, %': [83.0, 17.0]
+    },
+    'products_report': {
+        'Артикул': [101, 102, 103],
+        'Название': ['Платье летнее', 'Платье вечернее', 'Платье офисное'],
+        'Предмет': ['Платья'] * 3,
+        'Бренд': ['Alpha', 'Beta', 'Alpha'],
+        'Продавец': ['ИП Иванов', 'ООО Ромашка', 'ИП Иванов'],
+        'Цена со скидкой, ₽': [1500.0, 3200.0, 2100.0],
+        'Цена, ₽': [1900.0, 4000.0, 2600.0],
+        'Продаж': [300, 120, 80],
+        'Выручка, ₽': [4.5e5, 3.8e5, 1.7e5],
+        'Остаток': [40, 12, 0]
+    },
+    'keyword_frequency': {
+        'Запрос': ['платье', 'платье летнее', 'юбка'],
+        'Частотность': [120000, 45000, 30000],
+        'Товаров': [50000, 12000, 20000],
+        'Предмет': ['Платья', 'Платья', 'Юбки'],
+        'Динамика, %': [5.0, -2.0, 1.0]
+    }
+}
+
+# Процессоры, читающие DataFrame выгрузки (частотность запросов агрегируется отдельно)
+_PROCESSORS = {
+    'niche_selection': 'process_niche_selection_file',
+    'seo_results': 'process_seo_results_file',
+    'brands_report': 'process_brands_report_file'
+}
+
+
+def _upload(content, name):
+    buffer = io.BytesIO(content)
+    buffer.name = name
+    return buffer
+
+
+def _csv(df, sep=';'):
+    return df.to_csv(index=False, sep=sep).encode('utf-8')
+
+
+def _xlsx(rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _xlsx_from_frame(df):
+    rows = [list(df.columns)]
+    rows += [[None if pd.isna(value) else value for value in row] for row in df.itertuples(index=False)]
+    return _xlsx(rows)
+
+
+@pytest.mark.parametrize('sep', [';', ',', '\t'])
+def test_sniff_detects_csv_separator(sep):
+    df = pd.DataFrame(_EXPORTS['brands_report']).drop(columns=['Выручка, ₽'])
+    sniffed = MPStatsDataProcessor().sniff_file(_upload(_csv(df, sep), 'brands.csv'))
+
+    assert sniffed['separator'] == sep
+    assert sniffed['header'] == list(df.columns)
+    assert len(sniffed['sample']) == len(df)
+
+
+def test_sniff_reads_only_sample_rows_and_rewinds():
+    df = pd.DataFrame({'Запрос': [f"запрос {i}" for i in range(1000)], 'Частотность': np.arange(1000)})
+    upload = _upload(_csv(df), 'keywords.csv')
+    sniffed = MPStatsDataProcessor().sniff_file(upload, sample_rows=5)
+
+    assert len(sniffed['sample']) == 5
+    assert upload.tell() == 0
+
+
+def test_sniff_xlsx_header_matches_read_excel():
+    content = _xlsx([
+        ['Бренд', None, 'Бренд', 'Выручка'],
+        ['Alpha', 1, 'a', 100],
+        ['Beta', 2, 'b', 200]
+    ])
+    sniffed = MPStatsDataProcessor().sniff_file(_upload(content, 'brands.xlsx'))
+
+    expected = pd.read_excel(io.BytesIO(content))
+    assert sniffed['header'] == list(expected.columns) == ['Бренд', 'Unnamed: 1', 'Бренд.1', 'Выручка']
+    assert sniffed['separator'] is None
+    assert sniffed['sample']['Выручка'].tolist() == [100, 200]
+
+
+@pytest.mark.parametrize('file_type', list(_EXPORTS))
+@pytest.mark.parametrize('extension', ['csv', 'xlsx'])
+def test_detect_schema_by_content(file_type, extension):
+    df = pd.DataFrame(_EXPORTS[file_type])
+    content = _csv(df) if extension == 'csv' else _xlsx_from_frame(df)
+    # Нейтральное имя: тип определяется только по столбцам
+    schema = MPStatsDataProcessor().detect_file_schema(_upload(content, f"export.{extension}"))
+
+    assert schema['type'] == file_type
+    assert schema['source'] == 'content'
+    assert schema['header'] == list(df.columns)
+
+
+def test_detect_schema_falls_back_to_filename():
+    df = pd.DataFrame({'Бренд': ['Alpha'], 'Комментарий': ['нет данных']})
+    schema = MPStatsDataProcessor().detect_file_schema(_upload(_csv(df), 'Отчет по брендам.csv'))
+    assert (schema['type'], schema['source']) == ('brands_report', 'filename')
+    assert schema['columns'] == {'brand': 'Бренд'}
+
+    unreadable = MPStatsDataProcessor().detect_file_schema(_upload(b'', 'export.xlsx'))
+    assert (unreadable['type'], unreadable['header']) == ('unknown', [])
+
+
+@pytest.mark.parametrize('file_type', list(PROCESSOR_ROLES))
+def test_select_columns_keeps_processor_roles(file_type):
+    processor = MPStatsDataProcessor()
+    df = pd.DataFrame(_EXPORTS[file_type])
+    content = _csv(df)
+    schema = processor.detect_file_schema(_upload(content, 'export.csv'))
+    usecols = processor.select_columns(schema)
+
+    mapped = [schema['columns'][role] for role in PROCESSOR_ROLES[file_type] if role in schema['columns']]
+    assert set(mapped) <= set(usecols)
+    assert len(usecols) < len(df.columns)
+    assert usecols == [col for col in df.columns if col in usecols]
+
+    projected = processor.load_dataframe(_upload(content, 'export.csv'), usecols=usecols, separator=';')
+    assert list(projected.columns) == usecols
+    if file_type in _PROCESSORS:
+        process = getattr(processor, _PROCESSORS[file_type])
+        assert process(projected) == process(df)
+
+
+def test_select_columns_reads_everything_for_other_types():
+    processor = MPStatsDataProcessor()
+    schema = processor.detect_file_schema(_upload(_csv(pd.DataFrame(_EXPORTS['sellers_report'])), 'export.csv'))
+    assert processor.select_columns(schema) is None
+
+
+def test_read_excel_columns_matches_read_excel():
+    df = pd.DataFrame(_EXPORTS['seo_results'])
+    rows = [list(df.columns)]
+    rows += [[None if pd.isna(value) else value for value in row] for row in df.itertuples(index=False)]
+    # Пустая строка в середине листа, строка короче заголовка и пустые строки в конце
+    rows.insert(3, [None] * len(df.columns))
+    rows += [['платье', 5, 4], [None] * len(df.columns), [None] * len(df.columns)]
+    content = _xlsx(rows)
+
+    processor = MPStatsDataProcessor()
+    usecols = ['Позиция без рекламы', 'Ставка, ₽', 'Артикул', 'Цена, ₽']
+    projected = processor._read_excel_columns(_upload(content, 'seo.xlsx'), usecols)
+    expected = pd.read_excel(io.BytesIO(content))[usecols]
+
+    pd.testing.assert_frame_equal(projected, expected, check_dtype=False)
+    chunks = list(processor.iter_dataframe_chunks(_upload(content, 'seo.xlsx'), usecols=usecols, chunk_rows=2))
+    # Столбец блока без значений остается столбцом None: сравниваются числа
+    pd.testing.assert_frame_equal(pd.concat(chunks).apply(pd.to_numeric), expected, check_dtype=False)
+
+    with pytest.raises(ValueError):
+        processor._read_excel_columns(_upload(content, 'seo.xlsx'), ['Цена, ₽', 'Остаток'])
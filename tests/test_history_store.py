@@ -0,0 +1,26 @@
+"""
+Хранилище истории метрик ниш
+"""
+
+from utils.history_store import QUERY_NICHES_CHUNK, NicheHistoryStore
+
+
+def _metrics(i):
+    return {'demand_ratio': 1.0 + i, 'revenue': 1000000.0, 'price_ad_ratio': 20.0, 'organic_percent': 50.0}
+
+
+def test_query_with_more_niches_than_sqlite_variable_limit():
+    count = 2 * QUERY_NICHES_CHUNK + 300
+    names = [f"Ниша {i:05d}" for i in range(count)]
+    with NicheHistoryStore(':memory:') as store:
+        store.append_many(
+            {'niche': name, 'metrics': _metrics(i), 'date': date}
+            for i, name in enumerate(names) for date in ('2024-01-01', '2024-01-02')
+        )
+
+        rows = store.query(list(reversed(names)) + ['Нет такой ниши'], start='2024-01-02')
+
+        assert len(rows) == count
+        assert [row[0] for row in rows] == sorted(names)
+        assert all(row[1] == '2024-01-02' for row in rows)
+        assert rows == store.query(start='2024-01-02')
@@ -0,0 +1,207 @@
+"""
+Фоновые задачи анализа
+"""
+
+import threading
+
+import pytest
+
+from utils.data_processor import MPStatsDataProcessor
+from utils.jobs import (
+    JOB_STAGES, STATUS_CANCELLED, STATUS_DONE, STATUS_FAILED, AnalysisJob, AnalysisJobManager
+)
+from utils.memory_manager import DataFrameMemoryManager
+
+
+class _GatedProcessor(MPStatsDataProcessor):
+    """Обработчик, который ждет разрешения перед разбором каждого файла"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def detect_file_schema(self, uploaded_file):
+        self.started.set()
+        assert self.release.wait(10)
+        return super().detect_file_schema(uploaded_file)
+
+
+class _FailingProcessor(MPStatsDataProcessor):
+    def validate_metrics(self, metrics):
+        raise RuntimeError('сбой проверки')
+
+
+def _products_csv(first_article, rows=20):
+    lines = ['Артикул;Название;Предмет;Цена;Остаток']
+    lines += [f"{first_article + i};Платье {i};Платья;{1500 + i};{10 + i}" for i in range(rows)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _wait(manager, job_id):
+    manager._jobs[job_id].future.result(timeout=30)
+    return manager.get_status(job_id)
+
+
+@pytest.fixture
+def manager():
+    manager = AnalysisJobManager(MPStatsDataProcessor(), max_workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def test_snapshot_progress_follows_stages():
+    job = AnalysisJob('job', [('a.csv', b'')], {}, {})
+    assert job.snapshot()['progress'] == 0.0
+
+    job.set_stage('aggregate', 0.5, 'Агрегация')
+    snapshot = job.snapshot()
+    assert snapshot['progress'] == 2.5 / len(JOB_STAGES)
+    assert snapshot['stage_name'] == dict(JOB_STAGES)['aggregate']
+    assert snapshot['message'] == 'Агрегация'
+
+    # Доля этапа ограничена отрезком [0, 1]
+    job.set_stage('score', 3.0)
+    assert job.snapshot()['progress'] == 1.0
+    job.set_stage('parse', -1.0)
+    assert job.snapshot()['progress'] == 0.0
+
+
+def test_cancel_before_run():
+    processor = _GatedProcessor()
+    manager = AnalysisJobManager(processor, max_workers=1)
+    try:
+        running = manager.submit([('a.csv', _products_csv(10000000))])
+        assert processor.started.wait(10)
+        queued = manager.submit([('b.csv', _products_csv(20000000))])
+
+        assert manager.cancel(queued)
+        assert manager.get_status(queued)['status'] == STATUS_CANCELLED
+
+        processor.release.set()
+        assert _wait(manager, running)['status'] == STATUS_DONE
+        assert manager.get_result(queued) is None
+        assert not manager.cancel(running)
+    finally:
+        processor.release.set()
+        manager.shutdown()
+
+
+def test_cancel_during_run():
+    processor = _GatedProcessor()
+    manager = AnalysisJobManager(processor, max_workers=1)
+    try:
+        job_id = manager.submit([('a.csv', _products_csv(10000000)), ('b.csv', _products_csv(20000000))])
+        assert processor.started.wait(10)
+
+        assert manager.cancel(job_id)
+        processor.release.set()
+
+        status = _wait(manager, job_id)
+        assert status['status'] == STATUS_CANCELLED
+        assert manager.get_result(job_id) is None
+    finally:
+        processor.release.set()
+        manager.shutdown()
+
+
+def test_finished_jobs_are_evicted_past_limit():
+    memory_manager = DataFrameMemoryManager()
+    manager = AnalysisJobManager(MPStatsDataProcessor(), max_workers=1, max_finished_jobs=2,
+                                 memory_manager=memory_manager)
+    try:
+        job_ids = []
+        for i in range(4):
+            job_ids.append(manager.submit([('a.csv', _products_csv(10000000 * (i + 1)))], owner='session'))
+            assert _wait(manager, job_ids[-1])['status'] == STATUS_DONE
+
+        assert [job['job_id'] for job in manager.list_jobs()] == job_ids[2:]
+        assert manager.get_status(job_ids[0]) is None
+        assert manager.get_frame(job_ids[0], 0) is None
+        assert len(manager.get_frame(job_ids[-1], 0)) == 20
+        assert memory_manager.usage('session')['frames'] == 2
+    finally:
+        manager.shutdown()
+        memory_manager.close()
+
+
+def test_failed_file_is_reported_without_failing_job(manager):
+    job_id = manager.submit([('broken.xlsx', b'not an xlsx file'), ('a.csv', _products_csv(10000000))])
+
+    assert _wait(manager, job_id)['status'] == STATUS_DONE
+    broken, products = manager.get_result(job_id)['files']
+    assert broken['error']
+    assert broken['rows'] == 0 and broken['preview'] is None
+    assert products['error'] is None and products['rows'] == 20
+
+
+def test_job_fails_when_analysis_raises():
+    manager = AnalysisJobManager(_FailingProcessor(), max_workers=1)
+    try:
+        job_id = manager.submit([('a.csv', _products_csv(10000000))])
+        status = _wait(manager, job_id)
+        assert status['status'] == STATUS_FAILED
+        assert status['error'] == 'сбой проверки'
+        assert manager.get_result(job_id) is None
+    finally:
+        manager.shutdown()
+
+
+def test_files_with_same_name_keep_separate_frames():
+    memory_manager = DataFrameMemoryManager()
+    manager = AnalysisJobManager(MPStatsDataProcessor(), max_workers=1, memory_manager=memory_manager)
+    try:
+        job_id = manager.submit([
+            ('products_report.csv', _products_csv(10000000, rows=20)),
+            ('products_report.csv', _products_csv(20000000, rows=30))
+        ])
+        assert _wait(manager, job_id)['status'] == STATUS_DONE
+
+        assert len(manager.get_frame(job_id, 0)) == 20
+        assert len(manager.get_frame(job_id, 1)) == 30
+    finally:
+        manager.shutdown()
+        memory_manager.close()
+
+
+def test_aggregated_keyword_file_reports_source_shape(manager):
+    header = 'Запрос;Частота;Количество товаров;Комментарий;Регион\n'
+    rows = ''.join(f'запрос {i};{100 + i};{50 + i};-;RU\n' for i in range(40))
+    job_id = manager.submit([('keywords.csv', (header + rows).encode('utf-8'))])
+
+    assert _wait(manager, job_id)['status'] == STATUS_DONE
+    file_info = manager.get_result(job_id)['files'][0]
+    assert file_info['type'] == 'keyword_frequency'
+    assert file_info['rows'] == 40
+    assert file_info['columns'] == 5
+
+
+def _seo_csv(first_article, organic_rows, rows=150):
+    lines = ['Запрос;Позиция;Позиция без рекламы;Ставка, ₽;Артикул;Цена, ₽']
+    organic = 0
+    for position in range(1, rows + 1):
+        if position <= organic_rows:
+            organic += 1
+            lines.append(f"платье;{position};{organic};;{first_article + position};2000")
+        else:
+            lines.append(f"платье;{position};;100;{first_article + position};2000")
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def test_overlapping_seo_exports_are_merged_while_reading(manager):
+    files = [
+        ('seo.csv', _seo_csv(10000000, organic_rows=80)),
+        # Тот же файл из другой папки: все артикулы уже встречались
+        ('seo.csv', _seo_csv(10000000, organic_rows=80)),
+        ('seo_2.csv', _seo_csv(20000000, organic_rows=70))
+    ]
+    job_id = manager.submit(files)
+    assert _wait(manager, job_id)['status'] == STATUS_DONE
+    result = manager.get_result(job_id)
+
+    assert [(info['rows'], info['kept_rows']) for info in result['files']] == [(150, 150), (150, 0), (150, 150)]
+    stats = result['deduplication']['seo_results']
+    assert stats['kept_rows'] == 300
+    assert [item['name'] for item in stats['files']] == ['seo.csv', 'seo.csv (2)', 'seo_2.csv']
+    assert result['metrics']['organic_percent'] == 75.0
+    assert result['is_valid']
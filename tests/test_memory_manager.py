@@ -0,0 +1,130 @@
+"""
+Учет памяти DataFrame по сессиям и вытеснение на диск
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.memory_manager import DataFrameMemoryManager
+
+
+def _frame(rows=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'price': rng.random(rows), 'sales': rng.integers(0, 100, rows)})
+
+
+FRAME_BYTES = int(_frame().memory_usage(deep=True).sum())
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = DataFrameMemoryManager(
+        session_limit_bytes=int(FRAME_BYTES * 2.5),
+        global_limit_bytes=int(FRAME_BYTES * 4.5),
+        spill_dir=str(tmp_path / 'spill')
+    )
+    yield manager
+    manager.close()
+
+
+def _spilled_files(manager):
+    return sorted(os.listdir(manager.spill_dir))
+
+
+def test_least_recently_used_frame_is_spilled_and_reloaded(manager):
+    frames = {key: _frame(seed=i) for i, key in enumerate('abc')}
+    manager.put('s1', 'a', frames['a'])
+    manager.put('s1', 'b', frames['b'])
+    # Обращение к 'a' делает ее недавно использованной: вытесняется 'b'
+    manager.get('s1', 'a')
+    manager.put('s1', 'c', frames['c'])
+
+    usage = manager.usage('s1')
+    assert usage['frames'] == 3 and usage['spilled_frames'] == 1
+    assert usage['memory_bytes'] == 2 * FRAME_BYTES and usage['spilled_bytes'] == FRAME_BYTES
+    assert len(_spilled_files(manager)) == 1
+
+    # Загрузка с диска удаляет файл и вытесняет следующую по давности таблицу ('a')
+    pd.testing.assert_frame_equal(manager.get('s1', 'b'), frames['b'])
+    usage = manager.usage('s1')
+    assert usage['spilled_frames'] == 1 and usage['memory_bytes'] == 2 * FRAME_BYTES
+    pd.testing.assert_frame_equal(manager.get('s1', 'a'), frames['a'])
+    assert len(_spilled_files(manager)) == 1
+
+
+def test_usage_is_accounted_per_owner(manager):
+    manager.put('s1', 'a', _frame())
+    manager.put('s2', 'a', _frame())
+    manager.put('s2', 'b', _frame())
+
+    assert manager.usage('s1')['frames'] == 1
+    assert manager.usage('s1')['memory_bytes'] == FRAME_BYTES
+    assert manager.usage('s2')['frames'] == 2
+    assert manager.usage('s1')['limit_bytes'] == manager.session_limit_bytes
+
+    total = manager.usage()
+    assert total['frames'] == 3 and total['memory_bytes'] == 3 * FRAME_BYTES
+    assert total['limit_bytes'] == manager.global_limit_bytes
+
+    # Тот же ключ в другой сессии - другая таблица; повторный put заменяет запись
+    manager.put('s1', 'a', _frame(rows=10))
+    assert manager.usage('s1')['frames'] == 1
+    assert len(manager.get('s2', 'a')) == 1000
+
+
+def test_session_limit_spills_only_own_frames(manager):
+    manager.put('s1', 'a', _frame())
+    for key in 'abc':
+        manager.put('s2', key, _frame())
+
+    assert manager.usage('s1')['spilled_frames'] == 0
+    assert manager.usage('s2')['spilled_frames'] == 1
+    assert manager.usage('s2')['memory_bytes'] <= manager.session_limit_bytes
+
+
+def test_global_limit_spills_across_sessions(manager):
+    for session in ('s1', 's2', 's3'):
+        manager.put(session, 'a', _frame())
+        manager.put(session, 'b', _frame())
+
+    total = manager.usage()
+    assert total['memory_bytes'] <= manager.global_limit_bytes
+    assert total['spilled_frames'] == 2
+    # Вытесняются самые давние таблицы - первой сессии
+    assert manager.usage('s1')['spilled_frames'] == 2
+
+
+def test_frame_larger_than_limit_stays_in_memory(manager):
+    big = _frame(rows=5000)
+    manager.put('s1', 'small', _frame())
+    manager.put('s1', 'big', big)
+
+    assert ('s1', 'big') in manager
+    assert manager.usage('s1')['spilled_frames'] == 1
+    assert manager.get('s1', 'big') is big
+
+
+def test_remove_deletes_spilled_file(manager):
+    for key in 'abc':
+        manager.put('s1', key, _frame())
+    assert len(_spilled_files(manager)) == 1
+
+    assert manager.remove('s1', 'a')
+    assert _spilled_files(manager) == []
+    assert manager.get('s1', 'a') is None
+    assert not manager.remove('s1', 'a')
+
+
+def test_clear_session_removes_only_its_frames(manager):
+    for key in 'abc':
+        manager.put('s1', key, _frame())
+    manager.put('s2', 'a', _frame())
+
+    manager.clear_session('s1')
+
+    assert manager.usage('s1')['frames'] == 0
+    assert _spilled_files(manager) == []
+    assert manager.usage('s2')['frames'] == 1
@@ -0,0 +1,57 @@
+"""
+Процентили ниш внутри категорий
+"""
+
+import numpy as np
+
+from utils.percentiles import METRIC_COLUMNS, CategoryPercentileIndex
+
+
+def _catalog(rng, n):
+    return {
+        'demand_ratio': rng.lognormal(1.5, 0.7, n),
+        'revenue': rng.lognormal(15, 1, n),
+        'price_ad_ratio': rng.lognormal(3, 0.5, n),
+        'organic_percent': rng.uniform(0, 100, n)
+    }
+
+
+def test_batch_percentiles_match_single_queries():
+    rng = np.random.default_rng(0)
+    categories = rng.choice(['Платья', 'Обувь', 'Сумки', 'Игрушки'], 2000)
+    index = CategoryPercentileIndex().build(categories, _catalog(rng, 2000))
+
+    query_categories = np.r_[rng.choice(index.categories, 300), ['Неизвестная']]
+    query_metrics = _catalog(rng, len(query_categories))
+    batch = index.percentiles_batch(query_categories, query_metrics)
+
+    for i, category in enumerate(query_categories[:-1]):
+        single = index.percentile(category, {column: query_metrics[column][i] for column in METRIC_COLUMNS})
+        assert np.isclose(batch['final_rating'][i], single['final_rating'])
+        for column in METRIC_COLUMNS:
+            assert np.isclose(batch['metrics'][column][i], single['metrics'][column])
+        for column, value in single['breakdown'].items():
+            assert np.isclose(batch['breakdown'][column][i], value)
+
+    assert np.isnan(batch['final_rating'][-1])
+
+
+def test_single_query_uses_unrounded_rating():
+    # Ниши различаются только сотыми долями процента органики: рейтинги почти равны
+    organic = 50 + 0.01 * np.arange(10)
+    metrics = {
+        'demand_ratio': np.full(10, 5.0),
+        'revenue': np.full(10, 2500000.0),
+        'price_ad_ratio': np.full(10, 20.0),
+        'organic_percent': organic
+    }
+    index = CategoryPercentileIndex().build(['Платья'] * 10, metrics)
+
+    niche = {column: float(values[4]) for column, values in metrics.items()}
+    annotated = index.annotate('Платья', niche, index.calculator.calculate_rating(niche))
+
+    # Ниже 4 ниши и одна равная: (4 + 0.5) / 10
+    assert annotated['percentiles']['final_rating'] == 45.0
+    assert annotated['percentiles']['final_rating'] == index.percentiles_batch(['Платья'], {
+        column: [value] for column, value in niche.items()
+    })['final_rating'][0]
@@ -0,0 +1,23 @@
+"""
+Пакетная генерация HTML-отчетов
+"""
+
+from utils.report_builder import build_niche_report
+
+
+def test_empty_niche_list_writes_valid_report(tmp_path):
+    path = tmp_path / 'report.html'
+    result = build_niche_report([], str(path), executor='thread')
+
+    assert result['files'] == [str(path)]
+    assert result['niches'] == 0
+    content = path.read_text(encoding='utf-8')
+    assert content.startswith('<!DOCTYPE html>')
+    assert 'Нет ниш для отчета' in content
+    assert content.rstrip().endswith('</html>')
+
+
+def test_empty_niche_list_writes_one_shard(tmp_path):
+    result = build_niche_report([], str(tmp_path / 'shards'), shard_size=10, executor='thread')
+
+    assert [p.rsplit('/', 1)[-1] for p in result['files']] == ['report_0001.html']
@@ -0,0 +1,79 @@
+"""
+Скользящий рейтинг ниш
+"""
+
+import random
+
+from numpy.testing import assert_allclose
+
+from utils.calculator import ProductRatingCalculator
+from utils.rolling_rating import SCORE_KEYS, RollingRatingAggregator, rolling_rating_full
+
+
+def _random_metrics(rng):
+    return {
+        'demand_ratio': rng.uniform(0.5, 15),
+        'revenue': rng.uniform(5e5, 5e7),
+        'price_ad_ratio': rng.uniform(0, 60),
+        'organic_percent': rng.uniform(0, 100)
+    }
+
+
+def _assert_matches_full(rolling, calculator, niche, history):
+    # Сравниваются неокругленные значения: инкрементальные суммы могут отличаться
+    # от полного пересчета в последних разрядах, а округление усилило бы разницу до 0.1
+    for window in rolling.windows:
+        incremental = rolling.get_rating(niche, window, decimals=None)
+        full = rolling_rating_full(calculator, history, window, decimals=None)
+        assert_allclose(incremental['final_rating'], full['final_rating'], rtol=0, atol=1e-9)
+        assert_allclose(
+            [incremental['breakdown'][key] for key in SCORE_KEYS],
+            [full['breakdown'][key] for key in SCORE_KEYS],
+            rtol=0, atol=1e-9
+        )
+        assert incremental['periods'] == min(len(history), window)
+
+
+def test_rolling_rating_equals_full_recompute():
+    rng = random.Random(0)
+    calculator = ProductRatingCalculator()
+    rolling = RollingRatingAggregator(calculator)
+    history = []
+
+    for period in range(40):
+        metrics = _random_metrics(rng)
+        rolling.update('Маски для волос', metrics, period=period)
+        history.append(metrics)
+        _assert_matches_full(rolling, calculator, 'Маски для волос', history)
+
+        # Уточнение текущего периода заменяет его данные
+        if period % 3 == 0:
+            metrics = _random_metrics(rng)
+            rolling.update('Маски для волос', metrics, period=period)
+            history[-1] = metrics
+            _assert_matches_full(rolling, calculator, 'Маски для волос', history)
+
+
+def test_rolling_rating_after_threshold_change_and_resync():
+    rng = random.Random(1)
+    calculator = ProductRatingCalculator()
+    rolling = RollingRatingAggregator(calculator)
+    history = [_random_metrics(rng) for _ in range(15)]
+    for period, metrics in enumerate(history):
+        rolling.update('Платья', metrics, period=period)
+
+    calculator.update_thresholds({'min_revenue': 3000000, 'min_demand_ratio': 4.0})
+    rolling.resync()
+
+    _assert_matches_full(rolling, calculator, 'Платья', history)
+
+
+def test_rolling_rating_stays_close_over_long_history():
+    rng = random.Random(2)
+    calculator = ProductRatingCalculator()
+    rolling = RollingRatingAggregator(calculator)
+    history = [_random_metrics(rng) for _ in range(2500)]
+    for period, metrics in enumerate(history):
+        rolling.update('Сумки', metrics, period=period)
+
+    _assert_matches_full(rolling, calculator, 'Сумки', history)
@@ -0,0 +1,72 @@
+"""
+Куб агрегатов категория → подкатегория → ниша
+"""
+
+import numpy as np
+
+from utils.rollup_cube import RollupCube
+
+
+def _catalog(rng, names):
+    n = len(names)
+    categories = list(rng.choice(['Одежда', 'Обувь', 'Дом'], n))
+    subcategories = [f"{category} {code}" for category, code in zip(categories, rng.integers(0, 4, n))]
+    metrics = {
+        'demand_ratio': rng.lognormal(1.5, 0.7, n),
+        'revenue': rng.lognormal(15, 1, n),
+        'price_ad_ratio': rng.lognormal(3, 0.5, n),
+        'organic_percent': rng.uniform(0, 100, n)
+    }
+    return {'niches': list(names), 'categories': categories, 'subcategories': subcategories, 'metrics': metrics}
+
+
+def _assert_same_summary(left, right):
+    if right is None:
+        assert left is None
+        return
+    assert left['path'] == right['path']
+    assert left['niches'] == right['niches']
+    for name, stats in right['measures'].items():
+        for key, value in stats.items():
+            if value is None:
+                assert left['measures'][name][key] is None
+            else:
+                assert np.isclose(left['measures'][name][key], value), (name, key)
+
+
+def test_incremental_updates_equal_rebuild():
+    rng = np.random.default_rng(0)
+    names = [f"Ниша {i}" for i in range(500)]
+    initial = _catalog(rng, names)
+
+    cube = RollupCube()
+    cube.upsert(initial['niches'], initial['categories'], initial['subcategories'], initial['metrics'])
+
+    # Повторный расчет части ниш: новые метрики и переезд в другие группы
+    changed = _catalog(rng, names[100:300])
+    cube.upsert(changed['niches'], changed['categories'], changed['subcategories'], changed['metrics'])
+    cube.remove(names[450:])
+
+    final = {}
+    for source in (initial, changed):
+        for i, niche in enumerate(source['niches']):
+            final[niche] = (
+                source['categories'][i], source['subcategories'][i],
+                {column: values[i] for column, values in source['metrics'].items()}
+            )
+    kept = names[:450]
+    rebuilt = RollupCube()
+    rebuilt.upsert(
+        kept, [final[niche][0] for niche in kept], [final[niche][1] for niche in kept],
+        {column: np.array([final[niche][2][column] for niche in kept]) for column in initial['metrics']}
+    )
+
+    paths = [()] + [(category,) for category in ('Одежда', 'Обувь', 'Дом')]
+    paths += [(category, f"{category} {code}") for category in ('Одежда', 'Обувь', 'Дом') for code in range(4)]
+    for path in paths:
+        _assert_same_summary(cube.summary(path), rebuilt.summary(path))
+
+    for path in paths[4:]:
+        assert cube.drill_down(path) == rebuilt.drill_down(path)
+    assert [item['path'] for item in cube.drill_down()] == [item['path'] for item in rebuilt.drill_down()]
+    assert cube.niche(names[-1]) is None
@@ -0,0 +1,68 @@
+"""
+Сезонное разложение рядов ниш
+"""
+
+import numpy as np
+import pytest
+
+from utils.seasonality import decompose_seasonal, latest_adjusted, peak_months
+
+_MONTHS = 48
+
+
+def _sine(amplitude, phase=0):
+    return amplitude * np.sin(2 * np.pi * (np.arange(_MONTHS) + phase) / 12)
+
+
+def test_additive_decomposition_recovers_trend_and_sine():
+    # Линейный тренд плюс синус: центрированное среднее 2×12 восстанавливает тренд точно
+    trend = 100 + 2.0 * np.arange(_MONTHS)
+    values = np.vstack([trend + _sine(10), trend + _sine(5, phase=3)])
+    result = decompose_seasonal(values, model='additive')
+
+    interior = slice(6, _MONTHS - 6)
+    np.testing.assert_allclose(result['trend'][:, interior], np.vstack([trend, trend])[:, interior])
+    assert np.isnan(result['trend'][:, :6]).all() and np.isnan(result['trend'][:, -6:]).all()
+
+    np.testing.assert_allclose(result['seasonal_indices'][0], _sine(10)[:12], atol=1e-9)
+    np.testing.assert_allclose(result['seasonal_indices'][1], _sine(5, phase=3)[:12], atol=1e-9)
+    np.testing.assert_allclose(result['residual'][:, interior], 0, atol=1e-9)
+    np.testing.assert_allclose(result['adjusted'], np.vstack([trend, trend]), atol=1e-9)
+    np.testing.assert_allclose(result['seasonal_strength'], 1.0)
+
+
+def test_multiplicative_indices_average_to_one():
+    level = 1000 * np.ones(_MONTHS)
+    factors = 1 + _sine(0.3)
+    result = decompose_seasonal(level * factors, model='multiplicative')
+
+    np.testing.assert_allclose(result['trend'][0, 6:-6], 1000)
+    np.testing.assert_allclose(result['seasonal_indices'][0], factors[:12])
+    assert np.isclose(result['seasonal_indices'][0].mean(), 1.0)
+    np.testing.assert_allclose(latest_adjusted(result, window=3), [1000])
+    np.testing.assert_allclose(result['seasonal_strength'], 1.0)
+
+
+def test_multiplicative_with_growth_stays_close():
+    trend = 500 + 10.0 * np.arange(_MONTHS)
+    factors = 1 + _sine(0.2)
+    result = decompose_seasonal(trend * factors)
+
+    np.testing.assert_allclose(result['seasonal_indices'][0], factors[:12], atol=0.01)
+    np.testing.assert_allclose(result['trend'][0, 6:-6], trend[6:-6], rtol=0.01)
+    assert result['seasonal_strength'][0] > 0.95
+
+
+def test_start_month_rolls_indices_to_calendar():
+    values = 1000 * (1 + _sine(0.3))
+    # Пик синуса - на четвертой позиции ряда; ряд начинается с марта
+    shifted = decompose_seasonal(values, start_month=2)
+    assert peak_months(decompose_seasonal(values))[0, 0] == 3
+    assert peak_months(shifted)[0, 0] == 5
+
+
+def test_short_series_rejected():
+    with pytest.raises(ValueError):
+        decompose_seasonal(np.ones(23))
+    with pytest.raises(ValueError):
+        decompose_seasonal(np.ones(48), model='log')
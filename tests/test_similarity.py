@@ -0,0 +1,72 @@
+"""
+Индекс похожих ниш
+"""
+
+import numpy as np
+import pytest
+
+from utils.similarity import BREAKDOWN_FEATURES, NicheSimilarityIndex
+
+
+def _scores(rng, n):
+    return {key: rng.uniform(0, 100, n) for key in BREAKDOWN_FEATURES}
+
+
+def _brute_force(points, query, k):
+    distances = np.sqrt(((points - query) ** 2).sum(axis=1))
+    order = np.argsort(distances, kind='stable')[:k]
+    return order, distances[order]
+
+
+def test_blocked_knn_matches_brute_force():
+    rng = np.random.default_rng(0)
+    names = [f"ниша {i}" for i in range(1000)]
+    scores = _scores(rng, len(names))
+    # Маленький блок: кандидаты сливаются через много блоков, последний - неполный
+    index = NicheSimilarityIndex(block_size=37)
+    index.add_batch(names, scores)
+
+    points = np.column_stack([scores[key] for key in BREAKDOWN_FEATURES])
+    queries = rng.uniform(0, 100, (25, len(BREAKDOWN_FEATURES)))
+    # Без стандартизации индекс только сдвигает оценки к середине шкалы
+    results = index.knn_batch(queries - 50.0, k=10)
+
+    for query, neighbours in zip(queries, results):
+        order, distances = _brute_force(points, query, 10)
+        assert [name for name, _ in neighbours] == [names[i] for i in order]
+        np.testing.assert_allclose([distance for _, distance in neighbours], distances, rtol=1e-4, atol=1e-3)
+
+
+def test_similar_to_excludes_itself_and_matches_brute_force():
+    rng = np.random.default_rng(1)
+    names = [f"ниша {i}" for i in range(300)]
+    scores = _scores(rng, len(names))
+    index = NicheSimilarityIndex(block_size=64)
+    index.add_batch(names, scores)
+
+    points = np.column_stack([scores[key] for key in BREAKDOWN_FEATURES])
+    order, _ = _brute_force(points, points[42], 6)
+    assert order[0] == 42
+    assert [name for name, _ in index.similar_to('ниша 42', k=5)] == [names[i] for i in order[1:]]
+
+    within = index.radius(index.vector('ниша 42'), 15.0, exclude='ниша 42')
+    distances = np.sqrt(((points - points[42]) ** 2).sum(axis=1))
+    expected = {names[i] for i in np.flatnonzero(distances <= 15.0) if i != 42}
+    assert {name for name, _ in within} == expected
+
+
+def test_add_batch_updates_existing_names():
+    index = NicheSimilarityIndex()
+    index.add_batch(['а', 'б'], {key: [10.0, 90.0] for key in BREAKDOWN_FEATURES})
+    index.add_batch(['б', 'в'], {key: [12.0, 50.0] for key in BREAKDOWN_FEATURES})
+
+    assert len(index) == 3
+    assert index.similar_to('а', k=1)[0][0] == 'б'
+    with pytest.raises(ValueError):
+        index.similar_to('нет такой')
+
+
+def test_metrics_require_values():
+    index = NicheSimilarityIndex(include_metrics=True)
+    with pytest.raises(ValueError):
+        index.add_batch(['а'], {key: [50.0] for key in BREAKDOWN_FEATURES})
@@ -0,0 +1,65 @@
+"""
+Генератор синтетических выгрузок
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.synthetic_generator import FILE_COLUMNS, SyntheticMPStatsGenerator
+
+_BLOCK_ROWS = 1000
+
+
+def _generator(seed=7):
+    # Небольшой рынок и короткие блоки потоков: выгрузка из нескольких блоков за доли секунды
+    return SyntheticMPStatsGenerator(seed=seed, n_brands=300, n_sellers=200, catalogue_size=50000,
+                                     rng_block_rows=_BLOCK_ROWS)
+
+
+def _generate(generator, file_type, rows, chunk_rows):
+    chunks = list(generator.iter_chunks(file_type, rows, chunk_rows=chunk_rows))
+    return chunks, pd.concat(chunks, ignore_index=True)
+
+
+@pytest.mark.parametrize('file_type', list(FILE_COLUMNS))
+def test_output_does_not_depend_on_chunk_rows(file_type):
+    rows = 2 * _BLOCK_ROWS + 350
+    _, expected = _generate(_generator(), file_type, rows, chunk_rows=rows)
+
+    # Размеры блоков кратны 100: у SEO-выдачи размер блока округляется до целых запросов
+    for chunk_rows in [300, _BLOCK_ROWS, 1300]:
+        chunks, frame = _generate(_generator(), file_type, rows, chunk_rows)
+        pd.testing.assert_frame_equal(frame, expected)
+        assert max(map(len, chunks)) <= chunk_rows
+        assert list(chunks[0].index[:3]) == [0, 1, 2]
+
+
+def test_fixed_seed_is_deterministic():
+    first = _generator(seed=11).generate('seo_results', 5000)
+    second = _generator(seed=11).generate('seo_results', 5000)
+    other = _generator(seed=12).generate('seo_results', 5000)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert list(first.columns) == FILE_COLUMNS['seo_results']
+    assert not first['Цена, ₽'].equals(other['Цена, ₽'])
+
+
+def test_block_streams_match_seed_sequence_spawn():
+    generator = _generator(seed=3)
+    type_index = list(FILE_COLUMNS).index('products_report')
+    children = np.random.SeedSequence(3, spawn_key=(type_index,)).spawn(3)
+
+    expected = np.random.default_rng(children[2]).random(5)
+    np.testing.assert_array_equal(generator._rng('products_report', 2).random(5), expected)
+
+
+def test_block_size_must_keep_queries_whole():
+    with pytest.raises(ValueError):
+        SyntheticMPStatsGenerator(rng_block_rows=250)
+
+
+def test_seo_queries_stay_whole_in_chunks():
+    chunks, frame = _generate(_generator(), 'seo_results', 3000, chunk_rows=250)
+    assert [len(chunk) for chunk in chunks] == [200] * 15
+    assert (frame['Позиция'].to_numpy() == np.tile(np.arange(1, 101), 30)).all()
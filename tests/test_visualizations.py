@@ -0,0 +1,113 @@
+"""
+Прореживание и построение диаграмм
+"""
+
+import numpy as np
+import pytest
+
+from utils.visualizations import (
+    _sample_competitors, bin_distribution, create_distribution_chart, create_radar_charts, downsample_series
+)
+
+
+def test_competitor_sampling_stays_within_max_points_for_sparse_grid():
+    rng = np.random.default_rng(0)
+    n = 20000
+    prices = rng.lognormal(7, 2, n)
+    sales = rng.lognormal(3, 2, n)
+    market_share = rng.random(n)
+
+    # Занятых ячеек сетки заметно больше, чем бюджет на остальные точки
+    indices = _sample_competitors(prices, sales, market_share, max_points=300, keep_top=200)
+
+    assert len(indices) == 300
+    assert len(np.unique(indices)) == len(indices)
+    top = np.argsort(-market_share)[:200]
+    assert np.isin(top, indices).all()
+
+
+def test_radar_charts_reject_mismatched_names():
+    breakdowns = [{}, {}]
+    with pytest.raises(ValueError):
+        create_radar_charts(breakdowns, names=['Ниша 1'])
+
+
+def test_lttb_ignores_gaps_and_keeps_breaks():
+    n = 10000
+    y = np.sin(np.linspace(0, 40, n))
+    y[5000:5100] = np.nan
+    y[7000:7010] = np.nan
+    y[5100] = 50.0
+    finite = np.flatnonzero(np.isfinite(y))
+
+    indices = downsample_series(np.arange(n), y, 200)
+
+    assert len(indices) <= 200
+    # Разрывы линии сохранены явно, остальные точки выбираются только среди конечных значений
+    assert {5000, 7000} <= set(indices)
+    assert 5100 in indices
+    kept_finite = indices[np.isfinite(y[indices])]
+    assert np.array_equal(kept_finite, finite[downsample_series(finite, y[finite], 198)])
+
+
+def test_lttb_with_many_gaps_stays_within_max_points():
+    y = np.arange(1000, dtype=float)
+    y[::3] = np.nan
+
+    indices = downsample_series(np.arange(1000), y, 50)
+
+    assert len(indices) <= 50
+    assert np.isfinite(y[indices]).sum() >= 3
+
+
+def test_bin_distribution_matches_numpy_histogram():
+    rng = np.random.default_rng(3)
+    values = np.r_[rng.lognormal(10, 1.5, 50000), np.nan, np.inf, -np.inf]
+    finite = values[np.isfinite(values)]
+
+    edges, counts = bin_distribution(values, bins=30)
+    expected_counts, expected_edges = np.histogram(finite, bins=30)
+    np.testing.assert_allclose(edges, expected_edges)
+    np.testing.assert_array_equal(counts, expected_counts)
+
+    edges, counts = bin_distribution(np.r_[values, -5.0, 0.0], bins=25, log_bins=True)
+    np.testing.assert_allclose(edges, np.geomspace(finite.min(), finite.max(), 26))
+    np.testing.assert_array_equal(counts, np.histogram(finite, bins=edges)[0])
+    assert counts.sum() == len(finite)
+
+
+def test_bin_distribution_clips_and_handles_degenerate_input():
+    rng = np.random.default_rng(4)
+    values = rng.normal(0, 1, 10000)
+    edges, counts = bin_distribution(values, bins=10, clip_quantiles=(0.05, 0.95))
+    low, high = np.quantile(values, (0.05, 0.95))
+    assert (edges[0], edges[-1]) == (low, high)
+    assert counts.sum() == ((values >= low) & (values <= high)).sum()
+
+    edges, counts = bin_distribution(np.full(7, 3.0), bins=4)
+    assert (edges[0], edges[-1], counts.sum()) == (3.0, 4.0, 7)
+    edges, counts = bin_distribution([np.nan, -1.0], log_bins=True)
+    assert counts.tolist() == [0]
+
+
+def test_distribution_chart_switches_to_server_binning_above_threshold():
+    rng = np.random.default_rng(5)
+    at_threshold = rng.normal(0, 1, 500)
+    above = rng.normal(0, 1, 501)
+
+    client = create_distribution_chart(at_threshold, 'Выручка', bins=15, server_binning_threshold=500)
+    assert client.data[0].type == 'histogram'
+    assert len(client.data[0].x) == 500
+
+    server = create_distribution_chart(above, 'Выручка', bins=15, server_binning_threshold=500)
+    assert server.data[0].type == 'bar'
+    assert len(server.data[0].y) == 15
+    assert sum(server.data[0].y) == 501
+
+    # Логарифмические интервалы и ограничение квантилями есть только у серверного разбиения
+    assert create_distribution_chart(at_threshold, 'Выручка', log_bins=True).data[0].type == 'bar'
+    assert create_distribution_chart(at_threshold, 'Выручка', clip_quantiles=(0.01, 0.99)).data[0].type == 'bar'
+    assert create_distribution_chart(above, 'Выручка', binning='client').data[0].type == 'histogram'
+    assert create_distribution_chart(at_threshold, 'Выручка', binning='server').data[0].type == 'bar'
+    with pytest.raises(ValueError):
+        create_distribution_chart(above, 'Выручка', binning='fast')
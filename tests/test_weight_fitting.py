@@ -0,0 +1,122 @@
+"""
+Подбор весов метрик по исходам прошлых ниш
+"""
+
+import io
+import json
+
+import numpy as np
+import pytest
+
+from utils.weight_fitting import (
+    SCORE_KEYS, WEIGHT_KEYS, _auc_by_fold, _to_percent, fit_weights, load_weights_config, save_weights_config
+)
+
+
+def _synthetic(rng, weights, n=5000, noise=0.05):
+    scores = {key: rng.uniform(0, 100, n) for key in SCORE_KEYS}
+    rating = sum(weight * scores[key] for weight, key in zip(weights, SCORE_KEYS)) / 100.0
+    return scores, 1.0 + 0.02 * rating + noise * rng.standard_normal(n)
+
+
+def test_fit_recovers_known_weights():
+    rng = np.random.default_rng(0)
+    scores, outcomes = _synthetic(rng, [40, 30, 20, 10])
+    result = fit_weights(scores, outcomes)
+
+    raw = [result['raw_weights'][key] for key in WEIGHT_KEYS]
+    np.testing.assert_allclose(raw, [40, 30, 20, 10], atol=1.0)
+    assert result['weights'] == dict(zip(WEIGHT_KEYS, [40, 30, 20, 10]))
+    assert result['slope'] == pytest.approx(0.02, rel=0.02)
+    assert result['intercept'] == pytest.approx(1.0, abs=0.05)
+    assert result['niches'] == 5000
+    assert result['cv']['r2'] > 0.9
+
+
+def test_fit_keeps_weights_nonnegative():
+    rng = np.random.default_rng(1)
+    scores, outcomes = _synthetic(rng, [50, 0, 30, 20])
+    # Отрицательная зависимость от выручки: без ограничения вес был бы меньше нуля
+    outcomes = outcomes - 0.005 * scores['revenue']
+    result = fit_weights(scores, outcomes, folds=0)
+
+    assert result['raw_weights']['revenue'] == 0.0
+    assert min(result['raw_weights'].values()) >= 0
+    assert sum(result['weights'].values()) == 100
+    assert result['cv'] is None
+
+
+def test_fit_rejects_bad_input():
+    rng = np.random.default_rng(2)
+    scores, outcomes = _synthetic(rng, [25, 25, 25, 25], n=50)
+    with pytest.raises(ValueError):
+        fit_weights(scores, outcomes[:-1])
+    with pytest.raises(ValueError):
+        fit_weights(scores, np.full(50, np.nan))
+    with pytest.raises(ValueError):
+        fit_weights(scores, -outcomes)
+
+
+def test_to_percent_sums_to_100():
+    rng = np.random.default_rng(3)
+    for _ in range(500):
+        weights = rng.dirichlet(np.full(4, 0.5)) * rng.uniform(0.1, 1000)
+        percent = _to_percent(weights)
+        assert sum(percent) == 100
+        assert np.all(np.abs(np.array(percent) - weights / weights.sum() * 100) < 1)
+
+    assert _to_percent([1, 1, 1]) == [34, 33, 33]
+    assert _to_percent([0, 0, 5, 0]) == [0, 0, 100, 0]
+
+
+def _mann_whitney_auc(ratings, labels):
+    positive, negative = ratings[labels == 1], ratings[labels == 0]
+    if not len(positive) or not len(negative):
+        return np.nan
+    greater = (positive[:, None] > negative[None, :]).sum()
+    ties = (positive[:, None] == negative[None, :]).sum()
+    return (greater + 0.5 * ties) / (len(positive) * len(negative))
+
+
+def test_auc_by_fold_matches_mann_whitney():
+    rng = np.random.default_rng(4)
+    n, folds = 600, 5
+    # Округленные рейтинги: много равных значений внутри блоков
+    ratings = np.round(rng.uniform(0, 20, n))
+    labels = (rng.uniform(0, 20, n) < ratings).astype(float)
+    fold_of = rng.permutation(n) % folds
+    # В последнем блоке только успехи: AUC не определен
+    labels[fold_of == folds - 1] = 1.0
+
+    auc = _auc_by_fold(ratings, labels, fold_of, folds)
+    expected = [_mann_whitney_auc(ratings[fold_of == i], labels[fold_of == i]) for i in range(folds)]
+    np.testing.assert_allclose(auc, expected)
+    assert np.isnan(auc[-1])
+
+
+def test_weights_config_round_trip(tmp_path):
+    rng = np.random.default_rng(5)
+    scores, outcomes = _synthetic(rng, [10, 20, 30, 40], n=500)
+    result = fit_weights(scores, outcomes, baseline={'demand': 25, 'revenue': 25, 'ads': 25, 'organic': 25})
+
+    path = tmp_path / 'weights.json'
+    save_weights_config(result, path)
+    assert load_weights_config(path) == result['weights']
+    with open(path, 'rb') as f:
+        assert load_weights_config(f) == result['weights']
+    assert json.loads(path.read_text(encoding='utf-8'))['fitted']['baseline_r2'] is not None
+
+    plain = io.StringIO(json.dumps({'demand': 60, 'organic': 40}))
+    assert load_weights_config(plain) == {'demand': 60, 'organic': 40}
+
+
+@pytest.mark.parametrize('config', [
+    {'weights': {'demand': 50, 'price': 50}},
+    {'weights': {'demand': 120, 'revenue': -20}},
+    {'demand': True},
+    {'weights': {}},
+    [40, 30, 20, 10]
+])
+def test_load_weights_config_rejects_invalid(config):
+    with pytest.raises(ValueError):
+        load_weights_config(io.StringIO(json.dumps(config)))
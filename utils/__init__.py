@@ -1,15 +1,43 @@
-from .calculator import ProductRatingCalculator
-from .data_processor import MPStatsDataProcessor
-from .visualizations import (
-    create_radar_chart,
-    create_metrics_bar_chart,
-    create_comparison_chart,
-    create_rating_gauge
-)
+import importlib
+
+# Подмодули и тяжелые зависимости (pandas, NumPy, plotly) загружаются лениво,
+# при первом обращении к атрибуту пакета: импорт utils.calculator не тянет за собой графики
+_LAZY_ATTRIBUTES = {
+    'ProductRatingCalculator': 'calculator',
+    'MPStatsDataProcessor': 'data_processor',
+    'AnalysisJobManager': 'jobs',
+    'NicheHistoryStore': 'history_store',
+    'decompose_seasonal': 'seasonality',
+    'RollingRatingAggregator': 'rolling_rating',
+    'NicheAnomalyDetector': 'anomaly_detector',
+    'NicheSimilarityIndex': 'similarity',
+    'CategoryPercentileIndex': 'percentiles',
+    'RollupCube': 'rollup_cube',
+    'fit_weights': 'weight_fitting',
+    'OverlapDeduplicator': 'deduplication',
+    'KeywordDemandAggregator': 'keyword_demand',
+    'export_ranking': 'excel_exporter',
+    'create_radar_chart': 'visualizations',
+    'create_metrics_bar_chart': 'visualizations',
+    'create_comparison_chart': 'visualizations',
+    'create_rating_gauge': 'visualizations'
+}
 
 __all__ = [
     'ProductRatingCalculator',
     'MPStatsDataProcessor',
+    'AnalysisJobManager',
+    'NicheHistoryStore',
+    'decompose_seasonal',
+    'RollingRatingAggregator',
+    'NicheAnomalyDetector',
+    'NicheSimilarityIndex',
+    'CategoryPercentileIndex',
+    'RollupCube',
+    'fit_weights',
+    'OverlapDeduplicator',
+    'KeywordDemandAggregator',
+    'export_ranking',
     'create_radar_chart',
     'create_metrics_bar_chart',
     'create_comparison_chart',
@@ -19,3 +47,18 @@ __all__ = [
 __version__ = '1.0.0'
 __author__ = 'AI Assistant'
 __description__ = 'Инструменты для анализа товарных ниш MPStats'
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    module = importlib.import_module(f'.{module_name}', __name__)
+    value = getattr(module, name)
+    globals()[name] = value  # Последующие обращения идут без __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,257 @@
+"""
+Потоковое обнаружение аномалий в рядах метрик ниш
+"""
+
+import threading
+
+import numpy as np
+
+# Метрики по умолчанию: преобразование перед оценкой (log - для величин с тяжелым хвостом)
+DEFAULT_METRICS = {
+    'price_ad_ratio': None,
+    'organic_percent': None,
+    'revenue': 'log',
+    'demand_ratio': 'log'
+}
+
+# Тексты для рекомендаций: (метрика, направление) -> сообщение
+ANOMALY_MESSAGES = {
+    ('price_ad_ratio', 'down'): "🚨 Резкий рост рекламных ставок относительно цены: возможно, началась рекламная война.",
+    ('price_ad_ratio', 'up'): "📉 Рекламные ставки резко снизились: хороший момент для запуска рекламы.",
+    ('organic_percent', 'down'): "🚨 Доля органики резко упала: выдачу занимают рекламные позиции.",
+    ('organic_percent', 'up'): "📈 Доля органики резко выросла: конкуренция в рекламе ослабла.",
+    ('revenue', 'down'): "🚨 Выручка ниши резко упала: проверьте сезонность и изменения спроса.",
+    ('revenue', 'up'): "📈 Выручка ниши резко выросла: проверьте, не разовый ли это всплеск.",
+    ('demand_ratio', 'down'): "🚨 Соотношение спроса к предложению резко упало: в нишу заходят новые продавцы.",
+    ('demand_ratio', 'up'): "📈 Спрос относительно предложения резко вырос."
+}
+
+# Переход от среднего абсолютного отклонения к стандартному для нормального распределения
+_MAD_TO_SIGMA = 1.2533
+
+
+class NicheAnomalyDetector:
+    """
+    Детектор резких изменений метрик ниш (EWMA и робастная z-оценка)
+
+    Для каждой ниши и метрики хранятся только экспоненциальное среднее,
+    экспоненциальное среднее абсолютное отклонение и число наблюдений,
+    поэтому память на нишу постоянна. Пакет за день обрабатывается одним
+    векторным проходом по массивам состояния. Выбросы ограничиваются перед
+    обновлением состояния, чтобы единичный всплеск не сдвигал базовый уровень.
+    """
+
+    def __init__(self, metrics=None, alpha=0.1, threshold=4.0, warmup=7, clip=3.0, min_relative_scale=0.01):
+        """
+        Args:
+            metrics (dict): Метрика -> преобразование (None или 'log')
+            alpha (float): Коэффициент сглаживания EWMA
+            threshold (float): Порог модуля z-оценки для аномалии
+            warmup (int): Минимум наблюдений до начала проверки
+            clip (float): Ограничение отклонения при обновлении (в единицах разброса)
+            min_relative_scale (float): Минимальный разброс как доля уровня метрики:
+                защита от бесконечных z-оценок на почти постоянных рядах
+        """
+        self.metrics = dict(metrics or DEFAULT_METRICS)
+        for transform in self.metrics.values():
+            if transform not in (None, 'log'):
+                raise ValueError(f"Неизвестное преобразование: {transform}")
+
+        self.metric_names = list(self.metrics)
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.clip = clip
+        self.min_relative_scale = min_relative_scale
+        # Для логарифмированных метрик разность уже относительная
+        self._log_columns = np.array([self.metrics[name] == 'log' for name in self.metric_names])
+
+        self._slots = {}
+        self._niches = []
+        n_metrics = len(self.metric_names)
+        self._mean = np.zeros((0, n_metrics))
+        self._mad = np.zeros((0, n_metrics))
+        self._count = np.zeros((0, n_metrics), dtype=np.int32)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._niches)
+
+    def update_batch(self, niches, values):
+        """
+        Проверка и обновление состояния по пакету наблюдений
+
+        Args:
+            niches (list): Ниши пакета (каждая не больше одного раза)
+            values (dict): Метрика -> массив значений той же длины; пропуски - NaN
+
+        Returns:
+            dict: niches, metrics, z (ниши × метрики), expected (ожидаемые значения
+                в исходной шкале) и flags (булева матрица аномалий)
+        """
+        niches = list(niches)
+        observed = np.column_stack([
+            np.asarray(values.get(name, np.full(len(niches), np.nan)), dtype=float)
+            for name in self.metric_names
+        ]) if niches else np.zeros((0, len(self.metric_names)))
+        x = self._transform(observed)
+
+        with self._lock:
+            slots = self._get_slots(niches)
+            if len(np.unique(slots)) != len(slots):
+                raise ValueError("Ниша встречается в пакете несколько раз")
+
+            mean = self._mean[slots]
+            mad = self._mad[slots]
+            count = self._count[slots]
+
+            valid = np.isfinite(x)
+            scale = np.maximum(mad * _MAD_TO_SIGMA, self._scale_floor(mean))
+            deviation = np.where(valid, x - mean, 0.0)
+            z = np.where(valid & (count > 0), deviation / scale, np.nan)
+            flags = valid & (count >= self.warmup) & (np.abs(np.nan_to_num(z)) > self.threshold)
+
+            # Обновление: первое наблюдение задает уровень, далее - ограниченное отклонение.
+            # Пока наблюдений мало, вес нового значения не меньше 1/n (обычное среднее):
+            # иначе EWMA разброса, начатая с нуля, занижена и после прогрева дает ложные аномалии
+            first = valid & (count == 0)
+            limited = np.clip(deviation, -self.clip * scale, self.clip * scale)
+            limited = np.where(count >= self.warmup, limited, deviation)
+            mean_weight = np.maximum(self.alpha, 1.0 / (count + 1))
+            mad_weight = np.maximum(self.alpha, 1.0 / np.maximum(count, 1))
+            new_mean = np.where(first, x, mean + mean_weight * limited)
+            new_mad = np.where(first, 0.0, mad + mad_weight * (np.abs(limited) - mad))
+
+            self._mean[slots] = np.where(valid, new_mean, mean)
+            self._mad[slots] = np.where(valid, new_mad, mad)
+            self._count[slots] = count + valid
+
+        expected = self._inverse(mean)
+        expected[count == 0] = np.nan
+        return {
+            'niches': niches,
+            'metrics': self.metric_names,
+            'values': observed,
+            'z': z,
+            'expected': expected,
+            'flags': flags
+        }
+
+    def update(self, niche, metrics):
+        """
+        Проверка и обновление по метрикам одной ниши
+
+        Args:
+            niche (str): Название ниши
+            metrics (dict): Метрики периода
+
+        Returns:
+            list: Аномалии (см. list_anomalies)
+        """
+        values = {name: [metrics.get(name, np.nan)] for name in self.metric_names}
+        return list_anomalies(self.update_batch([niche], values))
+
+    def state(self, niche):
+        """Текущее состояние ниши: метрика -> ожидаемое значение, разброс и число наблюдений"""
+        with self._lock:
+            slot = self._slots.get(niche)
+            if slot is None:
+                return None
+            mean, mad, count = self._mean[slot].copy(), self._mad[slot].copy(), self._count[slot].copy()
+
+        expected = self._inverse(mean[None, :])[0]
+        return {
+            name: {
+                'expected': float(expected[i]),
+                'scale': float(mad[i] * _MAD_TO_SIGMA),
+                'observations': int(count[i])
+            }
+            for i, name in enumerate(self.metric_names)
+        }
+
+    def _scale_floor(self, mean):
+        floor = np.where(self._log_columns, self.min_relative_scale, self.min_relative_scale * np.abs(mean))
+        return np.maximum(floor, 1e-9)
+
+    def _transform(self, observed):
+        x = observed.copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i, name in enumerate(self.metric_names):
+                if self.metrics[name] == 'log':
+                    x[:, i] = np.log1p(np.where(x[:, i] >= 0, x[:, i], np.nan))
+        return x
+
+    def _inverse(self, values):
+        result = values.copy()
+        for i, name in enumerate(self.metric_names):
+            if self.metrics[name] == 'log':
+                result[:, i] = np.expm1(result[:, i])
+        return result
+
+    def _get_slots(self, niches):
+        """Номера строк состояния для ниш (новые ниши добавляются)"""
+        slots = np.empty(len(niches), dtype=np.int64)
+        for i, niche in enumerate(niches):
+            slot = self._slots.get(niche)
+            if slot is None:
+                slot = self._slots[niche] = len(self._niches)
+                self._niches.append(niche)
+            slots[i] = slot
+
+        # Массивы состояния растут с запасом, как список
+        needed = len(self._niches)
+        if needed > len(self._mean):
+            capacity = max(needed, 2 * len(self._mean), 1024)
+            self._mean = _grow(self._mean, capacity)
+            self._mad = _grow(self._mad, capacity)
+            self._count = _grow(self._count, capacity)
+
+        return slots
+
+
+def _grow(array, capacity):
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def list_anomalies(result):
+    """
+    Список аномалий из результата update_batch
+
+    Returns:
+        list: Словари niche, metric, value, expected, z, direction ('up' или 'down'), message
+    """
+    anomalies = []
+    rows, cols = np.nonzero(result['flags'])
+    for row, col in zip(rows, cols):
+        metric = result['metrics'][col]
+        direction = 'up' if result['z'][row, col] > 0 else 'down'
+        anomalies.append({
+            'niche': result['niches'][row],
+            'metric': metric,
+            'value': float(result['values'][row, col]),
+            'expected': float(result['expected'][row, col]),
+            'z': float(result['z'][row, col]),
+            'direction': direction,
+            'message': ANOMALY_MESSAGES.get((metric, direction), f"Резкое изменение метрики {metric}")
+        })
+    return anomalies
+
+
+def detect_against_history(history, metrics, **kwargs):
+    """
+    Проверка метрик нового периода относительно истории одной ниши
+
+    Args:
+        history (list): Метрики предыдущих периодов, от старых к новым
+        metrics (dict): Метрики нового периода
+        **kwargs: Параметры NicheAnomalyDetector
+
+    Returns:
+        list: Аномалии нового периода
+    """
+    detector = NicheAnomalyDetector(**kwargs)
+    for past in history:
+        detector.update(None, past)
+    return detector.update(None, metrics)
@@ -2,6 +2,8 @@
 Модуль для расчета рейтинга товарных ниш
 """
 
+from .instrumentation import instrumented
+
 class ProductRatingCalculator:
     """Калькулятор рейтинга товарных ниш"""
     
@@ -28,6 +30,7 @@ class ProductRatingCalculator:
         """Обновить пороговые значения"""
         self.thresholds.update(thresholds)
     
+    @instrumented('score', rows=lambda result, self, metrics: 1)
     def calculate_rating(self, metrics):
         """
         Рассчитать рейтинг товарной ниши
@@ -43,31 +46,114 @@ class ProductRatingCalculator:
             dict: Результат расчета с итоговым рейтингом и детализацией
         """
         
-        # Нормализация метрик к шкале 0-100
-        demand_score = self._calculate_demand_score(metrics['demand_ratio'])
-        revenue_score = self._calculate_revenue_score(metrics['revenue'])
-        ad_efficiency_score = self._calculate_ad_efficiency_score(metrics['price_ad_ratio'])
-        organic_score = self._calculate_organic_score(metrics['organic_percent'])
+        scores = self.calculate_component_scores(metrics)
+        final_rating = self.weighted_rating(scores)
+        
+        return {
+            'final_rating': round(final_rating, 1),
+            'breakdown': {key: round(score, 1) for key, score in scores.items()},
+            'weights_used': self.weights.copy(),
+            'thresholds_used': self.thresholds.copy()
+        }
+    
+    def calculate_component_scores(self, metrics):
+        """
+        Оценки метрик по шкале 0-100 без округления
+        
+        Args:
+            metrics (dict): Словарь с метриками (как для calculate_rating)
+        
+        Returns:
+            dict: Оценки demand, revenue, ad_efficiency, organic
+        """
+        return {
+            'demand': self._calculate_demand_score(metrics['demand_ratio']),
+            'revenue': self._calculate_revenue_score(metrics['revenue']),
+            'ad_efficiency': self._calculate_ad_efficiency_score(metrics['price_ad_ratio']),
+            'organic': self._calculate_organic_score(metrics['organic_percent'])
+        }
+    
+    def weighted_rating(self, scores):
+        """
+        Итоговый рейтинг по оценкам метрик с учетом весов (без округления)
+        
+        Args:
+            scores (dict): Оценки demand, revenue, ad_efficiency, organic
+        
+        Returns:
+            float: Рейтинг от 0 до 100
+        """
+        return (
+            scores['demand'] * (self.weights['demand'] / 100) +
+            scores['revenue'] * (self.weights['revenue'] / 100) +
+            scores['ad_efficiency'] * (self.weights['ads'] / 100) +
+            scores['organic'] * (self.weights['organic'] / 100)
+        )
+    
+    @instrumented('score_batch', rows=lambda result, *args, **kwargs: len(result['final_rating']))
+    def calculate_ratings_batch(self, demand_ratio, revenue, price_ad_ratio, organic_percent, decimals=1):
+        """
+        Векторный расчет рейтинга для множества ниш
+        
+        Повторяет логику calculate_rating, но работает с массивами NumPy
+        без цикла по нишам. NumPy импортируется только при вызове.
+        
+        Args:
+            demand_ratio (array-like): Соотношения запросов/товары
+            revenue (array-like): Выручка категорий (₽/мес)
+            price_ad_ratio (array-like): Соотношения цена/ставка
+            organic_percent (array-like): Проценты органических позиций
+            decimals (int): Точность округления (как в calculate_rating); None - без округления
+        
+        Returns:
+            dict: Массивы final_rating и оценок demand, revenue, ad_efficiency, organic
+        """
+        import numpy as np
+        
+        demand_ratio = np.asarray(demand_ratio, dtype=float)
+        revenue = np.asarray(revenue, dtype=float)
+        price_ad_ratio = np.asarray(price_ad_ratio, dtype=float)
+        organic_percent = np.asarray(organic_percent, dtype=float)
+        
+        # Спрос/предложение
+        demand_score = np.minimum(demand_ratio * 15, 100)
+        demand_score = np.where(demand_ratio > 10, np.minimum(demand_score * 1.2, 100), demand_score)
+        demand_score = np.where(demand_ratio < self.thresholds['min_demand_ratio'], 0, demand_score)
+        
+        # Выручка (логарифмическая шкала)
+        min_revenue = self.thresholds['min_revenue']
+        below_min = revenue < min_revenue
+        with np.errstate(divide='ignore', invalid='ignore'):
+            revenue_score = np.minimum(np.log10(np.where(below_min, 1, revenue / min_revenue)) * 50 + 50, 100)
+        revenue_score = np.where(below_min, 0, np.maximum(revenue_score, 0))
+        
+        # Эффективность рекламы
+        ad_score = np.minimum(price_ad_ratio * 3, 100)
+        ad_score = np.where(price_ad_ratio > 50, np.minimum(ad_score * 1.1, 100), ad_score)
+        ad_score = np.where(price_ad_ratio <= 0, 0, ad_score)
+        
+        # Органика
+        organic_score = np.clip(organic_percent, 0, 100)
         
-        # Итоговый рейтинг с учетом весов
         final_rating = (
             demand_score * (self.weights['demand'] / 100) +
             revenue_score * (self.weights['revenue'] / 100) +
-            ad_efficiency_score * (self.weights['ads'] / 100) +
+            ad_score * (self.weights['ads'] / 100) +
             organic_score * (self.weights['organic'] / 100)
         )
         
-        return {
-            'final_rating': round(final_rating, 1),
-            'breakdown': {
-                'demand': round(demand_score, 1),
-                'revenue': round(revenue_score, 1),
-                'ad_efficiency': round(ad_efficiency_score, 1),
-                'organic': round(organic_score, 1)
-            },
-            'weights_used': self.weights.copy(),
-            'thresholds_used': self.thresholds.copy()
+        result = {
+            'final_rating': final_rating,
+            'demand': demand_score,
+            'revenue': revenue_score,
+            'ad_efficiency': ad_score,
+            'organic': organic_score
         }
+        
+        if decimals is not None:
+            result = {key: np.round(values, decimals) for key, values in result.items()}
+        
+        return result
     
     def _calculate_demand_score(self, demand_ratio):
         """Расчет оценки соотношения спроса и предложения"""
@@ -208,7 +294,8 @@ class ProductRatingCalculator:
             results.append({
                 'name': niche.get('name', 'Неизвестная ниша'),
                 'rating': rating_result['final_rating'],
-                'details': rating_result
+                'details': rating_result,
+                'metrics': niche['metrics']
             })
         
         # Сортировка по рейтингу (убывание)
@@ -2,6 +2,255 @@ import pandas as pd
 import numpy as np
 import io
 
+from .deduplication import OverlapDeduplicator
+from .instrumentation import instrumented
+from .keyword_demand import (
+    KeywordDemandAggregator, combine_tables, demand_by_subject, normalize_subject, total_demand_ratio
+)
+
+
+# Схемы выгрузок MPStats для определения типа по содержимому:
+# роль -> (ключевые слова заголовка, ожидаемые значения, вес роли).
+# Роли проверяются по порядку, и каждый столбец достается только одной роли,
+# поэтому более точные роли ("Позиция без рекламы", "Цена со скидкой") идут первыми.
+# Ожидаемые значения: 'number' - числа, 'text' - не числа, 'any' - любые
+FILE_SCHEMAS = {
+    'niche_selection': {
+        'category': (['категория', 'category'], 'text', 1),
+        'subject': (['предмет', 'subject', 'ниша', 'niche'], 'text', 2),
+        'products': (['товар', 'product'], 'number', 2),
+        'brands': (['бренд', 'brand'], 'number', 1),
+        'sellers': (['продавц', 'seller'], 'number', 1),
+        'sales': (['продаж', 'sales'], 'number', 1),
+        'revenue': (['выручка', 'revenue'], 'number', 2)
+    },
+    'seo_results': {
+        'query': (['запрос', 'query', 'keyword'], 'text', 2),
+        'organic_position': (['без рекламы', 'organic'], 'number', 2),
+        'position': (['позиция', 'position'], 'number', 1),
+        'bid': (['ставка', 'bid', 'cpm'], 'number', 2),
+        'ad': (['реклама', 'advert'], 'any', 1),
+        'article': (['артикул', 'sku', 'article'], 'any', 1),
+        'price': (['цена', 'price'], 'number', 1)
+    },
+    'brands_report': {
+        'brand': (['бренд', 'brand'], 'text', 3),
+        'products': (['товар', 'product'], 'number', 1),
+        'sellers': (['продавц', 'seller'], 'number', 1),
+        'sales': (['продаж', 'sales'], 'number', 1),
+        'revenue': (['выручка', 'revenue'], 'number', 2),
+        'share': (['доля', 'share'], 'number', 1)
+    },
+    'sellers_report': {
+        'seller': (['продавец', 'seller'], 'text', 3),
+        'inn': (['инн', 'inn', 'tax'], 'any', 2),
+        'products': (['товар', 'product'], 'number', 1),
+        'brands': (['бренд', 'brand'], 'number', 1),
+        'sales': (['продаж', 'sales'], 'number', 1),
+        'revenue': (['выручка', 'revenue'], 'number', 2),
+        'share': (['доля', 'share'], 'number', 1)
+    },
+    'products_report': {
+        'article': (['артикул', 'sku', 'article'], 'any', 2),
+        'name': (['название', 'name'], 'text', 1),
+        'subject': (['предмет', 'subject'], 'text', 1),
+        'brand': (['бренд', 'brand'], 'text', 1),
+        'seller': (['продавец', 'seller'], 'text', 1),
+        'discount_price': (['скидк', 'discount'], 'number', 1),
+        'price': (['цена', 'price'], 'number', 2),
+        'sales': (['продаж', 'sales'], 'number', 1),
+        'revenue': (['выручка', 'revenue'], 'number', 1),
+        'stock': (['остаток', 'stock'], 'number', 2)
+    },
+    'keyword_frequency': {
+        'query': (['запрос', 'query', 'keyword'], 'text', 2),
+        'frequency': (['частот', 'frequency'], 'number', 3),
+        'products': (['товар', 'product'], 'number', 2),
+        'subject': (['предмет', 'subject', 'ниша', 'niche'], 'text', 1)
+    }
+}
+
+# Роли, без которых файл не относится к типу
+REQUIRED_ROLES = {
+    'niche_selection': ['products', 'revenue'],
+    'seo_results': ['bid', 'price'],
+    'brands_report': ['brand'],
+    'sellers_report': ['seller'],
+    'products_report': ['article', 'price'],
+    'keyword_frequency': ['query', 'frequency']
+}
+
+# Роли, которые читают обработчики process_*_file: при чтении файла известного типа
+# загружаются только столбцы с ключевыми словами этих ролей
+PROCESSOR_ROLES = {
+    'niche_selection': ['products', 'revenue', 'sales', 'subject'],
+    'seo_results': ['organic_position', 'bid', 'price', 'article'],
+    'brands_report': ['brand', 'sales', 'revenue'],
+    'keyword_frequency': ['query', 'frequency', 'products', 'subject']
+}
+
+# Типы выгрузок, которые при загрузке нескольких файлов склеиваются без повторов
+# артикулов (соседние поисковые запросы выдают во многом одни и те же товары)
+DEDUP_FILE_TYPES = ['seo_results', 'products_report']
+
+# Минимальная доля веса схемы, при которой тип считается определенным
+MIN_SCHEMA_SCORE = 0.5
+
+# Размер блока при потоковом чтении больших выгрузок (частотность запросов, склейка)
+CHUNK_ROWS = 200000
+
+# Позиции выдачи, по которым считается процент органики
+SEO_TOP_POSITIONS = 100
+
+# Количество строк данных, читаемых для проверки значений столбцов
+SNIFF_SAMPLE_ROWS = 20
+
+# Верхняя граница объема начала CSV, читаемого при определении типа
+SNIFF_MAX_BYTES = 1 << 20
+
+# Разделители CSV в порядке проверки
+CSV_SEPARATORS = [';', ',', '\t']
+
+
+def _count_rows(file_data_list):
+    """Суммарное количество строк в списке файлов (для инструментации)"""
+    return sum(len(f['dataframe']) for f in file_data_list if f.get('dataframe') is not None)
+
+
+def _combine_seo_metrics(parts):
+    """
+    Соотношение цена/ставка и процент органики по нескольким SEO-файлам
+    
+    Средние и доли пересчитываются из сумм и количеств файлов
+    (process_seo_results_file), а не берутся из последнего файла.
+    """
+    metrics = {}
+    ad_rate_count = sum(part.get('ad_rate_count', 0) for part in parts)
+    price_count = sum(part.get('price_count', 0) for part in parts)
+    if ad_rate_count and price_count:
+        avg_ad_rate = sum(part.get('ad_rate_sum', 0) for part in parts) / ad_rate_count
+        avg_price = sum(part.get('price_sum', 0) for part in parts) / price_count
+        if avg_ad_rate > 0:
+            metrics['price_ad_ratio'] = avg_price / avg_ad_rate
+    
+    organic_parts = [part for part in parts if 'organic_top_100' in part]
+    top_100_rows = sum(part['top_100_rows'] for part in organic_parts)
+    if top_100_rows:
+        metrics['organic_percent'] = sum(part['organic_top_100'] for part in organic_parts) / top_100_rows * 100
+    return metrics
+
+
+def _top_rows(df, count):
+    """
+    Строки с первыми count позициями файла
+
+    Целочисленный индекс - номер строки в исходном файле (load_dataframe,
+    iter_dataframe_chunks), он сохраняется при отборе строк склейкой.
+    """
+    if pd.api.types.is_integer_dtype(df.index):
+        return df[df.index < count]
+    return df.iloc[:count]
+
+
+def _numeric_shares(sample):
+    """Доля числовых значений в каждом столбце образца (None для пустого столбца)"""
+    shares = {}
+    for col in sample.columns:
+        if pd.api.types.is_numeric_dtype(sample[col]):
+            shares[col] = 1.0 if sample[col].notna().any() else None
+            continue
+        values = sample[col].dropna().astype(str).str.strip()
+        values = values[values != '']
+        if len(values) == 0:
+            shares[col] = None
+            continue
+        # Числа в выгрузках бывают с пробелами-разделителями разрядов и запятой
+        normalized = values.str.replace('[\\s\u00a0%₽]', '', regex=True).str.replace(',', '.')
+        shares[col] = pd.to_numeric(normalized, errors='coerce').notna().mean()
+    return shares
+
+
+def _matches_kind(numeric_share, kind):
+    """Соответствует ли столбец ожидаемому виду значений ('number', 'text', 'any')"""
+    if kind == 'any' or numeric_share is None:
+        return True  # Пустой образец не опровергает роль
+    return numeric_share >= 0.8 if kind == 'number' else numeric_share < 0.5
+
+
+def _xlsx_header(row):
+    """Заголовки листа: пустые - 'Unnamed: i', повторяющиеся нумеруются, как в pandas.read_excel"""
+    header = []
+    for i, value in enumerate(row or []):
+        name = str(value) if value is not None else f"Unnamed: {i}"
+        base, suffix = name, 1
+        while name in header:
+            name = f"{base}.{suffix}"
+            suffix += 1
+        header.append(name)
+    return header
+
+
+def _xlsx_data_rows(rows):
+    """
+    Строки данных листа, как у pandas.read_excel: пустые строки в середине
+    остаются (становятся строками из NaN), пустые строки в конце отбрасываются
+    """
+    blank = 0
+    for row in rows:
+        if not any(value is not None for value in row):
+            blank += 1
+            continue
+        for _ in range(blank):
+            yield ()
+        blank = 0
+        yield row
+
+
+def _csv_separator(content):
+    """
+    Разделитель CSV по заголовку и строкам образца
+    
+    Выбирается разделитель, дающий больше всего столбцов при одинаковом их числе
+    в заголовке и в строках образца: запятая в названии столбца ("Цена, ₽")
+    не должна приниматься за разделитель файла с точкой с запятой или табуляцией.
+    Если ни один разделитель не дает согласованных строк, берется первый
+    встреченный в заголовке.
+    """
+    lines = [line for line in content.splitlines() if line.strip()]
+    if not lines:
+        return ';'
+    header, rows = lines[0], lines[1:]
+    
+    best, best_fields = None, 1
+    for sep in CSV_SEPARATORS:
+        fields = header.count(sep) + 1
+        if fields > best_fields and all(row.count(sep) + 1 == fields for row in rows):
+            best, best_fields = sep, fields
+    return best or next((sep for sep in CSV_SEPARATORS if sep in header), ';')
+
+
+def _read_csv_head(uploaded_file, sample_rows):
+    """Начало CSV-файла: целые строки, достаточные для заголовка и образца"""
+    uploaded_file.seek(0)
+    chunks = []
+    size = 0
+    lines = 0
+    while size < SNIFF_MAX_BYTES and lines <= sample_rows:
+        chunk = uploaded_file.read(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    uploaded_file.seek(0)
+    
+    head = b''.join(chunks)
+    if lines > sample_rows:
+        # Обрезка по последнему переводу строки: не разрывать строку и символ UTF-8
+        head = head[:head.rfind(b'\n') + 1]
+    return head.decode('utf-8-sig', errors='replace')
+
+
 class MPStatsDataProcessor:
     """Обработчик файлов MPStats"""
     
@@ -11,9 +260,11 @@ class MPStatsDataProcessor:
             'seo_results': ['seo', 'результаты поиска', 'search results'],
             'brands_report': ['бренд', 'brand', 'отчет по брендам'],
             'sellers_report': ['продавец', 'seller', 'отчет по продавцам'],
-            'products_report': ['товар', 'product', 'похожие товары']
+            'products_report': ['товар', 'product', 'похожие товары'],
+            'keyword_frequency': ['частот', 'запрос', 'keyword', 'frequency']
         }
     
+    @instrumented('analyze_file', rows=lambda info, *args, **kwargs: info['rows'])
     def analyze_file(self, uploaded_file):
         """
         Анализ загруженного файла
@@ -28,41 +279,29 @@ class MPStatsDataProcessor:
             file_info = {
                 'name': uploaded_file.name,
                 'size': uploaded_file.size,
-                'type': self._detect_file_type(uploaded_file.name),
+                'type': 'unknown',
+                'column_roles': {},
                 'rows': 0,
                 'columns': 0,
+                'total_columns': 0,
                 'preview': None,
                 'error': None
             }
             
-            # Чтение файла в зависимости от расширения
-            if uploaded_file.name.endswith('.xlsx'):
-                df = pd.read_excel(uploaded_file)
-            elif uploaded_file.name.endswith('.csv'):
-                # Попробуем разные разделители
-                content = uploaded_file.read().decode('utf-8')
-                uploaded_file.seek(0)  # Сброс позиции
-                
-                separators = [';', ',', '\t']
-                df = None
-                
-                for sep in separators:
-                    try:
-                        df = pd.read_csv(io.StringIO(content), sep=sep)
-                        if df.shape[1] > 1:  # Если получили больше одной колонки
-                            break
-                    except:
-                        continue
-                
-                if df is None or df.shape[1] == 1:
-                    # Если не удалось определить разделитель, используем ;
-                    df = pd.read_csv(io.StringIO(content), sep=';')
-            else:
-                raise ValueError(f"Неподдерживаемый формат файла: {uploaded_file.name}")
+            # Тип и роли столбцов - по заголовку, до полного чтения
+            schema = self.detect_file_schema(uploaded_file)
+            file_info['type'] = schema['type']
+            file_info['column_roles'] = schema['columns']
+            
+            # Читаются только столбцы, нужные обработчику этого типа
+            df = self.load_dataframe(
+                uploaded_file, usecols=self.select_columns(schema), separator=schema['separator']
+            )
             
             # Заполнение информации о файле
             file_info['rows'] = len(df)
             file_info['columns'] = len(df.columns)
+            file_info['total_columns'] = len(schema['header']) or len(df.columns)
             file_info['preview'] = df.head(5)
             
             return file_info
@@ -71,6 +310,286 @@ class MPStatsDataProcessor:
             file_info['error'] = str(e)
             return file_info
     
+    @instrumented('parse', rows=lambda df, *args, **kwargs: len(df))
+    def load_dataframe(self, uploaded_file, usecols=None, separator=None):
+        """
+        Чтение загруженного файла в DataFrame
+        
+        Args:
+            uploaded_file: Файл, загруженный через Streamlit (или файловый объект с атрибутом name)
+            usecols (list): Загружаемые столбцы (см. select_columns); None - все столбцы
+            separator (str): Разделитель CSV, если уже известен (см. detect_file_schema)
+        
+        Returns:
+            pandas.DataFrame: Данные файла
+        """
+        # Чтение файла в зависимости от расширения
+        if uploaded_file.name.endswith('.xlsx'):
+            if usecols:
+                return self._read_excel_columns(uploaded_file, usecols)
+            return pd.read_excel(uploaded_file)
+        
+        if uploaded_file.name.endswith('.csv'):
+            if usecols:
+                # Парсер pandas не преобразует значения невыбранных столбцов
+                separator = separator or self.sniff_file(uploaded_file)['separator']
+                uploaded_file.seek(0)
+                df = pd.read_csv(uploaded_file, sep=separator, usecols=usecols, encoding='utf-8-sig')
+                uploaded_file.seek(0)
+                return df
+            
+            # Попробуем разные разделители
+            content = uploaded_file.read().decode('utf-8')
+            uploaded_file.seek(0)  # Сброс позиции
+            
+            separators = [';', ',', '\t']
+            df = None
+            
+            for sep in separators:
+                try:
+                    df = pd.read_csv(io.StringIO(content), sep=sep)
+                    if df.shape[1] > 1:  # Если получили больше одной колонки
+                        break
+                except:
+                    continue
+            
+            if df is None or df.shape[1] == 1:
+                # Если не удалось определить разделитель, используем ;
+                df = pd.read_csv(io.StringIO(content), sep=';')
+            
+            return df
+        
+        raise ValueError(f"Неподдерживаемый формат файла: {uploaded_file.name}")
+    
+    def _read_excel_columns(self, uploaded_file, usecols):
+        """
+        Потоковое чтение выбранных столбцов xlsx через openpyxl в режиме read_only
+        
+        Ячейки остальных столбцов не превращаются в объекты DataFrame, поэтому
+        широкие выгрузки читаются в разы быстрее pandas.read_excel.
+        """
+        from openpyxl import load_workbook
+        
+        uploaded_file.seek(0)
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = _xlsx_header(next(rows, None))
+            missing = [col for col in usecols if col not in header]
+            if missing:
+                raise ValueError(f"Столбцы не найдены: {', '.join(map(str, missing))}")
+            
+            positions = [header.index(col) for col in usecols]
+            columns = [[] for _ in usecols]
+            for row in _xlsx_data_rows(rows):
+                for values, position in zip(columns, positions):
+                    values.append(row[position] if position < len(row) else None)
+        finally:
+            workbook.close()
+            uploaded_file.seek(0)
+        
+        return pd.DataFrame(dict(zip(usecols, columns)), columns=list(usecols))
+    
+    def iter_dataframe_chunks(self, uploaded_file, usecols=None, separator=None, chunk_rows=CHUNK_ROWS):
+        """
+        Потоковое чтение файла блоками строк (память ограничена размером блока)
+        
+        Args:
+            uploaded_file: Файл, загруженный через Streamlit (или файловый объект с атрибутом name)
+            usecols (list): Загружаемые столбцы; None - все столбцы
+            separator (str): Разделитель CSV, если уже известен
+            chunk_rows (int): Количество строк в блоке
+        
+        Yields:
+            pandas.DataFrame: Очередной блок строк
+        """
+        if uploaded_file.name.endswith('.csv'):
+            separator = separator or self.sniff_file(uploaded_file)['separator']
+            uploaded_file.seek(0)
+            reader = pd.read_csv(uploaded_file, sep=separator, usecols=usecols, encoding='utf-8-sig',
+                                 chunksize=chunk_rows)
+            try:
+                yield from reader
+            finally:
+                reader.close()
+                uploaded_file.seek(0)
+            return
+        
+        if uploaded_file.name.endswith('.xlsx'):
+            from openpyxl import load_workbook
+            
+            uploaded_file.seek(0)
+            workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                header = _xlsx_header(next(rows, None))
+                columns = list(usecols) if usecols else header
+                positions = [header.index(col) for col in columns]
+                
+                # Индекс блоков продолжает нумерацию строк файла, как у read_csv(chunksize=...)
+                batch = []
+                offset = 0
+                for row in _xlsx_data_rows(rows):
+                    batch.append([row[position] if position < len(row) else None for position in positions])
+                    if len(batch) >= chunk_rows:
+                        yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(offset, offset + len(batch)))
+                        offset += len(batch)
+                        batch = []
+                if batch:
+                    yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(offset, offset + len(batch)))
+            finally:
+                workbook.close()
+                uploaded_file.seek(0)
+            return
+        
+        raise ValueError(f"Неподдерживаемый формат файла: {uploaded_file.name}")
+    
+    def select_columns(self, schema):
+        """
+        Столбцы, нужные обработчику файла этого типа
+        
+        Берутся все столбцы с ключевыми словами ролей обработчика (а не только
+        выбранные для ролей): обработчики ищут столбцы по тем же словам, поэтому
+        метрики совпадают с расчетом по полному файлу.
+        
+        Args:
+            schema (dict): Результат detect_file_schema
+        
+        Returns:
+            list: Столбцы в порядке файла или None, если нужно читать все
+        """
+        roles = PROCESSOR_ROLES.get(schema['type'])
+        if not roles:
+            return None
+        
+        keywords = [keyword for role in roles for keyword in FILE_SCHEMAS[schema['type']][role][0]]
+        columns = [col for col in schema['header'] if any(keyword in col.lower() for keyword in keywords)]
+        return columns or None
+    
+    @instrumented('sniff')
+    def sniff_file(self, uploaded_file, sample_rows=SNIFF_SAMPLE_ROWS):
+        """
+        Чтение заголовка и нескольких первых строк файла без полного разбора
+        
+        CSV читается с начала до sample_rows строк, xlsx - потоково через
+        итератор openpyxl в режиме read_only. Позиция файла сбрасывается в начало.
+        
+        Args:
+            uploaded_file: Файл, загруженный через Streamlit (или файловый объект с атрибутом name)
+            sample_rows (int): Количество строк данных в образце
+        
+        Returns:
+            dict: header - список заголовков, sample - DataFrame с первыми строками,
+                separator - разделитель CSV (None для xlsx)
+        """
+        if uploaded_file.name.endswith('.xlsx'):
+            from openpyxl import load_workbook
+            
+            uploaded_file.seek(0)
+            workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+            try:
+                rows = list(workbook.active.iter_rows(max_row=sample_rows + 1, values_only=True))
+            finally:
+                workbook.close()
+                uploaded_file.seek(0)
+            
+            header = _xlsx_header(rows[0] if rows else None)
+            sample = pd.DataFrame([row[:len(header)] for row in rows[1:]], columns=header)
+            return {'header': header, 'sample': sample, 'separator': None}
+        
+        if uploaded_file.name.endswith('.csv'):
+            content = _read_csv_head(uploaded_file, sample_rows)
+            separator = _csv_separator(content)
+            sample = pd.read_csv(io.StringIO(content), sep=separator, nrows=sample_rows)
+            return {'header': [str(col) for col in sample.columns], 'sample': sample, 'separator': separator}
+        
+        raise ValueError(f"Неподдерживаемый формат файла: {uploaded_file.name}")
+    
+    def match_schema(self, header, sample=None):
+        """
+        Оценка соответствия заголовков и образца строк схемам выгрузок
+        
+        Args:
+            header (list): Заголовки столбцов
+            sample (pandas.DataFrame): Первые строки файла для проверки значений
+        
+        Returns:
+            dict: type - лучший тип или 'unknown', score - доля веса схемы (0-1),
+                columns - роль -> столбец для лучшего типа, scores - оценки всех типов
+        """
+        scores = {}
+        mappings = {}
+        shares = _numeric_shares(sample) if sample is not None else {}
+        
+        for file_type, roles in FILE_SCHEMAS.items():
+            columns = self._map_columns(file_type, header, shares)
+            total = sum(weight for _, _, weight in roles.values())
+            matched = sum(roles[role][2] for role in columns)
+            required = all(role in columns for role in REQUIRED_ROLES.get(file_type, []))
+            scores[file_type] = matched / total if required else 0.0
+            mappings[file_type] = columns
+        
+        best = max(scores, key=scores.get)
+        if scores[best] < MIN_SCHEMA_SCORE:
+            return {'type': 'unknown', 'score': scores[best], 'columns': {}, 'scores': scores}
+        return {'type': best, 'score': scores[best], 'columns': mappings[best], 'scores': scores}
+    
+    def _map_columns(self, file_type, header, shares):
+        """
+        Роль -> столбец по схеме типа (каждый столбец - не больше одной роли)
+        
+        Args:
+            file_type (str): Тип выгрузки (ключ FILE_SCHEMAS)
+            header (list): Заголовки столбцов
+            shares (dict): Столбец -> доля числовых значений в образце (см. _numeric_shares)
+        """
+        columns = {}
+        used = set()
+        for role, (keywords, kind, _) in FILE_SCHEMAS.get(file_type, {}).items():
+            for col in header:
+                if col in used or not any(keyword in col.lower() for keyword in keywords):
+                    continue
+                if not _matches_kind(shares.get(col), kind):
+                    continue
+                columns[role] = col
+                used.add(col)
+                break
+        return columns
+    
+    @instrumented('detect_file_schema')
+    def detect_file_schema(self, uploaded_file):
+        """
+        Определение типа файла и ролей столбцов по заголовку и первым строкам
+        
+        Содержимое важнее имени: переименованная выгрузка распознается по
+        столбцам. Если по содержимому тип не определен (или файл не читается),
+        используется определение по ключевым словам в имени файла.
+        
+        Args:
+            uploaded_file: Файл, загруженный через Streamlit (или файловый объект с атрибутом name)
+        
+        Returns:
+            dict: type, score, columns (роль -> столбец), header, separator и
+                source - 'content' или 'filename'
+        """
+        try:
+            sniffed = self.sniff_file(uploaded_file)
+        except Exception:
+            sniffed = {'header': [], 'sample': None, 'separator': None}
+        
+        schema = self.match_schema(sniffed['header'], sniffed['sample'])
+        schema.update(header=sniffed['header'], separator=sniffed['separator'], source='content')
+        
+        if schema['type'] == 'unknown':
+            schema['type'] = self._detect_file_type(uploaded_file.name)
+            schema['source'] = 'filename'
+            # Роли столбцов - по схеме типа, определенного по имени
+            shares = _numeric_shares(sniffed['sample']) if sniffed['sample'] is not None else {}
+            schema['columns'] = self._map_columns(schema['type'], sniffed['header'], shares)
+        
+        return schema
+    
+    @instrumented('detect_file_type')
     def _detect_file_type(self, filename):
         """
         Определение типа файла по имени
@@ -90,6 +609,7 @@ class MPStatsDataProcessor:
         
         return 'unknown'
     
+    @instrumented('extract.niche_selection', rows=lambda metrics, self, df: len(df))
     def process_niche_selection_file(self, df):
         """
         Обработка файла "Выбор ниши"
@@ -121,6 +641,7 @@ class MPStatsDataProcessor:
         except Exception as e:
             raise ValueError(f"Ошибка обработки файла выбора ниши: {str(e)}")
     
+    @instrumented('extract.seo_results', rows=lambda metrics, self, df: len(df))
     def process_seo_results_file(self, df):
         """
         Обработка файла SEO результатов
@@ -132,7 +653,7 @@ class MPStatsDataProcessor:
             dict: Извлеченные метрики
         """
         try:
-            metrics = {}
+            metrics = {'rows': len(df)}
             
             # Поиск данных о рекламных ставках
             ad_columns = [col for col in df.columns if 'ставка' in str(col).lower() or 'bid' in str(col).lower()]
@@ -140,6 +661,9 @@ class MPStatsDataProcessor:
                 ad_rates = df[ad_columns[0]].dropna()
                 metrics['avg_ad_rate'] = ad_rates.mean() if len(ad_rates) > 0 else 0
                 metrics['median_ad_rate'] = ad_rates.median() if len(ad_rates) > 0 else 0
+                # Суммы и количества позволяют объединить метрики нескольких файлов
+                metrics['ad_rate_sum'] = ad_rates.sum()
+                metrics['ad_rate_count'] = len(ad_rates)
             
             # Поиск данных о ценах
             price_columns = [col for col in df.columns if 'цена' in str(col).lower() or 'price' in str(col).lower()]
@@ -147,6 +671,8 @@ class MPStatsDataProcessor:
                 prices = df[price_columns[0]].dropna()
                 metrics['avg_price'] = prices.mean() if len(prices) > 0 else 0
                 metrics['median_price'] = prices.median() if len(prices) > 0 else 0
+                metrics['price_sum'] = prices.sum()
+                metrics['price_count'] = len(prices)
             
             # Расчет соотношения цена/ставка
             if 'avg_price' in metrics and 'avg_ad_rate' in metrics and metrics['avg_ad_rate'] > 0:
@@ -155,17 +681,22 @@ class MPStatsDataProcessor:
             # Поиск органических позиций
             organic_columns = [col for col in df.columns if 'без рекламы' in str(col).lower() or 'organic' in str(col).lower()]
             if organic_columns:
-                organic_positions = df[organic_columns[0]].dropna()
-                # Подсчет позиций в топ-100
-                top_100_organic = len(organic_positions[organic_positions <= 100]) if len(organic_positions) > 0 else 0
-                total_top_100 = len(df[df.index <= 100]) if len(df) > 0 else 1
-                metrics['organic_percent'] = (top_100_organic / total_top_100) * 100
+                # Доля органики среди первых 100 позиций выдачи. Номер строки файла берется
+                # из индекса: после склейки в нем остаются только строки, не встречавшиеся
+                # в предыдущих файлах, поэтому доли нескольких файлов складываются из счетчиков
+                top_100 = _top_rows(df, SEO_TOP_POSITIONS)
+                organic_positions = pd.to_numeric(top_100[organic_columns[0]], errors='coerce')
+                top_100_organic = int((organic_positions <= SEO_TOP_POSITIONS).sum())
+                metrics['organic_top_100'] = top_100_organic
+                metrics['top_100_rows'] = len(top_100)
+                metrics['organic_percent'] = (top_100_organic / len(top_100)) * 100 if len(top_100) > 0 else 0
             
             return metrics
             
         except Exception as e:
             raise ValueError(f"Ошибка обработки SEO файла: {str(e)}")
     
+    @instrumented('extract.brands_report', rows=lambda metrics, self, df: len(df))
     def process_brands_report_file(self, df):
         """
         Обработка отчета по брендам
@@ -201,12 +732,84 @@ class MPStatsDataProcessor:
         except Exception as e:
             raise ValueError(f"Ошибка обработки отчета по брендам: {str(e)}")
     
-    def extract_metrics_from_files(self, file_data_list):
+    @instrumented('extract.keyword_frequency', rows=lambda table, *args, **kwargs: len(table))
+    def process_keyword_frequency_file(self, data, columns=None, aggregator=None, name=None):
+        """
+        Обработка выгрузки частотности запросов: спрос по предметам
+        
+        Строки сворачиваются по предметам (сумма частот, число запросов,
+        наибольшее количество товаров по запросу); повторы запросов не учитываются.
+        
+        Args:
+            data: DataFrame или итератор блоков DataFrame (см. iter_dataframe_chunks)
+            columns (dict): Роль -> столбец (по умолчанию - по ключевым словам схемы)
+            aggregator (KeywordDemandAggregator): Общий агрегатор нескольких файлов,
+                чтобы запрос из пересекающихся выгрузок учитывался один раз
+            name (str): Имя файла в агрегаторе
+        
+        Returns:
+            pandas.DataFrame: Спрос по предметам этого файла (KeywordDemandAggregator.table)
+        """
+        try:
+            aggregator = aggregator or KeywordDemandAggregator()
+            name = name or 'keywords'
+            chunks = [data] if isinstance(data, pd.DataFrame) else data
+            for chunk in chunks:
+                if columns is None:
+                    columns = {
+                        role: self._find_role_column('keyword_frequency', role, chunk.columns)
+                        for role in FILE_SCHEMAS['keyword_frequency']
+                    }
+                aggregator.add(name, chunk, columns)
+            return aggregator.table(name)
+            
+        except Exception as e:
+            raise ValueError(f"Ошибка обработки файла частотности запросов: {str(e)}")
+    
+    def _products_by_subject(self, file_data_list):
+        """
+        Количество товаров по нормализованному предмету: из выгрузки ниш, иначе -
+        число уникальных артикулов отчета по товарам
+        
+        Returns:
+            pandas.Series: Предмет -> количество товаров (пустая, если данных нет)
+        """
+        for file_type in ('niche_selection', 'products_report'):
+            counts = []
+            for file_data in file_data_list:
+                df = file_data.get('dataframe')
+                if file_data.get('type') != file_type or df is None:
+                    continue
+                
+                subject_column = self._find_role_column(file_type, 'subject', df.columns)
+                value_role = 'products' if file_type == 'niche_selection' else 'article'
+                value_column = self._find_role_column(file_type, value_role, df.columns)
+                if value_column is None:
+                    continue
+                
+                subjects = (normalize_subject(df[subject_column].to_numpy()) if subject_column is not None
+                            else pd.Series('', index=range(len(df))))
+                values = df[value_column].to_numpy()
+                if file_type == 'niche_selection':
+                    values = pd.to_numeric(pd.Series(values), errors='coerce').fillna(0).to_numpy()
+                    return pd.Series(values).groupby(subjects.to_numpy()).sum()
+                # После склейки следующие отчеты содержат только новые артикулы, поэтому счетчики складываются
+                counts.append(pd.Series(values).groupby(subjects.to_numpy()).nunique())
+            
+            if counts:
+                return pd.concat(counts).groupby(level=0).sum()
+        
+        return pd.Series(dtype=float)
+    
+    @instrumented('extract_metrics', rows=lambda metrics, self, file_data_list: _count_rows(file_data_list))
+    def extract_metrics_from_files(self, file_data_list, deduplicate=True):
         """
         Извлечение метрик из нескольких файлов
         
         Args:
             file_data_list (list): Список с данными файлов
+            deduplicate (bool): Исключить повторы артикулов между файлами (merge_overlapping_files);
+                False - список уже прошел склейку (например, в задаче анализа)
         
         Returns:
             dict: Объединенные метрики для расчета рейтинга
@@ -219,6 +822,14 @@ class MPStatsDataProcessor:
         }
         
         try:
+            # Строки пересекающихся SEO-выгрузок и отчетов по товарам учитываются один раз
+            if deduplicate:
+                file_data_list, _ = self.merge_overlapping_files(file_data_list)
+            seo_parts = []
+            keyword_tables = []
+            # Один агрегатор на все сырые выгрузки запросов: повтор запроса в другом файле не учитывается
+            keyword_aggregator = KeywordDemandAggregator()
+            
             for file_data in file_data_list:
                 file_type = file_data.get('type')
                 df = file_data.get('dataframe')
@@ -239,20 +850,114 @@ class MPStatsDataProcessor:
                     combined_metrics['revenue'] = niche_metrics.get('total_revenue', 0)
                 
                 elif file_type == 'seo_results':
-                    seo_metrics = self.process_seo_results_file(df)
-                    combined_metrics['price_ad_ratio'] = seo_metrics.get('price_ad_ratio', 0)
-                    combined_metrics['organic_percent'] = seo_metrics.get('organic_percent', 0)
+                    seo_parts.append(self.process_seo_results_file(df))
                 
                 elif file_type == 'brands_report':
                     brands_metrics = self.process_brands_report_file(df)
                     if combined_metrics['revenue'] == 0:  # Если не было данных из файла ниш
                         combined_metrics['revenue'] = brands_metrics.get('category_revenue', 0)
+                
+                elif file_type == 'keyword_frequency':
+                    # Потоковая обработка (задачи анализа) передает уже свернутую таблицу по предметам
+                    if file_data.get('aggregated'):
+                        keyword_tables.append(df)
+                    else:
+                        name = file_data.get('name', f"Файл {len(keyword_tables) + 1}")
+                        self.process_keyword_frequency_file(df, aggregator=keyword_aggregator, name=name)
+            
+            keyword_tables.append(keyword_aggregator.table())
+            
+            if seo_parts:
+                combined_metrics.update(_combine_seo_metrics(seo_parts))
+            
+            keyword_table = combine_tables(keyword_tables)
+            if len(keyword_table):
+                # Реальное соотношение: частота запросов предмета к количеству его товаров
+                demand = demand_by_subject(keyword_table, self._products_by_subject(file_data_list))
+                demand_ratio = total_demand_ratio(demand)
+                if demand_ratio is not None:
+                    combined_metrics['demand_ratio'] = demand_ratio
             
             return combined_metrics
             
         except Exception as e:
             raise ValueError(f"Ошибка извлечения метрик: {str(e)}")
     
+    @instrumented('deduplicate', rows=lambda result, self, file_data_list: _count_rows(result[0]))
+    def merge_overlapping_files(self, file_data_list):
+        """
+        Исключение повторов артикулов между несколькими файлами одного типа
+        
+        Для типов DEDUP_FILE_TYPES файлы проходятся по очереди, и из каждого
+        следующего файла отбрасываются строки с артикулом (или, без артикула,
+        с содержимым), уже встречавшимся в предыдущих файлах. Файлы не
+        объединяются в одну таблицу: между ними хранится только отсортированный
+        массив uint64 встреченных ключей (OverlapDeduplicator), а метрики
+        файлов складываются при извлечении. Остальные типы и единственные файлы
+        своего типа возвращаются без изменений.
+        
+        Args:
+            file_data_list (list): Список с данными файлов (type, dataframe, name)
+        
+        Returns:
+            tuple: (список с данными файлов, статистика склейки по типам)
+        """
+        counts = {}
+        for file_data in file_data_list:
+            if file_data.get('type') in DEDUP_FILE_TYPES and file_data.get('dataframe') is not None:
+                counts[file_data['type']] = counts.get(file_data['type'], 0) + 1
+        
+        deduplicators = {file_type: OverlapDeduplicator() for file_type, count in counts.items() if count > 1}
+        if not deduplicators:
+            return file_data_list, {}
+        
+        result = []
+        names = {file_type: set() for file_type in deduplicators}
+        for i, file_data in enumerate(file_data_list):
+            file_type = file_data.get('type')
+            df = file_data.get('dataframe')
+            if file_type not in deduplicators or df is None:
+                result.append(file_data)
+                continue
+            
+            # Одинаковые имена различаются номером: иначе файлы считались бы блоками одного
+            name = file_data.get('name', f"Файл {i + 1}")
+            if name in names[file_type]:
+                name = f"{name} ({i + 1})"
+            names[file_type].add(name)
+            
+            key_column = self._find_role_column(file_type, 'article', df.columns)
+            result.append(dict(file_data, dataframe=deduplicators[file_type].add(name, df, key_column)))
+        
+        stats = {file_type: deduplicator.stats() for file_type, deduplicator in deduplicators.items()}
+        return result, stats
+    
+    def deduplicate_chunks(self, chunks, deduplicator, file_type, name):
+        """
+        Потоковая склейка файла с уже прочитанными файлами того же типа
+        
+        Блоки проходят через OverlapDeduplicator по мере чтения: из файла
+        остаются только строки, артикулы которых не встречались в предыдущих
+        файлах, а между файлами хранится только массив встреченных ключей.
+        
+        Args:
+            chunks (iterable): Блоки файла (iter_dataframe_chunks)
+            deduplicator (OverlapDeduplicator): Склейка файлов этого типа
+            file_type (str): Тип файла (один из DEDUP_FILE_TYPES)
+            name (str): Уникальное имя файла в склейке
+        
+        Yields:
+            pandas.DataFrame: Блоки без повторов из предыдущих файлов
+        """
+        for chunk in chunks:
+            key_column = self._find_role_column(file_type, 'article', chunk.columns)
+            yield deduplicator.add(name, chunk, key_column)
+    
+    def _find_role_column(self, file_type, role, columns):
+        """Первый столбец с ключевыми словами роли из схемы типа (или None)"""
+        keywords = FILE_SCHEMAS[file_type][role][0]
+        return next((col for col in columns if any(keyword in str(col).lower() for keyword in keywords)), None)
+    
     def validate_metrics(self, metrics):
         """
         Валидация извлеченных метрик
@@ -307,10 +1012,15 @@ class MPStatsDataProcessor:
                 "Проверьте наличие информации о продажах и выручке",
                 "Убедитесь в актуальности данных"
             ],
+            'keyword_frequency': [
+                "Файл должен содержать запросы, их частоту и количество товаров по запросу",
+                "Столбец предмета позволяет рассчитать спрос отдельно по каждой нише",
+                "Вместе с выгрузкой «Выбор ниши» соотношение считается по точному числу товаров ниши"
+            ],
             'unknown': [
-                "Переименуйте файл, включив ключевые слова: 'ниша', 'SEO', 'бренд'",
-                "Убедитесь, что файл в формате .xlsx или .csv",
-                "Проверьте структуру данных в файле"
+                "Проверьте, что первая строка файла - заголовки столбцов выгрузки MPStats",
+                "Или переименуйте файл, включив ключевые слова: 'ниша', 'SEO', 'бренд'",
+                "Убедитесь, что файл в формате .xlsx или .csv"
             ]
         }
         
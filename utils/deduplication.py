@@ -0,0 +1,193 @@
+"""
+Склейка пересекающихся выгрузок без повторного учета одних и тех же артикулов
+"""
+
+import numpy as np
+import pandas as pd
+
+# Старший бит отличает хеши строк от артикулов: артикулы маркетплейсов намного меньше 2^63
+_HASH_FLAG = np.uint64(1 << 63)
+
+
+def row_keys(df, key_column=None):
+    """
+    Ключи строк: артикул, а для строк без корректного артикула - хеш содержимого
+
+    Args:
+        df (pandas.DataFrame): Строки выгрузки
+        key_column (str): Столбец артикула (None - только хеш содержимого)
+
+    Returns:
+        tuple: (numpy.ndarray uint64 ключей, количество строк с ключом по хешу)
+    """
+    n = len(df)
+    keys = np.zeros(n, dtype=np.uint64)
+    by_hash = np.ones(n, dtype=bool)
+
+    if key_column is not None and key_column in df.columns:
+        articles = pd.to_numeric(df[key_column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        valid = np.isfinite(articles) & (articles >= 0) & (articles < 2.0 ** 63) & (articles == np.floor(articles))
+        keys[valid] = articles[valid].astype(np.uint64)
+        by_hash = ~valid
+
+    if by_hash.any():
+        hashes = pd.util.hash_pandas_object(df[by_hash], index=False).to_numpy(dtype=np.uint64)
+        keys[by_hash] = hashes | _HASH_FLAG
+
+    return keys, int(by_hash.sum())
+
+
+class OverlapDeduplicator:
+    """
+    Потоковая склейка выгрузок одного типа по артикулу
+
+    Файлы (или их блоки) подаются по очереди. Строка отбрасывается, если
+    ее ключ уже встречался в одном из предыдущих файлов; повторы внутри
+    файла сохраняются (в SEO-выдаче один артикул может стоять на рекламной
+    и органической позиции). Вместо объединенных таблиц хранится только
+    отсортированный массив uint64 уже встреченных ключей и такие же
+    массивы уникальных ключей каждого файла для статистики пересечений:
+    8 байт на артикул независимо от ширины выгрузки.
+    """
+
+    def __init__(self, key_column=None):
+        """
+        Args:
+            key_column (str): Столбец артикула; None - ключ по содержимому строки
+        """
+        self.key_column = key_column
+        self._seen = np.zeros(0, dtype=np.uint64)
+        self._files = {}
+        self._current = None
+
+    def add(self, name, df, key_column=None):
+        """
+        Добавить файл или очередной блок файла
+
+        Args:
+            name (str): Имя файла (блоки одного файла подаются подряд под одним именем)
+            df (pandas.DataFrame): Строки файла или блока
+            key_column (str): Столбец артикула этого файла (по умолчанию - заданный в конструкторе)
+
+        Returns:
+            pandas.DataFrame: Строки с ключами, не встречавшимися в предыдущих файлах
+        """
+        if name != self._current:
+            self._finish_current()
+            self._current = name
+            if name not in self._files:
+                self._files[name] = {
+                    'keys': np.zeros(0, dtype=np.uint64), 'rows': 0, 'kept': 0, 'hashed_rows': 0
+                }
+
+        keys, hashed_rows = row_keys(df, key_column or self.key_column)
+
+        # Одна сортировка ключей блока: по ней и поиск в уже встреченных
+        # (отсортированные запросы searchsorted идут по памяти последовательно),
+        # и уникальные ключи файла
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        seen_before = np.empty(len(keys), dtype=bool)
+        seen_before[order] = contains_sorted(self._seen, sorted_keys)
+
+        state = self._files[name]
+        state['keys'] = merge_unique(state['keys'], unique_sorted(sorted_keys))
+        state['rows'] += len(df)
+        state['kept'] += int((~seen_before).sum())
+        state['hashed_rows'] += hashed_rows
+
+        if seen_before.any():
+            return df[~seen_before]
+        return df
+
+    def file_names(self):
+        """Имена добавленных файлов в порядке добавления"""
+        return list(self._files)
+
+    def file_stats(self, name):
+        """Строки файла и строки, оставленные после склейки с предыдущими файлами"""
+        state = self._files.get(name, {'rows': 0, 'kept': 0})
+        return {'rows': state['rows'], 'kept_rows': state['kept']}
+
+    def stats(self):
+        """
+        Статистика склейки
+
+        Returns:
+            dict: files - по каждому файлу строки, уникальные ключи, повторы внутри
+                файла, строки из предыдущих файлов (overlap_rows) и оставленные строки;
+                overlap - попарные пересечения уникальных ключей (количество и доля
+                Жаккара); total_rows, kept_rows, unique_keys - по всем файлам
+        """
+        self._finish_current()
+        names = list(self._files)
+
+        files = []
+        for name in names:
+            state = self._files[name]
+            files.append({
+                'name': name,
+                'rows': state['rows'],
+                'unique_keys': len(state['keys']),
+                'duplicates_within': state['rows'] - len(state['keys']),
+                'overlap_rows': state['rows'] - state['kept'],
+                'kept_rows': state['kept'],
+                'hashed_rows': state['hashed_rows']
+            })
+
+        overlap = []
+        for i, first in enumerate(names):
+            for second in names[i + 1:]:
+                a, b = self._files[first]['keys'], self._files[second]['keys']
+                common = int(contains_sorted(a, b).sum())
+                union = len(a) + len(b) - common
+                overlap.append({
+                    'files': (first, second),
+                    'common_keys': common,
+                    'jaccard': common / union if union else 0.0
+                })
+
+        return {
+            'files': files,
+            'overlap': overlap,
+            'total_rows': sum(item['rows'] for item in files),
+            'kept_rows': sum(item['kept_rows'] for item in files),
+            'unique_keys': len(self._seen)
+        }
+
+    def _finish_current(self):
+        """Ключи завершенного файла становятся "встреченными" для следующих"""
+        if self._current is not None:
+            self._seen = merge_unique(self._seen, self._files[self._current]['keys'])
+            self._current = None
+
+
+def unique_sorted(sorted_keys):
+    """Уникальные значения отсортированного массива"""
+    if len(sorted_keys) == 0:
+        return sorted_keys
+    first = np.empty(len(sorted_keys), dtype=bool)
+    first[0] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=first[1:])
+    return sorted_keys[first]
+
+
+def merge_unique(first, second):
+    """Объединение двух отсортированных массивов уникальных ключей"""
+    if len(first) == 0:
+        return second
+    if len(second) == 0:
+        return first
+    merged = np.concatenate([first, second])
+    merged.sort()
+    return unique_sorted(merged)
+
+
+def contains_sorted(sorted_keys, keys):
+    """Булева маска: входит ли каждый ключ в отсортированный массив sorted_keys"""
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.searchsorted(sorted_keys, keys)
+    positions[positions == len(sorted_keys)] = 0
+    return sorted_keys[positions] == keys
+
@@ -0,0 +1,340 @@
+"""
+Потоковая выгрузка рейтинга ниш в Excel (xlsx) с постоянным расходом памяти
+"""
+
+import functools
+import itertools
+import math
+import numbers
+import os
+import re
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+from .calculator import ProductRatingCalculator
+from .instrumentation import instrumented
+
+# Лимит строк на лист Excel (с учетом строки заголовка)
+XLSX_MAX_ROWS = 1048575
+
+# Количество ниш, значения которых переводятся из массивов NumPy в числа Python за один раз
+CHUNK_ROWS = 10000
+
+# Столбцы выгрузки: (ключ, заголовок, ширина столбца)
+EXPORT_COLUMNS = [
+    ('rank', 'Место', 8),
+    ('name', 'Ниша', 32),
+    ('final_rating', 'Рейтинг', 10),
+    ('status', 'Оценка', 18),
+    ('demand', 'Спрос/Предложение', 12),
+    ('revenue', 'Выручка категории', 12),
+    ('ad_efficiency', 'Эффективность рекламы', 12),
+    ('organic', 'Процент органики', 12),
+    ('demand_ratio', 'Запросы/товары', 12),
+    ('revenue_rub', 'Выручка, ₽/мес', 16),
+    ('price_ad_ratio', 'Цена/ставка', 12),
+    ('organic_percent', 'Органика, %', 12),
+    ('recommendations', 'Рекомендации', 80)
+]
+
+# Ключи метрик ниши (как для calculate_rating)
+METRIC_KEYS = ['demand_ratio', 'revenue', 'price_ad_ratio', 'organic_percent']
+
+# Оценки calculate_ratings_batch в порядке столбцов выгрузки
+_SCORE_KEYS = ['demand', 'revenue', 'ad_efficiency', 'organic']
+
+# Количество строк, сериализуемых в XML и передаваемых в архив за один раз
+FLUSH_ROWS = 2000
+
+# Символы, недопустимые в XML 1.0 (управляющие, кроме табуляции и переводов строки)
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Дополнительное экранирование для значений атрибутов XML
+_ATTRIBUTE_ENTITIES = {'"': '&quot;'}
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RELATIONSHIP = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_WORKSHEET_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_CONTENT_TYPES = (
+    _XML_DECLARATION
+    + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+
+_ROOT_RELS = (
+    _XML_DECLARATION
+    + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{_RELATIONSHIP}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    _XML_DECLARATION
+    + f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_RELATIONSHIP}"><sheets>{{sheets}}</sheets></workbook>'
+)
+
+_WORKBOOK_RELS = (
+    _XML_DECLARATION
+    + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{sheets}'
+    f'<Relationship Id="rId{{styles_id}}" Type="{_RELATIONSHIP}/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Стили: 0 - обычная ячейка, 1 - заголовок (полужирный)
+_STYLES = (
+    _XML_DECLARATION
+    + f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+# Начало листа: строка заголовка закреплена, ширины столбцов заданы
+_SHEET_HEAD = (
+    _XML_DECLARATION
+    + f'<worksheet xmlns="{_MAIN_NS}">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><cols>{cols}</cols><sheetData>'
+)
+
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+@functools.lru_cache(maxsize=1024)
+def _text_cell(text):
+    """XML ячейки с текстом (оценки и рекомендации повторяются, поэтому результат кэшируется)"""
+    text = _INVALID_XML_CHARS.sub('', escape(text))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _cell(value):
+    """XML ячейки: числа - значением, текст - inline-строкой, пропуски и NaN - пустой ячейкой"""
+    # Точные типы проверяются первыми: isinstance с абстрактными классами numbers заметно дороже
+    kind = type(value)
+    if kind is float:
+        # NaN и бесконечность в xlsx не представимы
+        return f'<c><v>{value!r}</v></c>' if math.isfinite(value) else '<c/>'
+    if kind is int:
+        return f'<c><v>{value}</v></c>'
+    if kind is str:
+        return _text_cell(value)
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    # Скаляры NumPy и прочие числовые типы
+    if isinstance(value, numbers.Integral):
+        return f'<c><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Real):
+        return _cell(float(value))
+    return _text_cell(str(value))
+
+
+def _describe(calculator, final_rating, breakdown):
+    """Оценка (interpret_rating) и текст рекомендаций (get_recommendations) одной ниши"""
+    status, _ = calculator.interpret_rating(final_rating)
+    recommendations = calculator.get_recommendations({'final_rating': final_rating, 'breakdown': breakdown})
+    return status, '\n'.join(f"{rec['text']} {rec['action']}" for rec in recommendations)
+
+
+def iter_comparison_rows(results, calculator=None):
+    """
+    Строки выгрузки из результата compare_niches
+
+    Args:
+        results (iterable): Ниши, отсортированные по рейтингу (результат compare_niches)
+        calculator (ProductRatingCalculator): Калькулятор для оценок и рекомендаций
+
+    Yields:
+        tuple: Значения строки в порядке EXPORT_COLUMNS
+    """
+    calculator = calculator or ProductRatingCalculator()
+    for rank, item in enumerate(results, start=1):
+        details = item['details']
+        breakdown = details['breakdown']
+        metrics = item.get('metrics') or {}
+        status, recommendations = _describe(calculator, details['final_rating'], breakdown)
+        yield (
+            (rank, item['name'], details['final_rating'], status)
+            + tuple(breakdown[key] for key in _SCORE_KEYS)
+            + tuple(metrics.get(key) for key in METRIC_KEYS)
+            + (recommendations,)
+        )
+
+
+def iter_ranked_rows(names, metrics, calculator=None, chunk_rows=CHUNK_ROWS):
+    """
+    Строки выгрузки для множества ниш по убыванию рейтинга
+
+    Рейтинг считается векторно (calculate_ratings_batch), порядок - одной
+    сортировкой индексов. Значения переводятся в числа Python блоками по
+    chunk_rows ниш, поэтому кроме входных массивов в памяти находится
+    только текущий блок.
+
+    Args:
+        names (sequence): Названия ниш
+        metrics (dict): Массивы demand_ratio, revenue, price_ad_ratio, organic_percent
+        calculator (ProductRatingCalculator): Калькулятор с весами и порогами
+        chunk_rows (int): Количество ниш в блоке
+
+    Yields:
+        tuple: Значения строки в порядке EXPORT_COLUMNS
+    """
+    import numpy as np
+
+    calculator = calculator or ProductRatingCalculator()
+    metric_arrays = [np.asarray(metrics[key], dtype=float) for key in METRIC_KEYS]
+    if any(len(values) != len(names) for values in metric_arrays):
+        raise ValueError("Количество значений метрик не совпадает с количеством ниш")
+
+    scores = calculator.calculate_ratings_batch(*metric_arrays)
+    # Устойчивая сортировка: ниши с одинаковым рейтингом сохраняют исходный порядок
+    order = np.argsort(-scores['final_rating'], kind='stable')
+    names = np.asarray(names, dtype=object)
+
+    for start in range(0, len(order), chunk_rows):
+        index = order[start:start + chunk_rows]
+        ratings = scores['final_rating'][index].tolist()
+        score_columns = [scores[key][index].tolist() for key in _SCORE_KEYS]
+        metric_columns = [values[index].tolist() for values in metric_arrays]
+
+        for offset, (name, rating, *values) in enumerate(
+            zip(names[index].tolist(), ratings, *score_columns, *metric_columns)
+        ):
+            breakdown = dict(zip(_SCORE_KEYS, values[:len(_SCORE_KEYS)]))
+            status, recommendations = _describe(calculator, rating, breakdown)
+            yield (start + offset + 1, name, rating, status, *values, recommendations)
+
+
+@instrumented('export.xlsx', rows=lambda result, *args, **kwargs: result['rows'])
+def export_ranking_xlsx(rows, output, columns=EXPORT_COLUMNS, sheet_title='Рейтинг', max_sheet_rows=XLSX_MAX_ROWS):
+    """
+    Потоковая запись строк рейтинга в xlsx
+
+    Листы пишутся как поток XML прямо в сжимаемую запись zip-архива: строки
+    сериализуются блоками по FLUSH_ROWS и сразу уходят в архив, текст хранится
+    inline-строками без общей таблицы строк, поэтому память не зависит от
+    количества ниш. После max_sheet_rows строк начинается следующий лист со
+    своей строкой заголовка.
+
+    Args:
+        rows (iterable): Кортежи значений в порядке columns (iter_ranked_rows, iter_comparison_rows)
+        output: Путь к файлу или файловый объект (например, io.BytesIO для st.download_button)
+        columns (list): Столбцы (ключ, заголовок, ширина)
+        sheet_title (str): Название листа; следующие листы нумеруются ("Рейтинг 2")
+        max_sheet_rows (int): Строк данных на листе (не больше лимита Excel)
+
+    Returns:
+        dict: path, rows, sheets, bytes, seconds и rows_per_second (пропускная способность)
+    """
+    if not 0 < max_sheet_rows <= XLSX_MAX_ROWS:
+        raise ValueError(f"Количество строк на листе должно быть от 1 до {XLSX_MAX_ROWS}")
+
+    start = time.perf_counter()
+    header = '<row>' + ''.join(f'<c t="inlineStr" s="1"><is><t>{escape(title)}</t></is></c>'
+                               for _, title, _ in columns) + '</row>'
+    sheet_head = _SHEET_HEAD.format(cols=''.join(
+        f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>'
+        for i, (_, _, width) in enumerate(columns, start=1)
+    ))
+
+    rows = iter(rows)
+    total = 0
+    sheets = 0
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        while True:
+            block = list(itertools.islice(rows, min(FLUSH_ROWS, max_sheet_rows)))
+            if sheets and not block:
+                break
+
+            sheets += 1
+            sheet_rows = 0
+            with archive.open(f"xl/worksheets/sheet{sheets}.xml", 'w', force_zip64=True) as sheet:
+                sheet.write((sheet_head + header).encode('utf-8'))
+                while block:
+                    sheet.write(''.join(
+                        '<row>' + ''.join(map(_cell, row)) + '</row>' for row in block
+                    ).encode('utf-8'))
+                    sheet_rows += len(block)
+                    total += len(block)
+                    if sheet_rows >= max_sheet_rows:
+                        break
+                    block = list(itertools.islice(rows, min(FLUSH_ROWS, max_sheet_rows - sheet_rows)))
+                sheet.write(_SHEET_TAIL.encode('utf-8'))
+
+            if sheet_rows < max_sheet_rows:
+                break
+
+        names = [sheet_title if n == 1 else f"{sheet_title} {n}" for n in range(1, sheets + 1)]
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(sheets=''.join(
+            f'<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="{_WORKSHEET_TYPE}"/>'
+            for n in range(1, sheets + 1)
+        )))
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name="{escape(name, _ATTRIBUTE_ENTITIES)}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, name in enumerate(names, start=1)
+        )))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(
+            sheets=''.join(
+                f'<Relationship Id="rId{n}" Type="{_RELATIONSHIP}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                for n in range(1, sheets + 1)
+            ),
+            styles_id=sheets + 1
+        ))
+        archive.writestr('xl/styles.xml', _STYLES)
+
+    seconds = time.perf_counter() - start
+
+    if isinstance(output, (str, os.PathLike)):
+        size = os.path.getsize(output)
+    else:
+        size = output.tell() if hasattr(output, 'tell') else None
+
+    return {
+        'path': output if isinstance(output, (str, os.PathLike)) else None,
+        'rows': total,
+        'sheets': sheets,
+        'bytes': size,
+        'seconds': seconds,
+        'rows_per_second': total / seconds if seconds > 0 else None
+    }
+
+
+def export_ranking(names, metrics, output, weights=None, thresholds=None, **kwargs):
+    """
+    Рейтинг множества ниш с оценками и рекомендациями в xlsx
+
+    Args:
+        names (sequence): Названия ниш
+        metrics (dict): Массивы demand_ratio, revenue, price_ad_ratio, organic_percent
+        output: Путь к файлу или файловый объект
+        weights (dict): Веса метрик
+        thresholds (dict): Пороговые значения
+        **kwargs: Параметры export_ranking_xlsx (sheet_title, max_sheet_rows)
+
+    Returns:
+        dict: Результат export_ranking_xlsx
+    """
+    calculator = ProductRatingCalculator()
+    calculator.update_weights(weights or {})
+    calculator.update_thresholds(thresholds or {})
+    return export_ranking_xlsx(iter_ranked_rows(names, metrics, calculator), output, **kwargs)
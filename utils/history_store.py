@@ -0,0 +1,282 @@
+"""
+Локальное хранилище истории метрик и рейтингов ниш (SQLite)
+"""
+
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+# Путь по умолчанию можно переопределить переменной окружения
+DEFAULT_DB_PATH = os.environ.get(
+    'MPSTATS_HISTORY_DB',
+    os.path.join(os.path.expanduser('~'), '.mpstats', 'history.sqlite')
+)
+
+# Исходные метрики (как в extract_metrics_from_files)
+METRIC_COLUMNS = ['demand_ratio', 'revenue', 'price_ad_ratio', 'organic_percent']
+
+# Оценки calculate_rating: столбец -> ключ в breakdown
+SCORE_COLUMNS = {
+    'demand_score': 'demand',
+    'revenue_score': 'revenue',
+    'ad_score': 'ad_efficiency',
+    'organic_score': 'organic'
+}
+
+VALUE_COLUMNS = METRIC_COLUMNS + ['final_rating'] + list(SCORE_COLUMNS)
+
+# Сколько ниш подставлять в один запрос IN (...): старые сборки SQLite ограничивают
+# количество параметров запроса 999, еще два занимают границы дат
+QUERY_NICHES_CHUNK = 900
+
+# Ряды для create_trend_chart: ключ -> столбец хранилища
+TREND_SERIES = {
+    'demand': 'demand_score',
+    'revenue': 'revenue_score',
+    'ads': 'ad_score',
+    'organic': 'organic_score'
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS niche_metrics (
+    niche TEXT NOT NULL,
+    date TEXT NOT NULL,
+    {', '.join(f'{column} REAL' for column in VALUE_COLUMNS)},
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (niche, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_niche_metrics_date ON niche_metrics (date, niche);
+"""
+
+
+def _to_day(value):
+    """
+    Приведение даты к строке 'YYYY-MM-DD'
+
+    Поддерживаются str, date, datetime (в том числе pandas.Timestamp) и numpy.datetime64.
+    """
+    if value is None:
+        return datetime.date.today().isoformat()
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10]).isoformat()
+    if hasattr(value, 'astype'):
+        return str(value.astype('datetime64[D]'))
+    raise ValueError(f"Неподдерживаемый формат даты: {value!r}")
+
+
+class NicheHistoryStore:
+    """
+    История метрик ниш по датам
+
+    Одна запись на пару (ниша, дата): повторное сохранение за ту же дату
+    обновляет запись. Первичный ключ (niche, date) обслуживает запросы по
+    диапазону дат для ниши, индекс (date, niche) - срезы по всем нишам.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Путь к файлу базы (':memory:' - в памяти)
+        """
+        self.path = path or DEFAULT_DB_PATH
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        # Одно соединение на хранилище; доступ из потоков Streamlit - под блокировкой
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._conn:
+            if self.path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+
+    def append(self, niche, metrics, rating=None, date=None):
+        """
+        Сохранить метрики ниши за дату (с заменой существующей записи)
+
+        Args:
+            niche (str): Название ниши
+            metrics (dict): Метрики extract_metrics_from_files
+            rating (dict): Результат calculate_rating (необязательно)
+            date: Дата записи (по умолчанию - сегодня)
+        """
+        self.append_many([{'niche': niche, 'metrics': metrics, 'rating': rating, 'date': date}])
+
+    def append_many(self, records):
+        """
+        Пакетное сохранение записей в одной транзакции
+
+        Args:
+            records (iterable): Словари с ключами niche, metrics и необязательными rating, date
+
+        Returns:
+            int: Количество сохраненных записей
+        """
+        now = time.time()
+        rows = [self._to_row(record, now) for record in records]
+        if not rows:
+            return 0
+
+        columns = ['niche', 'date'] + VALUE_COLUMNS + ['updated_at']
+        sql = (
+            f"INSERT OR REPLACE INTO niche_metrics ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(sql, rows)
+        return len(rows)
+
+    def query(self, niches=None, start=None, end=None, columns=None):
+        """
+        Записи за диапазон дат
+
+        Args:
+            niches (list): Ниши (None - все)
+            start: Начальная дата включительно (None - без ограничения)
+            end: Конечная дата включительно (None - без ограничения)
+            columns (list): Столбцы значений (по умолчанию все)
+
+        Returns:
+            list: Кортежи (niche, date, *значения), упорядоченные по нише и дате
+        """
+        columns = list(columns or VALUE_COLUMNS)
+        unknown = set(columns) - set(VALUE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы: {', '.join(sorted(unknown))}")
+
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append('date >= ?')
+            params.append(_to_day(start))
+        if end is not None:
+            conditions.append('date <= ?')
+            params.append(_to_day(end))
+
+        sql = f"SELECT niche, date, {', '.join(columns)} FROM niche_metrics"
+
+        if niches is None:
+            if conditions:
+                sql += ' WHERE ' + ' AND '.join(conditions)
+            with self._lock:
+                return self._conn.execute(sql + ' ORDER BY niche, date', params).fetchall()
+
+        # Ниши сортируются и запрашиваются частями: результаты частей идут подряд
+        # в том же порядке, что и ORDER BY niche (UTF-8 сравнивается по кодам символов)
+        niches = sorted(set(niches))
+        rows = []
+        with self._lock:
+            for i in range(0, len(niches), QUERY_NICHES_CHUNK):
+                chunk = niches[i:i + QUERY_NICHES_CHUNK]
+                chunk_conditions = [f"niche IN ({', '.join('?' * len(chunk))})"] + conditions
+                chunk_sql = sql + ' WHERE ' + ' AND '.join(chunk_conditions) + ' ORDER BY niche, date'
+                rows.extend(self._conn.execute(chunk_sql, chunk + params).fetchall())
+        return rows
+
+    def to_historical_data(self, niche, start=None, end=None):
+        """
+        История ниши в формате create_trend_chart
+
+        Returns:
+            dict: dates (numpy.datetime64[D]) и ряды оценок demand, revenue, ads, organic
+                (пропуски - NaN); None, если записей нет
+        """
+        return self.to_historical_data_many([niche], start, end).get(niche)
+
+    def to_historical_data_many(self, niches=None, start=None, end=None):
+        """
+        История нескольких ниш одним запросом (большие списки - частями по QUERY_NICHES_CHUNK)
+
+        Returns:
+            dict: Ниша -> данные в формате create_trend_chart
+        """
+        import numpy as np
+
+        rows = self.query(niches, start, end, columns=list(TREND_SERIES.values()))
+
+        result = {}
+        begin = 0
+        for i in range(1, len(rows) + 1):
+            if i < len(rows) and rows[i][0] == rows[begin][0]:
+                continue
+
+            chunk = rows[begin:i]
+            # None (нет рейтинга) превращается в NaN
+            values = np.array([row[2:] for row in chunk], dtype=float)
+            data = {'dates': np.array([row[1] for row in chunk], dtype='datetime64[D]')}
+            for j, key in enumerate(TREND_SERIES):
+                data[key] = values[:, j]
+            result[chunk[0][0]] = data
+            begin = i
+
+        return result
+
+    def niches(self):
+        """Список ниш с количеством записей и диапазоном дат"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT niche, COUNT(*), MIN(date), MAX(date) FROM niche_metrics GROUP BY niche ORDER BY niche'
+            ).fetchall()
+        return [
+            {'niche': niche, 'records': count, 'first_date': first, 'last_date': last}
+            for niche, count, first, last in rows
+        ]
+
+    def delete(self, niche, start=None, end=None):
+        """
+        Удалить записи ниши (при указании дат - только за диапазон)
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        sql = 'DELETE FROM niche_metrics WHERE niche = ?'
+        params = [niche]
+        if start is not None:
+            sql += ' AND date >= ?'
+            params.append(_to_day(start))
+        if end is not None:
+            sql += ' AND date <= ?'
+            params.append(_to_day(end))
+
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _to_row(record, now):
+        niche = record.get('niche')
+        if not niche:
+            raise ValueError("Не указано название ниши")
+
+        metrics = record.get('metrics') or {}
+        rating = record.get('rating')
+        breakdown = rating['breakdown'] if rating else {}
+
+        return (
+            [niche, _to_day(record.get('date'))] +
+            [_to_float(metrics.get(column)) for column in METRIC_COLUMNS] +
+            [_to_float(rating['final_rating']) if rating else None] +
+            [_to_float(breakdown.get(key)) for key in SCORE_COLUMNS.values()] +
+            [now]
+        )
+
+
+def _to_float(value):
+    return None if value is None else float(value)
@@ -0,0 +1,197 @@
+"""
+Легковесная инструментация горячих путей: время и количество строк по этапам
+
+По умолчанию выключена: обернутые функции вызываются напрямую после одной
+проверки флага. Включается через enable() или переменную окружения
+MPSTATS_INSTRUMENTATION=1. json и logging импортируются только при записи
+в лог, чтобы не замедлять холодный импорт модулей расчета.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LOGGER_NAME = 'mpstats.instrumentation'
+
+# Сколько последних событий хранить для панели отладки
+RECENT_EVENTS_LIMIT = 200
+
+
+class _State:
+    enabled = os.environ.get('MPSTATS_INSTRUMENTATION') == '1'
+    log_events = False
+
+
+_state = _State()
+_lock = threading.Lock()
+_stats = {}
+_recent = deque(maxlen=RECENT_EVENTS_LIMIT)
+
+
+class _StageRecord:
+    """Запись текущего этапа; rows можно задать внутри блока stage()"""
+
+    __slots__ = ('rows',)
+
+    def __init__(self, rows=None):
+        self.rows = rows
+
+
+def enable(enabled=True, log_events=False):
+    """
+    Включить или выключить сбор замеров
+
+    Args:
+        enabled (bool): Собирать ли замеры
+        log_events (bool): Писать ли каждое событие в лог (JSON, уровень DEBUG)
+    """
+    _state.enabled = enabled
+    _state.log_events = log_events
+
+
+def is_enabled():
+    return _state.enabled
+
+
+def record(name, seconds, rows=None):
+    """Учесть один замер этапа"""
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0}
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        if rows is not None:
+            stats['rows'] += int(rows)
+
+        event = {'stage': name, 'seconds': seconds, 'rows': rows, 'time': time.time()}
+        _recent.append(event)
+
+    if _state.log_events:
+        import json
+        import logging
+        logging.getLogger(LOGGER_NAME).debug(json.dumps(event, ensure_ascii=False))
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Замер блока кода
+
+    Пример:
+        with stage('parse') as st:
+            df = read()
+            st.rows = len(df)
+    """
+    item = _StageRecord(rows)
+    if not _state.enabled:
+        yield item
+        return
+
+    start = time.perf_counter()
+    try:
+        yield item
+    finally:
+        record(name, time.perf_counter() - start, item.rows)
+
+
+def instrumented(name, rows=None):
+    """
+    Декоратор замера функции
+
+    Args:
+        name (str): Имя этапа
+        rows (callable): Функция (result, *args, **kwargs) -> количество строк
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            row_count = None
+            if rows is not None:
+                try:
+                    row_count = rows(result, *args, **kwargs)
+                except Exception:
+                    row_count = None
+
+            record(name, elapsed, row_count)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def get_stats():
+    """
+    Снимок накопленных замеров
+
+    Returns:
+        dict: Для каждого этапа - count, seconds, max_seconds, rows, avg_seconds
+    """
+    with _lock:
+        return {
+            name: dict(stats, avg_seconds=stats['seconds'] / stats['count'])
+            for name, stats in _stats.items()
+        }
+
+
+def get_recent_events(limit=None):
+    """Последние события (от новых к старым)"""
+    with _lock:
+        events = list(_recent)[::-1]
+    return events[:limit] if limit else events
+
+
+def reset():
+    """Сбросить накопленные замеры"""
+    with _lock:
+        _stats.clear()
+        _recent.clear()
+
+
+def to_prometheus(prefix='mpstats_stage'):
+    """
+    Выгрузка замеров в текстовом формате Prometheus
+
+    Returns:
+        str: Метрики _calls_total, _seconds_total, _seconds_max и _rows_total с меткой stage
+    """
+    stats = get_stats()
+    metrics = [
+        ('calls_total', 'counter', 'Количество вызовов этапа', 'count'),
+        ('seconds_total', 'counter', 'Суммарное время этапа, с', 'seconds'),
+        ('seconds_max', 'gauge', 'Максимальное время одного вызова, с', 'max_seconds'),
+        ('rows_total', 'counter', 'Количество обработанных строк', 'rows')
+    ]
+
+    lines = []
+    for suffix, metric_type, help_text, key in metrics:
+        metric = f"{prefix}_{suffix}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for name in sorted(stats):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{metric}{{stage="{label}"}} {stats[name][key]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def log_stats(level=None):
+    """Записать накопленные замеры в лог, по одной JSON-строке на этап (по умолчанию INFO)"""
+    import json
+    import logging
+
+    logger = logging.getLogger(LOGGER_NAME)
+    for name, stats in sorted(get_stats().items()):
+        logger.log(level or logging.INFO, json.dumps(dict(stats, stage=name), ensure_ascii=False))
@@ -0,0 +1,400 @@
+"""
+Фоновая очередь задач для длительного анализа файлов MPStats
+"""
+
+import io
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .calculator import ProductRatingCalculator
+from .data_processor import DEDUP_FILE_TYPES
+from .deduplication import OverlapDeduplicator
+from .keyword_demand import KeywordDemandAggregator
+
+# Этапы обработки задачи: (код, название для интерфейса)
+JOB_STAGES = [
+    ('parse', 'Чтение файлов'),
+    ('resolve_columns', 'Определение типов файлов и колонок'),
+    ('aggregate', 'Агрегация метрик'),
+    ('score', 'Расчет рейтинга')
+]
+
+# Статусы задачи
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+
+class JobCancelledError(Exception):
+    """Задача отменена пользователем"""
+
+
+class AnalysisJob:
+    """Состояние одной фоновой задачи анализа"""
+
+    def __init__(self, job_id, files, weights, thresholds, owner=None):
+        self.job_id = job_id
+        self.files = files
+        self.weights = weights
+        self.thresholds = thresholds
+        self.owner = owner
+
+        self.status = STATUS_PENDING
+        self.stage = None
+        self.stage_progress = 0.0
+        self.message = 'Задача в очереди'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+        self.future = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Прервать выполнение, если задача была отменена"""
+        if self._cancel_event.is_set():
+            raise JobCancelledError()
+
+    def set_stage(self, stage, fraction=0.0, message=None):
+        """Обновить текущий этап и прогресс внутри него"""
+        with self._lock:
+            self.stage = stage
+            self.stage_progress = min(max(fraction, 0.0), 1.0)
+            if message is not None:
+                self.message = message
+
+    def snapshot(self):
+        """
+        Снимок состояния задачи для отображения
+
+        Returns:
+            dict: Статус, этап, общий прогресс (0-1) и сообщение
+        """
+        with self._lock:
+            stage_codes = [code for code, _ in JOB_STAGES]
+            if self.status == STATUS_DONE:
+                progress = 1.0
+            elif self.stage in stage_codes:
+                progress = (stage_codes.index(self.stage) + self.stage_progress) / len(JOB_STAGES)
+            else:
+                progress = 0.0
+
+            return {
+                'job_id': self.job_id,
+                'status': self.status,
+                'stage': self.stage,
+                'stage_name': dict(JOB_STAGES).get(self.stage, ''),
+                'progress': progress,
+                'message': self.message,
+                'error': self.error,
+                'files': [name for name, _ in self.files],
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+
+
+class AnalysisJobManager:
+    """Пул фоновых задач анализа файлов с реестром результатов"""
+
+    def __init__(self, data_processor, max_workers=2, max_finished_jobs=20, memory_manager=None):
+        """
+        Args:
+            data_processor (MPStatsDataProcessor): Обработчик файлов
+            max_workers (int): Количество рабочих потоков
+            max_finished_jobs (int): Сколько завершенных задач хранить до вытеснения
+            memory_manager (DataFrameMemoryManager): Хранилище прочитанных таблиц (необязательно)
+        """
+        self.data_processor = data_processor
+        self.memory_manager = memory_manager
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mpstats-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, files, weights=None, thresholds=None, owner=None):
+        """
+        Поставить анализ файлов в очередь
+
+        Args:
+            files (list): Список пар (имя файла, содержимое в байтах)
+            weights (dict): Веса метрик на момент запуска
+            thresholds (dict): Пороговые значения на момент запуска
+            owner (str): Идентификатор сессии-владельца задачи
+
+        Returns:
+            str: Идентификатор задачи
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = AnalysisJob(
+            job_id,
+            list(files),
+            dict(weights or {}),
+            dict(thresholds or {}),
+            owner=owner
+        )
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict_finished()
+
+        job.future = self._executor.submit(self._run_job, job)
+        return job_id
+
+    def get_status(self, job_id):
+        """Получить снимок состояния задачи (или None, если задачи нет)"""
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def get_result(self, job_id):
+        """Получить результат завершенной задачи (или None)"""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != STATUS_DONE:
+            return None
+        return job.result
+
+    def cancel(self, job_id):
+        """
+        Отменить задачу
+
+        Returns:
+            bool: True, если задача была найдена и еще не завершилась
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return False
+
+        job._cancel_event.set()
+        # Задача еще не начала выполняться - снимаем ее из очереди сразу
+        if job.future is not None and job.future.cancel():
+            self._finish(job, STATUS_CANCELLED, message='Задача отменена')
+        return True
+
+    def evict(self, job_id):
+        """Удалить задачу и ее результат из реестра"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            self._release(job)
+        return job is not None
+
+    def get_frame(self, job_id, file_index):
+        """
+        Получить полную таблицу файла из завершенной задачи
+        
+        Args:
+            job_id (str): Идентификатор задачи
+            file_index (int): Номер файла в задаче (как в result['files'])
+
+        Returns:
+            pandas.DataFrame: Данные файла или None, если таблица не сохранялась
+        """
+        job = self._jobs.get(job_id)
+        if job is None or self.memory_manager is None:
+            return None
+        return self.memory_manager.get(job.owner, self._frame_key(job, file_index))
+
+    def list_jobs(self, owner=None):
+        """Список снимков задач (при указании owner - только задачи этой сессии)"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.snapshot() for job in jobs if owner is None or job.owner == owner]
+
+    def shutdown(self, wait=False):
+        """Отменить все задачи и остановить пул"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job._cancel_event.set()
+        self._executor.shutdown(wait=wait)
+
+    def _evict_finished(self):
+        """Вытеснение самых старых завершенных задач сверх лимита"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            self._release(self._jobs.pop(job_id))
+
+    def _release(self, job):
+        """Остановить задачу и освободить сохраненные таблицы"""
+        if job.status not in FINISHED_STATUSES:
+            job._cancel_event.set()
+        if self.memory_manager is not None:
+            for file_index in range(len(job.files)):
+                self.memory_manager.remove(job.owner, self._frame_key(job, file_index))
+
+    @staticmethod
+    def _frame_key(job, file_index):
+        # Номер, а не имя файла: в одной задаче могут быть файлы с одинаковыми именами
+        return f"{job.job_id}/{file_index}"
+
+    @staticmethod
+    def _cancellable(job, chunks):
+        """Блоки потокового чтения с проверкой отмены задачи перед каждым блоком"""
+        for chunk in chunks:
+            job.check_cancelled()
+            yield chunk
+
+    def _finish(self, job, status, message=None, error=None):
+        with job._lock:
+            job.status = status
+            job.finished_at = time.time()
+            if message is not None:
+                job.message = message
+            job.error = error
+            # Исходные байты файлов больше не нужны
+            job.files = [(name, b'') for name, _ in job.files]
+
+        with self._lock:
+            self._evict_finished()
+
+    def _run_job(self, job):
+        """Выполнение задачи в рабочем потоке"""
+        if job.cancelled:
+            self._finish(job, STATUS_CANCELLED, message='Задача отменена')
+            return
+
+        job.status = STATUS_RUNNING
+        try:
+            job.result = self._analyze(job)
+            self._finish(job, STATUS_DONE, message='Анализ завершен')
+        except JobCancelledError:
+            self._finish(job, STATUS_CANCELLED, message='Задача отменена')
+        except Exception as e:
+            self._finish(job, STATUS_FAILED, message='Ошибка анализа', error=str(e))
+
+    def _analyze(self, job):
+        """
+        Конвейер анализа: чтение -> определение колонок -> агрегация -> расчет
+
+        Returns:
+            dict: Информация о файлах, метрики и результат расчета рейтинга
+        """
+        processor = self.data_processor
+        total_files = len(job.files)
+
+        # 1. Чтение файлов
+        frames = []
+        # Выгрузки частотности запросов читаются блоками и сразу сворачиваются по предметам
+        keyword_aggregator = KeywordDemandAggregator()
+        # SEO-выгрузки и отчеты по товарам склеиваются по мере чтения: между файлами
+        # хранится только отсортированный массив встреченных артикулов
+        deduplicators = {}
+        for i, (name, content) in enumerate(job.files):
+            job.check_cancelled()
+            job.set_stage('parse', i / max(total_files, 1), f"Чтение файла {name}")
+
+            buffer = io.BytesIO(content)
+            buffer.name = name
+            # Тип и роли столбцов определяются по заголовку до полного чтения,
+            # и из файла загружаются только столбцы, нужные обработчику этого типа
+            schema = processor.detect_file_schema(buffer)
+            file_type = schema['type']
+            kept_rows = None
+            try:
+                if file_type == 'keyword_frequency' or file_type in DEDUP_FILE_TYPES:
+                    chunks = self._cancellable(job, processor.iter_dataframe_chunks(
+                        buffer, usecols=processor.select_columns(schema), separator=schema['separator']
+                    ))
+
+                if file_type == 'keyword_frequency':
+                    df = processor.process_keyword_frequency_file(
+                        chunks, columns=schema['columns'], aggregator=keyword_aggregator, name=name
+                    )
+                    rows = keyword_aggregator.file_stats(name)['rows']
+                elif file_type in DEDUP_FILE_TYPES:
+                    deduplicator = deduplicators.setdefault(file_type, OverlapDeduplicator())
+                    # Одинаковые имена различаются номером: иначе файлы считались бы блоками одного
+                    dedup_name = name if name not in deduplicator.file_names() else f"{name} ({i + 1})"
+                    parts = list(processor.deduplicate_chunks(chunks, deduplicator, file_type, dedup_name))
+                    kept = [part for part in parts if len(part)] or parts[:1]
+                    df = pd.concat(kept) if kept else pd.DataFrame(
+                        columns=processor.select_columns(schema) or schema['header']
+                    )
+                    del parts, kept
+                    file_stats = deduplicator.file_stats(dedup_name)
+                    rows, kept_rows = file_stats['rows'], file_stats['kept_rows']
+                else:
+                    df = processor.load_dataframe(
+                        buffer, usecols=processor.select_columns(schema), separator=schema['separator']
+                    )
+                    rows = len(df)
+                frames.append((name, len(content), schema, df, rows, kept_rows, None))
+            except JobCancelledError:
+                raise
+            except Exception as e:
+                frames.append((name, len(content), schema, None, 0, None, str(e)))
+
+        # 2. Определение типов файлов и колонок
+        files_info = []
+        file_data_list = []
+        for i, (name, size, schema, df, rows, kept_rows, error) in enumerate(frames):
+            job.check_cancelled()
+            job.set_stage('resolve_columns', i / max(total_files, 1), f"Определение типа файла {name}")
+
+            file_type = schema['type']
+            aggregated = file_type == 'keyword_frequency'
+            if aggregated:
+                # df - свернутая таблица по предметам: столбцы берутся из исходного файла
+                columns = len(schema['header'])
+            else:
+                columns = len(df.columns) if df is not None else 0
+            files_info.append({
+                'name': name,
+                'size': size,
+                'type': file_type,
+                'column_roles': schema['columns'],
+                'rows': rows,
+                'kept_rows': kept_rows,
+                'columns': columns,
+                'total_columns': len(schema['header']) or columns,
+                'preview': df.head(5) if df is not None else None,
+                'error': error
+            })
+            if df is not None:
+                file_data_list.append({'type': file_type, 'dataframe': df, 'name': name, 'aggregated': aggregated})
+                if self.memory_manager is not None:
+                    self.memory_manager.put(job.owner, self._frame_key(job, i), df)
+
+        # 3. Агрегация метрик
+        job.check_cancelled()
+        job.set_stage('aggregate', 0.0, 'Извлечение метрик из файлов')
+        # Файлы уже склеены при чтении
+        metrics = processor.extract_metrics_from_files(file_data_list, deduplicate=False)
+        is_valid, validation_errors = processor.validate_metrics(metrics)
+        deduplication = {
+            file_type: deduplicator.stats() for file_type, deduplicator in deduplicators.items()
+            if len(deduplicator.file_names()) > 1
+        }
+        del frames, file_data_list
+
+        # 4. Расчет рейтинга
+        job.check_cancelled()
+        job.set_stage('score', 0.0, 'Расчет рейтинга')
+        calculator = ProductRatingCalculator()
+        calculator.update_weights(job.weights)
+        calculator.update_thresholds(job.thresholds)
+        rating = calculator.calculate_rating(metrics)
+        job.set_stage('score', 1.0)
+
+        return {
+            'files': files_info,
+            'metrics': metrics,
+            'is_valid': is_valid,
+            'validation_errors': validation_errors,
+            'deduplication': deduplication,
+            'rating': rating
+        }
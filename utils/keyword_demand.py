@@ -0,0 +1,185 @@
+"""
+Реальное соотношение спроса к предложению по частотности поисковых запросов
+"""
+
+import numpy as np
+import pandas as pd
+
+from .deduplication import contains_sorted, merge_unique, unique_sorted
+
+# Столбцы таблицы спроса по предметам (результат KeywordDemandAggregator.table)
+DEMAND_COLUMNS = ['subject', 'frequency', 'queries', 'max_products']
+
+# Предмет для выгрузок без столбца предмета: весь файл - одна ниша
+ALL_SUBJECTS = ''
+
+# Период месячной частоты в выгрузке (дней). Соотношение считается в запросах в сутки
+# на товар - в той же шкале, что и оценка спроса калькулятора (порог 1, бонус выше 10)
+FREQUENCY_PERIOD_DAYS = 30
+
+# Множитель смешивания хешей предмета и запроса (дробная часть золотого сечения * 2^64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def normalize_subject(values):
+    """Приведение названий предметов к ключу сопоставления между выгрузками"""
+    return pd.Series(values).astype(str).str.strip().str.lower()
+
+
+class KeywordDemandAggregator:
+    """
+    Потоковая агрегация выгрузки частотности запросов по предметам
+
+    Блоки строк (запрос, частота, количество товаров, предмет) сворачиваются
+    в суммы по кодам предметов (bincount), после чего отбрасываются: в памяти
+    остаются только таблицы по предметам и отсортированный массив uint64
+    хешей уже учтенных пар (предмет, запрос). Повтор запроса - в том же или
+    в другом файле - не увеличивает частоту.
+    """
+
+    def __init__(self):
+        self._seen = np.zeros(0, dtype=np.uint64)
+        self._files = {}
+
+    def add(self, name, chunk, columns):
+        """
+        Добавить блок строк файла
+
+        Args:
+            name (str): Имя файла
+            chunk (pandas.DataFrame): Строки выгрузки
+            columns (dict): Роль -> столбец: query и frequency обязательны,
+                products и subject - по наличию
+
+        Returns:
+            int: Количество новых (ранее не встречавшихся) запросов в блоке
+        """
+        for role in ('query', 'frequency'):
+            if columns.get(role) not in chunk.columns:
+                raise ValueError(f"В выгрузке запросов нет столбца роли {role}")
+
+        state = self._files.setdefault(name, {'rows': 0, 'duplicates': 0, 'table': None})
+        state['rows'] += len(chunk)
+        if len(chunk) == 0:
+            return 0
+
+        queries = chunk[columns['query']].astype(str).str.strip().str.lower()
+        subject_column = columns.get('subject')
+        if subject_column in chunk.columns:
+            codes, subjects = pd.factorize(normalize_subject(chunk[subject_column].to_numpy()))
+        else:
+            codes, subjects = np.zeros(len(chunk), dtype=np.intp), pd.Index([ALL_SUBJECTS])
+
+        # Ключ пары (предмет, запрос): хеш запроса, смешанный с хешем предмета
+        # (предметов немного, поэтому хешируются только их уникальные названия)
+        subject_hashes = pd.util.hash_pandas_object(pd.Series(subjects), index=False).to_numpy(dtype=np.uint64)
+        keys = pd.util.hash_pandas_object(queries, index=False).to_numpy(dtype=np.uint64)
+        keys = keys ^ (subject_hashes[codes] * _MIX)
+
+        # В блоке остается первое вхождение нового ключа
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        new = first & ~contains_sorted(self._seen, sorted_keys)
+        rows = order[new]
+        self._seen = merge_unique(self._seen, unique_sorted(sorted_keys[new]))
+        state['duplicates'] += len(chunk) - len(rows)
+
+        frequency = pd.to_numeric(chunk[columns['frequency']], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        products_column = columns.get('products')
+        products = (pd.to_numeric(chunk[products_column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+                    if products_column in chunk.columns else np.full(len(chunk), np.nan))
+
+        # Суммы по кодам предметов без groupby по строкам
+        row_codes = codes[rows]
+        max_products = np.full(len(subjects), -np.inf)
+        np.fmax.at(max_products, row_codes, np.nan_to_num(products[rows], nan=-np.inf))
+        partial = pd.DataFrame({
+            'frequency': np.bincount(row_codes, np.clip(np.nan_to_num(frequency[rows]), 0, None), len(subjects)),
+            'queries': np.bincount(row_codes, minlength=len(subjects)),
+            'max_products': np.where(np.isfinite(max_products), max_products, np.nan)
+        }, index=pd.Index(np.asarray(subjects, dtype=object), name='subject'))
+        partial = partial[partial['queries'] > 0]
+        state['table'] = partial if state['table'] is None else _combine([state['table'], partial])
+        return len(rows)
+
+    def table(self, name=None):
+        """
+        Спрос по предметам
+
+        Args:
+            name (str): Имя файла (только запросы, впервые встретившиеся в нем);
+                None - по всем файлам
+
+        Returns:
+            pandas.DataFrame: subject (нормализованное название), frequency - сумма
+                частот, queries - количество запросов, max_products - наибольшее
+                количество товаров по запросу предмета
+        """
+        names = [name] if name is not None else list(self._files)
+        tables = [self._files[key]['table'] for key in names
+                  if key in self._files and self._files[key]['table'] is not None]
+        if not tables:
+            return pd.DataFrame(columns=DEMAND_COLUMNS)
+        return _combine(tables).reset_index()[DEMAND_COLUMNS]
+
+    def file_stats(self, name):
+        """Строки и повторы запросов файла"""
+        state = self._files.get(name, {'rows': 0, 'duplicates': 0})
+        return {'rows': state['rows'], 'duplicate_queries': state['duplicates']}
+
+
+def _combine(tables):
+    """Сложение таблиц по предметам (частоты и запросы суммируются, товары - максимум)"""
+    return pd.concat(tables).groupby(level=0, sort=False).agg(
+        {'frequency': 'sum', 'queries': 'sum', 'max_products': 'max'}
+    )
+
+
+def combine_tables(tables):
+    """Сложение нескольких таблиц спроса (по разным файлам) в одну"""
+    tables = [table.set_index('subject') for table in tables if len(table)]
+    if not tables:
+        return pd.DataFrame(columns=DEMAND_COLUMNS)
+    return _combine(tables).reset_index()[DEMAND_COLUMNS]
+
+
+def demand_by_subject(table, products=None):
+    """
+    Соотношение запросов к товарам по предметам (запросов в сутки на товар)
+
+    Args:
+        table (pandas.DataFrame): Таблица спроса (KeywordDemandAggregator.table)
+        products (pandas.Series): Количество товаров ниши по нормализованному
+            предмету (из выгрузки ниш или отчета по товарам). Для предметов без
+            данных используется наибольшее количество товаров по запросу предмета
+
+    Returns:
+        pandas.DataFrame: Таблица спроса со столбцами products, products_source
+            ('niche' или 'queries') и demand_ratio
+    """
+    result = table.copy()
+    known = (result['subject'].map(products) if products is not None and len(products)
+             else pd.Series(np.nan, index=result.index))
+    known = pd.to_numeric(known, errors='coerce')
+
+    if len(result) == 1 and result['subject'].iloc[0] == ALL_SUBJECTS and products is not None and len(products):
+        # Выгрузка без предмета относится к нише целиком
+        known = pd.Series([float(products.sum())], index=result.index)
+
+    result['products'] = known.where(known > 0, result['max_products'])
+    result['products_source'] = np.where(known > 0, 'niche', 'queries')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['demand_ratio'] = np.where(
+            result['products'] > 0, result['frequency'] / FREQUENCY_PERIOD_DAYS / result['products'], np.nan
+        )
+    return result
+
+
+def total_demand_ratio(demand):
+    """Соотношение запросов в сутки к товарам по всем предметам с известным количеством товаров"""
+    usable = demand[demand['products'] > 0]
+    if len(usable) == 0:
+        return None
+    return float(usable['frequency'].sum() / FREQUENCY_PERIOD_DAYS / usable['products'].sum())
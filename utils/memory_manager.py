@@ -0,0 +1,169 @@
+"""
+Учет памяти DataFrame по сессиям и вытеснение на диск
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class _FrameEntry:
+    """Запись о сохраненном DataFrame"""
+
+    __slots__ = ('frame', 'nbytes', 'spill_path')
+
+    def __init__(self, frame, nbytes):
+        self.frame = frame
+        self.nbytes = nbytes
+        self.spill_path = None
+
+    @property
+    def in_memory(self):
+        return self.frame is not None
+
+
+class DataFrameMemoryManager:
+    """
+    Хранилище DataFrame с учетом памяти по сессиям и глобально
+
+    Когда объем в памяти превышает лимит сессии или общий лимит, наименее
+    давно использованные таблицы выгружаются в каталог на диске и
+    прозрачно загружаются обратно при следующем обращении.
+    """
+
+    def __init__(self, session_limit_bytes=512 * 1024 ** 2, global_limit_bytes=2 * 1024 ** 3, spill_dir=None):
+        """
+        Args:
+            session_limit_bytes (int): Лимит памяти на одну сессию
+            global_limit_bytes (int): Общий лимит памяти для всех сессий
+            spill_dir (str): Каталог для выгрузки (по умолчанию - временный)
+        """
+        self.session_limit_bytes = session_limit_bytes
+        self.global_limit_bytes = global_limit_bytes
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix='mpstats-spill-')
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        # Порядок записей - от давно использованных к недавним (LRU)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def put(self, session_id, key, df):
+        """
+        Сохранить DataFrame под ключом сессии
+
+        Args:
+            session_id (str): Идентификатор сессии
+            key (str): Ключ таблицы внутри сессии
+            df (pandas.DataFrame): Данные
+        """
+        nbytes = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self._drop((session_id, key))
+            self._entries[(session_id, key)] = _FrameEntry(df, nbytes)
+            self._enforce_limits(session_id, keep=(session_id, key))
+
+    def get(self, session_id, key):
+        """
+        Получить DataFrame (при необходимости загрузив его с диска)
+
+        Returns:
+            pandas.DataFrame: Данные или None, если ключ не найден
+        """
+        with self._lock:
+            entry = self._entries.get((session_id, key))
+            if entry is None:
+                return None
+
+            self._entries.move_to_end((session_id, key))
+            if not entry.in_memory:
+                entry.frame = pd.read_pickle(entry.spill_path)
+                os.remove(entry.spill_path)
+                entry.spill_path = None
+                self._enforce_limits(session_id, keep=(session_id, key))
+
+            return entry.frame
+
+    def remove(self, session_id, key):
+        """Удалить DataFrame из памяти и с диска"""
+        with self._lock:
+            return self._drop((session_id, key))
+
+    def clear_session(self, session_id):
+        """Удалить все таблицы сессии"""
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == session_id]:
+                self._drop(entry_key)
+
+    def __contains__(self, item):
+        return item in self._entries
+
+    def usage(self, session_id=None):
+        """
+        Текущий объем данных
+
+        Args:
+            session_id (str): Сессия (None - по всем сессиям)
+
+        Returns:
+            dict: Байты в памяти и на диске, количество таблиц и лимит
+        """
+        with self._lock:
+            entries = [entry for (sid, _), entry in self._entries.items()
+                       if session_id is None or sid == session_id]
+
+            return {
+                'memory_bytes': sum(e.nbytes for e in entries if e.in_memory),
+                'spilled_bytes': sum(e.nbytes for e in entries if not e.in_memory),
+                'frames': len(entries),
+                'spilled_frames': sum(1 for e in entries if not e.in_memory),
+                'limit_bytes': self.global_limit_bytes if session_id is None else self.session_limit_bytes
+            }
+
+    def close(self):
+        """Удалить все данные и каталог выгрузки"""
+        with self._lock:
+            self._entries.clear()
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def _drop(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return False
+        if entry.spill_path and os.path.exists(entry.spill_path):
+            os.remove(entry.spill_path)
+        return True
+
+    def _memory_bytes(self, session_id=None):
+        return sum(entry.nbytes for (sid, _), entry in self._entries.items()
+                   if entry.in_memory and (session_id is None or sid == session_id))
+
+    def _enforce_limits(self, session_id, keep):
+        """Выгрузка LRU-таблиц сессии, затем глобально, пока лимиты превышены"""
+        for scope, limit in ((session_id, self.session_limit_bytes), (None, self.global_limit_bytes)):
+            excess = self._memory_bytes(scope) - limit
+            if excess <= 0:
+                continue
+
+            for entry_key, entry in list(self._entries.items()):
+                if excess <= 0:
+                    break
+                if entry_key == keep or not entry.in_memory:
+                    continue
+                if scope is not None and entry_key[0] != scope:
+                    continue
+
+                self._spill(entry)
+                excess -= entry.nbytes
+
+    def _spill(self, entry):
+        """Выгрузка таблицы на диск"""
+        path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.pkl")
+        entry.frame.to_pickle(path)
+        entry.spill_path = path
+        entry.frame = None
@@ -0,0 +1,216 @@
+"""
+Процентили ниш относительно распределения метрик в их категории
+"""
+
+import numpy as np
+
+from .calculator import ProductRatingCalculator
+
+METRIC_COLUMNS = ['demand_ratio', 'revenue', 'price_ad_ratio', 'organic_percent']
+SCORE_COLUMNS = ['demand', 'revenue', 'ad_efficiency', 'organic']
+
+
+class _SortedColumn:
+    """Отсортированные значения столбца, сгруппированные по категориям"""
+
+    __slots__ = ('values', 'offsets')
+
+    def __init__(self, grouped_values, group_offsets):
+        """
+        Args:
+            grouped_values (numpy.ndarray): Значения, упорядоченные по категориям
+            group_offsets (numpy.ndarray): Границы категорий в grouped_values
+        """
+        # Сортировка внутри каждой категории отдельно дешевле общей сортировки по двум ключам
+        segments = []
+        for start, stop in zip(group_offsets[:-1], group_offsets[1:]):
+            segment = np.sort(grouped_values[start:stop])
+            segments.append(segment[:len(segment) - np.count_nonzero(np.isnan(segment))])
+
+        self.values = np.concatenate(segments) if segments else np.zeros(0)
+        self.offsets = np.concatenate([[0], np.cumsum([len(segment) for segment in segments])]).astype(np.int64)
+
+    def segment(self, code):
+        return self.values[self.offsets[code]:self.offsets[code + 1]]
+
+
+class CategoryPercentileIndex:
+    """
+    Процентильный рейтинг ниши внутри категории
+
+    При построении для каждой категории один раз сортируются значения
+    исходных метрик, оценок breakdown и итогового рейтинга. Запрос - бинарный
+    поиск (searchsorted) в отсортированном массиве категории. Процентиль -
+    доля ниш категории со значением ниже, плюс половина равных (0-100);
+    для всех метрик большее значение лучше.
+    """
+
+    def __init__(self, calculator=None):
+        """
+        Args:
+            calculator (ProductRatingCalculator): Калькулятор для расчета оценок
+        """
+        self.calculator = calculator or ProductRatingCalculator()
+        self.categories = []
+        self._codes = {}
+        self._metrics = {}
+        self._scores = {}
+        self._rating = None
+
+    def build(self, categories, metrics, scores=None):
+        """
+        Построить индекс по каталогу ниш
+
+        Args:
+            categories (array-like): Категория каждой ниши
+            metrics (dict): Массивы исходных метрик (demand_ratio, revenue, price_ad_ratio, organic_percent)
+            scores (dict): Результат calculate_ratings_batch (по умолчанию рассчитывается)
+
+        Returns:
+            CategoryPercentileIndex: self
+        """
+        labels, codes = np.unique(np.asarray(categories), return_inverse=True)
+        if scores is None:
+            scores = self.calculator.calculate_ratings_batch(
+                *(metrics[column] for column in METRIC_COLUMNS), decimals=None
+            )
+
+        self.categories = list(labels)
+        self._codes = {label: code for code, label in enumerate(self.categories)}
+
+        # Порядок строк по категориям и границы категорий - общие для всех столбцов
+        order = np.argsort(codes, kind='stable')
+        offsets = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+
+        def sorted_column(values):
+            return _SortedColumn(np.asarray(values, dtype=float)[order], offsets)
+
+        self._metrics = {column: sorted_column(metrics[column]) for column in METRIC_COLUMNS}
+        self._scores = {column: sorted_column(scores[column]) for column in SCORE_COLUMNS}
+        self._rating = sorted_column(scores['final_rating'])
+        return self
+
+    def category_size(self, category):
+        """Количество ниш категории (по итоговому рейтингу)"""
+        code = self._codes.get(category)
+        return 0 if code is None else len(self._rating.segment(code))
+
+    def percentile(self, category, metrics):
+        """
+        Процентили одной ниши в ее категории
+
+        Рейтинг ниши считается без округления, как и значения индекса:
+        округленный final_rating из calculate_rating у границы равных значений
+        дал бы сдвиг на одну позицию.
+
+        Args:
+            category: Категория ниши
+            metrics (dict): Исходные метрики ниши
+
+        Returns:
+            dict: metrics и breakdown - процентили по метрикам, final_rating - процентиль
+                рейтинга, category_size - размер категории; None, если категория неизвестна
+        """
+        code = self._codes.get(category)
+        if code is None:
+            return None
+
+        scores = self.calculator.calculate_component_scores(metrics)
+        final_rating = self.calculator.weighted_rating(scores)
+
+        return {
+            'metrics': {
+                column: float(_percentile(self._metrics[column].segment(code), metrics[column]))
+                for column in METRIC_COLUMNS
+            },
+            'breakdown': {
+                column: float(_percentile(self._scores[column].segment(code), scores[column]))
+                for column in SCORE_COLUMNS
+            },
+            'final_rating': float(_percentile(self._rating.segment(code), final_rating)),
+            'category_size': self.category_size(category)
+        }
+
+    def percentiles_batch(self, categories, metrics, scores=None):
+        """
+        Процентили множества ниш
+
+        Запросы группируются по категориям одной сортировкой кодов категорий:
+        строки категории берутся срезом, а внутри категории - один вызов
+        searchsorted на столбец.
+
+        Args:
+            categories (array-like): Категория каждой ниши
+            metrics (dict): Массивы исходных метрик
+            scores (dict): Результат calculate_ratings_batch (по умолчанию рассчитывается)
+
+        Returns:
+            dict: metrics и breakdown - массивы процентилей по столбцам, final_rating -
+                массив процентилей рейтинга; NaN для неизвестных категорий
+        """
+        categories = np.asarray(categories)
+        if scores is None:
+            scores = self.calculator.calculate_ratings_batch(
+                *(metrics[column] for column in METRIC_COLUMNS), decimals=None
+            )
+
+        n = len(categories)
+        columns = (
+            [('metrics', column, self._metrics[column], metrics[column]) for column in METRIC_COLUMNS] +
+            [('breakdown', column, self._scores[column], scores[column]) for column in SCORE_COLUMNS] +
+            [(None, 'final_rating', self._rating, scores['final_rating'])]
+        )
+        result = {'metrics': {}, 'breakdown': {}}
+        outputs = []
+        for group, column, _, _ in columns:
+            output = np.full(n, np.nan)
+            (result[group] if group else result)[column] = output
+            outputs.append(output)
+
+        values = [np.asarray(column_values, dtype=float) for _, _, _, column_values in columns]
+
+        # Одна сортировка по коду категории: строки каждой категории - непрерывный срез order
+        labels, inverse = np.unique(categories, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(labels) + 1))
+        for label_code, label in enumerate(labels):
+            code = self._codes.get(label)
+            if code is None:
+                continue
+            rows = order[bounds[label_code]:bounds[label_code + 1]]
+            for (_, _, sorted_column, _), column_values, output in zip(columns, values, outputs):
+                output[rows] = _percentile(sorted_column.segment(code), column_values[rows])
+
+        return result
+
+    def annotate(self, category, metrics, result=None):
+        """
+        Результат calculate_rating с процентилями в категории
+
+        Returns:
+            dict: Результат расчета с дополнительным ключом percentiles
+        """
+        result = result or self.calculator.calculate_rating(metrics)
+        return dict(result, percentiles=self.percentile(category, metrics))
+
+
+def _percentile(sorted_values, values):
+    """Процентиль значений в отсортированном массиве (равные значения учитываются наполовину)"""
+    if len(sorted_values) == 0:
+        return np.full(np.shape(values), np.nan) if np.ndim(values) else np.nan
+    if np.ndim(values) and len(values) > 1:
+        # Отсортированные запросы ищутся быстрее: соседние поиски идут по одним и тем же строкам кэша
+        order = np.argsort(values, kind='stable')
+        ranks = np.empty(len(values))
+        ranks[order] = _ranks(sorted_values, values[order])
+    else:
+        ranks = _ranks(sorted_values, values)
+
+    percentile = ranks * 50.0 / len(sorted_values)
+    return np.where(np.isnan(values), np.nan, percentile)
+
+
+def _ranks(sorted_values, values):
+    """Сумма количества значений меньше и не больше запроса"""
+    return (np.searchsorted(sorted_values, values, side='left') +
+            np.searchsorted(sorted_values, values, side='right'))
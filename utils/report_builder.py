@@ -0,0 +1,218 @@
+"""
+Пакетная генерация HTML-отчетов по нишам с общим бандлом plotly.js
+"""
+
+import html
+import itertools
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+from plotly.utils import PlotlyJSONEncoder
+
+from .calculator import ProductRatingCalculator
+from .visualizations import create_metrics_bar_chart, create_radar_chart, create_rating_gauge
+
+PLOTLY_JS_FILENAME = 'plotly.min.js'
+
+_PAGE_HEAD = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{plotly_js}
+<script type="text/javascript">window.MPSTATS_TEMPLATE = {template};</script>
+<style>
+body {{ font-family: sans-serif; margin: 24px; color: #262730; }}
+.niche {{ border-bottom: 1px solid #e0e0e0; padding: 16px 0; }}
+.charts {{ display: flex; flex-wrap: wrap; gap: 8px; }}
+.charts > div {{ flex: 1 1 420px; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+"""
+
+_PAGE_TAIL = """</body>
+</html>
+"""
+
+_EMPTY_REPORT = '<p>Нет ниш для отчета.</p>\n'
+
+
+def _figure_div(fig):
+    """
+    HTML-блок диаграммы без plotly.js и без шаблона оформления
+
+    Шаблон одинаков для всех диаграмм, поэтому он выносится в заголовок
+    документа и подставляется при отрисовке.
+    """
+    fig_dict = fig.to_plotly_json()
+    layout = dict(fig_dict['layout'])
+    layout.pop('template', None)
+
+    div_id = uuid.uuid4().hex
+    height = layout.get('height', 450)
+    return (
+        f'<div id="{div_id}" style="height:{height}px;"></div>'
+        '<script type="text/javascript">'
+        f'Plotly.newPlot("{div_id}", {_to_json(fig_dict["data"])}, '
+        f'Object.assign({_to_json(layout)}, {{template: window.MPSTATS_TEMPLATE}}), '
+        '{"responsive": true});'
+        '</script>'
+    )
+
+
+def _to_json(obj):
+    return json.dumps(obj, cls=PlotlyJSONEncoder, ensure_ascii=False)
+
+
+def _default_template_json():
+    return _to_json(pio.templates[pio.templates.default].to_plotly_json())
+
+
+def render_niche_section(niche, weights=None, thresholds=None):
+    """
+    Рендер раздела отчета для одной ниши (без plotly.js)
+
+    Функция верхнего уровня, чтобы ее можно было выполнять в пуле процессов.
+
+    Args:
+        niche (dict): Данные ниши: name и metrics (как для compare_niches)
+        weights (dict): Веса метрик
+        thresholds (dict): Пороговые значения
+
+    Returns:
+        str: HTML-фрагмент раздела
+    """
+    calculator = ProductRatingCalculator()
+    calculator.update_weights(weights or {})
+    calculator.update_thresholds(thresholds or {})
+
+    result = calculator.calculate_rating(niche['metrics'])
+    status, description = calculator.interpret_rating(result['final_rating'])
+
+    charts = [
+        create_rating_gauge(result['final_rating']),
+        create_radar_chart(result['breakdown']),
+        create_metrics_bar_chart(result)
+    ]
+    charts_html = ''.join(f"<div>{_figure_div(fig)}</div>" for fig in charts)
+
+    recommendations = ''.join(
+        f"<li>{html.escape(rec['text'])} {html.escape(rec['action'])}</li>"
+        for rec in calculator.get_recommendations(result)
+    )
+
+    return (
+        '<section class="niche">'
+        f"<h2>{html.escape(niche.get('name', 'Неизвестная ниша'))}</h2>"
+        f"<p><b>Рейтинг: {result['final_rating']}/100</b> — {html.escape(status)}: {html.escape(description)}</p>"
+        f'<div class="charts">{charts_html}</div>'
+        f"<ul>{recommendations}</ul>"
+        '</section>\n'
+    )
+
+
+def _render_batch(batch, weights, thresholds):
+    return [render_niche_section(niche, weights, thresholds) for niche in batch]
+
+
+def _open_page(files, output_path, shard_size, title, plotly_js_tag, template_json):
+    """Открытие очередного файла отчета с заголовком документа (путь добавляется в files)"""
+    path = (os.path.join(output_path, f"report_{len(files) + 1:04d}.html")
+            if shard_size else output_path)
+    out = open(path, 'w', encoding='utf-8')
+    out.write(_PAGE_HEAD.format(
+        title=html.escape(title),
+        plotly_js=plotly_js_tag,
+        template=template_json
+    ))
+    files.append(path)
+    return out
+
+
+def build_niche_report(niches, output_path, shard_size=None, max_workers=None, executor='process',
+                       weights=None, thresholds=None, title='Отчет по нишам MPStats', batch_size=16):
+    """
+    Генерация HTML-отчета по множеству ниш
+
+    Диаграммы строятся в пуле воркеров и дописываются в файл по мере готовности
+    (в исходном порядке ниш). plotly.js подключается один раз: встраивается в
+    единый документ или, при разбиении на части, сохраняется рядом отдельным
+    файлом, на который ссылаются все части. Для пустого списка ниш создается
+    один документ с пояснением.
+
+    Args:
+        niches (iterable): Данные ниш: словари с name и metrics
+        output_path (str): Путь к HTML-файлу или, при shard_size, к каталогу
+        shard_size (int): Количество ниш в одном файле (None - один файл)
+        max_workers (int): Количество воркеров (по умолчанию - по числу CPU)
+        executor (str): 'process' или 'thread'
+        weights (dict): Веса метрик
+        thresholds (dict): Пороговые значения
+        title (str): Заголовок отчета
+        batch_size (int): Количество ниш в одной задаче воркера
+
+    Returns:
+        dict: Список созданных файлов, количество ниш и время генерации
+    """
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"Неизвестный тип пула: {executor}")
+
+    start = time.perf_counter()
+    pool_cls = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    niches = iter(niches)
+
+    if shard_size:
+        os.makedirs(output_path, exist_ok=True)
+        with open(os.path.join(output_path, PLOTLY_JS_FILENAME), 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        plotly_js_tag = f'<script src="{PLOTLY_JS_FILENAME}"></script>'
+    else:
+        plotly_js_tag = f'<script type="text/javascript">{get_plotlyjs()}</script>'
+
+    template_json = _default_template_json()
+    files = []
+    total = 0
+    out = None
+
+    try:
+        with pool_cls(max_workers=max_workers) as pool:
+            window = (max_workers or os.cpu_count() or 1) * 2
+            while True:
+                # Ограниченное окно задач: в памяти не больше window пакетов
+                batches = [batch for batch in (list(itertools.islice(niches, batch_size)) for _ in range(window)) if batch]
+                if not batches:
+                    break
+
+                futures = [pool.submit(_render_batch, batch, weights, thresholds) for batch in batches]
+                for future in futures:
+                    for section in future.result():
+                        if out is None or (shard_size and total % shard_size == 0):
+                            if out is not None:
+                                out.write(_PAGE_TAIL)
+                                out.close()
+                            out = _open_page(files, output_path, shard_size, title, plotly_js_tag, template_json)
+
+                        out.write(section)
+                        total += 1
+
+        # Пустой список ниш - все равно создается корректный документ с пояснением
+        if out is None:
+            out = _open_page(files, output_path, shard_size, title, plotly_js_tag, template_json)
+            out.write(_EMPTY_REPORT)
+    finally:
+        if out is not None:
+            out.write(_PAGE_TAIL)
+            out.close()
+
+    return {
+        'files': files,
+        'niches': total,
+        'seconds': time.perf_counter() - start
+    }
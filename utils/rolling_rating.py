@@ -0,0 +1,208 @@
+"""
+Скользящий рейтинг ниш за последние периоды с инкрементальным обновлением
+"""
+
+import threading
+
+from .calculator import ProductRatingCalculator
+
+DEFAULT_WINDOWS = (3, 6, 12)
+
+SCORE_KEYS = ('demand', 'revenue', 'ad_efficiency', 'organic')
+
+# Через сколько обновлений суммы окна пересчитываются заново,
+# чтобы ошибка округления не накапливалась
+RESYNC_EVERY = 1000
+
+
+class _NicheState:
+    """Кольцевой буфер последних периодов ниши и суммы оценок по окнам"""
+
+    __slots__ = ('periods', 'metrics', 'scores', 'head', 'count', 'sums', 'updates')
+
+    def __init__(self, capacity, windows):
+        self.periods = [None] * capacity
+        self.metrics = [None] * capacity
+        self.scores = [None] * capacity
+        self.head = 0   # Позиция следующей записи
+        self.count = 0  # Количество периодов в буфере (не больше capacity)
+        self.sums = {window: [0.0] * len(SCORE_KEYS) for window in windows}
+        self.updates = 0
+
+    def position(self, age):
+        """Позиция периода с возрастом age (0 - последний)"""
+        return (self.head - 1 - age) % len(self.scores)
+
+
+class RollingRatingAggregator:
+    """
+    Скользящие рейтинги ниш по окнам последних периодов (по умолчанию 3, 6 и 12)
+
+    Для каждой ниши хранится кольцевой буфер длиной в наибольшее окно и
+    суммы неокругленных оценок метрик по каждому окну. Новый период
+    добавляется за O(1) на окно: оценка входит в сумму, а вышедшая за
+    пределы окна - вычитается. Повторное обновление того же периода
+    (например, ежедневное уточнение текущего месяца) заменяет его оценки.
+
+    Рейтинг окна - взвешенная сумма средних оценок с текущими весами
+    калькулятора, поэтому совпадает с полным пересчетом по истории.
+    """
+
+    def __init__(self, calculator=None, windows=DEFAULT_WINDOWS):
+        """
+        Args:
+            calculator (ProductRatingCalculator): Калькулятор с весами и порогами
+            windows (tuple): Размеры окон в периодах
+        """
+        windows = tuple(sorted(set(int(window) for window in windows)))
+        if not windows or windows[0] < 1:
+            raise ValueError("Размеры окон должны быть положительными")
+
+        self.calculator = calculator or ProductRatingCalculator()
+        self.windows = windows
+        self.capacity = windows[-1]
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, niche, metrics, period=None):
+        """
+        Добавить метрики ниши за период
+
+        Args:
+            niche (str): Название ниши
+            metrics (dict): Метрики (как для calculate_rating)
+            period: Метка периода (дата, номер месяца). Совпадение с последним
+                периодом ниши заменяет его данные; None - всегда новый период
+        """
+        scores = self._scores(metrics)
+
+        with self._lock:
+            state = self._states.get(niche)
+            if state is None:
+                state = self._states[niche] = _NicheState(self.capacity, self.windows)
+
+            if period is not None and state.count and state.periods[state.position(0)] == period:
+                # Замена последнего периода: он входит во все окна
+                pos = state.position(0)
+                old = state.scores[pos]
+                for sums in state.sums.values():
+                    for i, score in enumerate(scores):
+                        sums[i] += score - old[i]
+            else:
+                for window, sums in state.sums.items():
+                    # Период, выходящий за пределы окна после добавления
+                    if state.count >= window:
+                        expired = state.scores[state.position(window - 1)]
+                        for i, score in enumerate(scores):
+                            sums[i] += score - expired[i]
+                    else:
+                        for i, score in enumerate(scores):
+                            sums[i] += score
+                pos = state.head
+                state.head = (state.head + 1) % self.capacity
+                state.count = min(state.count + 1, self.capacity)
+
+            state.periods[pos] = period
+            state.metrics[pos] = dict(metrics)
+            state.scores[pos] = scores
+
+            state.updates += 1
+            if state.updates % RESYNC_EVERY == 0:
+                self._resync_sums(state)
+
+    def get_rating(self, niche, window, decimals=1):
+        """
+        Скользящий рейтинг ниши за окно
+
+        Args:
+            niche (str): Название ниши
+            window (int): Размер окна (одно из windows)
+            decimals (int): Точность округления (как в calculate_rating); None - без округления
+
+        Returns:
+            dict: final_rating и breakdown (как в calculate_rating), periods - число
+                периодов в окне, complete - заполнено ли окно; None, если данных нет
+        """
+        if window not in self.windows:
+            raise ValueError(f"Окно {window} не отслеживается: доступны {', '.join(map(str, self.windows))}")
+
+        with self._lock:
+            state = self._states.get(niche)
+            if state is None or not state.count:
+                return None
+            periods = min(state.count, window)
+            means = {key: total / periods for key, total in zip(SCORE_KEYS, state.sums[window])}
+
+        return {
+            'final_rating': _round(self.calculator.weighted_rating(means), decimals),
+            'breakdown': {key: _round(score, decimals) for key, score in means.items()},
+            'window': window,
+            'periods': periods,
+            'complete': periods == window
+        }
+
+    def get_ratings(self, niche):
+        """Скользящие рейтинги ниши по всем окнам: окно -> результат get_rating"""
+        return {window: self.get_rating(niche, window) for window in self.windows}
+
+    def niches(self):
+        with self._lock:
+            return list(self._states)
+
+    def remove(self, niche):
+        """Удалить состояние ниши"""
+        with self._lock:
+            return self._states.pop(niche, None) is not None
+
+    def resync(self):
+        """
+        Пересчитать оценки всех сохраненных периодов
+
+        Нужен после изменения порогов калькулятора: оценки метрик зависят от
+        порогов, а веса применяются при чтении и пересчета не требуют.
+        """
+        with self._lock:
+            for state in self._states.values():
+                for age in range(state.count):
+                    pos = state.position(age)
+                    state.scores[pos] = self._scores(state.metrics[pos])
+                self._resync_sums(state)
+
+    def _scores(self, metrics):
+        scores = self.calculator.calculate_component_scores(metrics)
+        return tuple(float(scores[key]) for key in SCORE_KEYS)
+
+    def _resync_sums(self, state):
+        """Точный пересчет сумм окон по буферу"""
+        for window in self.windows:
+            sums = [0.0] * len(SCORE_KEYS)
+            for age in range(min(state.count, window)):
+                for i, score in enumerate(state.scores[state.position(age)]):
+                    sums[i] += score
+            state.sums[window] = sums
+
+
+def _round(value, decimals):
+    return value if decimals is None else round(value, decimals)
+
+
+def rolling_rating_full(calculator, metrics_history, window, decimals=1):
+    """
+    Полный пересчет скользящего рейтинга по истории (эталон для проверки)
+
+    Args:
+        calculator (ProductRatingCalculator): Калькулятор
+        metrics_history (list): Метрики по периодам, от старых к новым
+        window (int): Размер окна
+        decimals (int): Точность округления; None - без округления
+
+    Returns:
+        dict: final_rating и breakdown по последним window периодам
+    """
+    recent = metrics_history[-window:]
+    scores = [calculator.calculate_component_scores(metrics) for metrics in recent]
+    means = {key: sum(item[key] for item in scores) / len(scores) for key in SCORE_KEYS}
+    return {
+        'final_rating': _round(calculator.weighted_rating(means), decimals),
+        'breakdown': {key: _round(score, decimals) for key, score in means.items()}
+    }
@@ -0,0 +1,357 @@
+"""
+Предагрегированный куб метрик и рейтингов: категория → подкатегория → ниша
+"""
+
+import threading
+
+import numpy as np
+
+from .calculator import ProductRatingCalculator
+
+# Показатели куба и шкала гистограммы для квантилей: (шкала, нижняя граница, верхняя граница)
+MEASURES = {
+    'demand_ratio': ('log', 0.01, 1000.0),
+    'revenue': ('log', 1e3, 1e11),
+    'price_ad_ratio': ('log', 0.1, 1e4),
+    'organic_percent': ('linear', 0.0, 100.0),
+    'final_rating': ('linear', 0.0, 100.0),
+    'demand_score': ('linear', 0.0, 100.0),
+    'revenue_score': ('linear', 0.0, 100.0),
+    'ad_score': ('linear', 0.0, 100.0),
+    'organic_score': ('linear', 0.0, 100.0)
+}
+
+METRIC_COLUMNS = ['demand_ratio', 'revenue', 'price_ad_ratio', 'organic_percent']
+
+# Показатель куба -> ключ результата calculate_ratings_batch
+SCORE_COLUMNS = {
+    'final_rating': 'final_rating',
+    'demand_score': 'demand',
+    'revenue_score': 'revenue',
+    'ad_score': 'ad_efficiency',
+    'organic_score': 'organic'
+}
+
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+# Уровни иерархии: 0 - все ниши, 1 - категория, 2 - подкатегория
+LEVELS = ('total', 'category', 'subcategory')
+
+
+class _LevelTable:
+    """Агрегаты групп одного уровня: число ниш, количество, сумма и гистограмма по показателям"""
+
+    def __init__(self, n_measures, n_bins):
+        self.keys = []
+        self.ids = {}
+        self.niches = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros((0, n_measures), dtype=np.int64)
+        self.sums = np.zeros((0, n_measures))
+        self.hist = np.zeros((0, n_measures, n_bins), dtype=np.int32)
+
+    def group_ids(self, keys):
+        ids = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            group = self.ids.get(key)
+            if group is None:
+                group = self.ids[key] = len(self.keys)
+                self.keys.append(key)
+            ids[i] = group
+
+        if len(self.keys) > len(self.niches):
+            capacity = max(len(self.keys), 2 * len(self.niches), 16)
+            self.niches = _grow(self.niches, capacity)
+            self.counts = _grow(self.counts, capacity)
+            self.sums = _grow(self.sums, capacity)
+            self.hist = _grow(self.hist, capacity)
+        return ids
+
+    def apply(self, ids, values, bins, sign):
+        """Добавить (sign=1) или вычесть (sign=-1) вклад строк в агрегаты групп ids"""
+        valid = ~np.isnan(values)
+        rows, measures = np.nonzero(valid)
+        groups = ids[rows]
+        n_groups, n_measures, n_bins = self.hist.shape
+
+        if len(rows) * 8 < self.hist.size:
+            # Небольшой пакет: обновляются только затронутые группы
+            np.add.at(self.niches, ids, sign)
+            np.add.at(self.counts, (groups, measures), sign)
+            np.add.at(self.sums, (groups, measures), sign * values[rows, measures])
+            np.add.at(self.hist, (groups, measures, bins[rows, measures]), sign)
+            return
+
+        # Большой пакет: подсчет по всем группам сразу через bincount
+        cell = groups * n_measures + measures
+        size = n_groups * n_measures
+        self.niches += sign * np.bincount(ids, minlength=n_groups)
+        self.counts += sign * np.bincount(cell, minlength=size).reshape(n_groups, n_measures)
+        self.sums += sign * np.bincount(
+            cell, weights=values[rows, measures], minlength=size
+        ).reshape(n_groups, n_measures)
+        self.hist += sign * np.bincount(
+            cell * n_bins + bins[rows, measures], minlength=size * n_bins
+        ).reshape(self.hist.shape).astype(np.int32)
+
+
+def _grow(array, capacity):
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class RollupCube:
+    """
+    Куб агрегатов для навигации категория → подкатегория → ниша
+
+    На каждом уровне для каждой группы хранятся число ниш, количество и
+    сумма значений каждого показателя и гистограмма на фиксированной
+    сетке (эскиз для квантилей). Все агрегаты аддитивны, поэтому
+    повторный расчет ниши обновляет куб вычитанием старого вклада и
+    добавлением нового, без пересчета групп по сырым строкам.
+    """
+
+    def __init__(self, calculator=None, n_bins=128):
+        """
+        Args:
+            calculator (ProductRatingCalculator): Калькулятор для расчета рейтингов
+            n_bins (int): Количество интервалов гистограммы на показатель
+        """
+        self.calculator = calculator or ProductRatingCalculator()
+        self.measures = list(MEASURES)
+        self.n_bins = n_bins
+        self._edges = np.array([self._make_edges(*MEASURES[name]) for name in self.measures])
+        self._log = np.array([MEASURES[name][0] == 'log' for name in self.measures])
+
+        self._levels = [_LevelTable(len(self.measures), n_bins) for _ in LEVELS]
+        self._levels[0].group_ids([()])
+
+        # Листья: строка ниши, ее группы по уровням и значения показателей
+        self._slots = {}
+        self._niche_names = []
+        self._groups = np.zeros((0, len(LEVELS)), dtype=np.int64)
+        self._values = np.zeros((0, len(self.measures)))
+        self._active = np.zeros(0, dtype=bool)
+        self._members = {}
+        self._lock = threading.RLock()
+
+    def upsert(self, niches, categories, subcategories, metrics, scores=None):
+        """
+        Добавить ниши или обновить уже добавленные (после повторного расчета)
+
+        Args:
+            niches (list): Названия ниш
+            categories (list): Категория каждой ниши
+            subcategories (list): Подкатегория каждой ниши
+            metrics (dict): Массивы исходных метрик
+            scores (dict): Результат calculate_ratings_batch (по умолчанию рассчитывается)
+
+        Returns:
+            int: Количество обработанных ниш
+        """
+        niches = list(niches)
+        if scores is None:
+            scores = self.calculator.calculate_ratings_batch(
+                *(metrics[column] for column in METRIC_COLUMNS), decimals=None
+            )
+        values = np.column_stack(
+            [np.asarray(metrics[column], dtype=float) for column in METRIC_COLUMNS] +
+            [np.asarray(scores[key], dtype=float) for key in SCORE_COLUMNS.values()]
+        ) if niches else np.zeros((0, len(self.measures)))
+
+        category_keys = [(category,) for category in categories]
+        subcategory_keys = [(category, subcategory) for category, subcategory in zip(categories, subcategories)]
+        if not (len(niches) == len(category_keys) == len(subcategory_keys) == len(values)):
+            raise ValueError("Количество ниш, категорий, подкатегорий и значений не совпадает")
+
+        with self._lock:
+            slots = self._get_slots(niches)
+            if len(np.unique(slots)) != len(slots):
+                raise ValueError("Ниша встречается в пакете несколько раз")
+
+            updated = slots[self._active[slots]]
+            self._subtract(updated)
+            for slot in updated:
+                self._members[int(self._groups[slot, 2])].discard(int(slot))
+
+            groups = np.column_stack([
+                np.zeros(len(niches), dtype=np.int64),
+                self._levels[1].group_ids(category_keys),
+                self._levels[2].group_ids(subcategory_keys)
+            ])
+            self._groups[slots] = groups
+            self._values[slots] = values
+            self._active[slots] = True
+            for slot, subcategory in zip(slots, groups[:, 2]):
+                self._members.setdefault(int(subcategory), set()).add(int(slot))
+
+            self._add(slots)
+
+        return len(niches)
+
+    def remove(self, niches):
+        """Удалить ниши из куба; возвращает количество удаленных"""
+        with self._lock:
+            slots = np.array([self._slots[niche] for niche in niches if niche in self._slots], dtype=np.int64)
+            slots = slots[self._active[slots]]
+            self._subtract(slots)
+            self._active[slots] = False
+            for slot in slots:
+                self._members[int(self._groups[slot, 2])].discard(int(slot))
+            return len(slots)
+
+    def summary(self, path=(), quantiles=DEFAULT_QUANTILES):
+        """
+        Агрегаты группы
+
+        Args:
+            path (tuple): () - все ниши, (категория,) или (категория, подкатегория)
+            quantiles (tuple): Квантили, оцениваемые по гистограмме
+
+        Returns:
+            dict: niches и по каждому показателю count, sum, mean и квантили (p25, p50, ...);
+                None, если группы нет
+        """
+        path = tuple(path)
+        if len(path) >= len(LEVELS):
+            raise ValueError("Для отдельной ниши используйте niche()")
+
+        with self._lock:
+            table = self._levels[len(path)]
+            group = table.ids.get(path)
+            if group is None or table.niches[group] == 0:
+                return None
+            return self._group_summary(table, group, path, quantiles)
+
+    def drill_down(self, path=(), sort_by='final_rating', quantiles=DEFAULT_QUANTILES):
+        """
+        Дочерние элементы группы: категории, подкатегории или ниши
+
+        Args:
+            path (tuple): Группа, которую нужно раскрыть
+            sort_by (str): Показатель для сортировки по среднему (убывание)
+            quantiles (tuple): Квантили для агрегатов групп
+
+        Returns:
+            list: Агрегаты дочерних групп или, для подкатегории, значения показателей ниш
+        """
+        path = tuple(path)
+        if sort_by not in self.measures:
+            raise ValueError(f"Неизвестный показатель: {sort_by}")
+        measure = self.measures.index(sort_by)
+
+        with self._lock:
+            if len(path) == len(LEVELS) - 1:
+                group = self._levels[-1].ids.get(path)
+                slots = sorted(self._members.get(group, ())) if group is not None else []
+                rows = [self.niche_values(slot) for slot in slots if self._active[slot]]
+                return sorted(rows, key=lambda row: _sort_key(row[sort_by]), reverse=True)
+
+            table = self._levels[len(path) + 1]
+            children = [
+                self._group_summary(table, group, key, quantiles)
+                for key, group in table.ids.items()
+                if key[:len(path)] == path and table.niches[group] > 0
+            ]
+
+        return sorted(children, key=lambda item: _sort_key(item['measures'][sort_by]['mean']), reverse=True)
+
+    def roll_up(self, path, quantiles=DEFAULT_QUANTILES):
+        """Агрегаты родительской группы для пути (категории, подкатегории или ниши)"""
+        path = tuple(path)
+        if not path:
+            raise ValueError("У верхнего уровня нет родительской группы")
+        return self.summary(path[:-1], quantiles)
+
+    def niche(self, niche):
+        """Значения показателей ниши (или None)"""
+        with self._lock:
+            slot = self._slots.get(niche)
+            if slot is None or not self._active[slot]:
+                return None
+            return self.niche_values(slot)
+
+    def niche_values(self, slot):
+        category, subcategory = self._levels[2].keys[self._groups[slot, 2]]
+        row = {'name': self._niche_names[slot], 'category': category, 'subcategory': subcategory}
+        row.update({name: float(value) for name, value in zip(self.measures, self._values[slot])})
+        return row
+
+    def _group_summary(self, table, group, key, quantiles):
+        counts = table.counts[group]
+        sums = table.sums[group]
+        measures = {}
+        for m, name in enumerate(self.measures):
+            stats = {
+                'count': int(counts[m]),
+                'sum': float(sums[m]),
+                'mean': float(sums[m] / counts[m]) if counts[m] else None
+            }
+            for q in quantiles:
+                stats[f"p{round(q * 100):g}"] = self._quantile(table.hist[group, m], m, q)
+            measures[name] = stats
+        return {'path': key, 'niches': int(table.niches[group]), 'measures': measures}
+
+    def _quantile(self, hist, m, q):
+        """Квантиль по гистограмме с интерполяцией внутри интервала (геометрической для log-шкалы)"""
+        total = hist.sum()
+        if total == 0:
+            return None
+
+        cumulative = np.cumsum(hist)
+        target = q * total
+        b = int(np.searchsorted(cumulative, target, side='left'))
+        b = min(b, len(hist) - 1)
+        before = cumulative[b - 1] if b > 0 else 0
+        fraction = (target - before) / hist[b] if hist[b] else 0.0
+
+        low, high = self._edges[m, b], self._edges[m, b + 1]
+        if self._log[m]:
+            return float(low * (high / low) ** fraction)
+        return float(low + (high - low) * fraction)
+
+    def _make_edges(self, scale, low, high):
+        if scale == 'log':
+            return np.geomspace(low, high, self.n_bins + 1)
+        return np.linspace(low, high, self.n_bins + 1)
+
+    def _bins(self, values):
+        """Номера интервалов гистограммы; значения вне сетки попадают в крайние интервалы"""
+        bins = np.empty(values.shape, dtype=np.int64)
+        for m in range(len(self.measures)):
+            bins[:, m] = np.searchsorted(self._edges[m], values[:, m], side='right') - 1
+        return np.clip(bins, 0, self.n_bins - 1)
+
+    def _add(self, slots):
+        self._apply(slots, 1)
+
+    def _subtract(self, slots):
+        self._apply(slots, -1)
+
+    def _apply(self, slots, sign):
+        if len(slots) == 0:
+            return
+        values = self._values[slots]
+        bins = self._bins(values)
+        for level, table in enumerate(self._levels):
+            table.apply(self._groups[slots, level], values, bins, sign)
+
+    def _get_slots(self, niches):
+        slots = np.empty(len(niches), dtype=np.int64)
+        for i, niche in enumerate(niches):
+            slot = self._slots.get(niche)
+            if slot is None:
+                slot = self._slots[niche] = len(self._niche_names)
+                self._niche_names.append(niche)
+            slots[i] = slot
+
+        if len(self._niche_names) > len(self._active):
+            capacity = max(len(self._niche_names), 2 * len(self._active), 1024)
+            self._groups = _grow(self._groups, capacity)
+            self._values = _grow(self._values, capacity)
+            self._active = _grow(self._active, capacity)
+        return slots
+
+
+def _sort_key(value):
+    return float('-inf') if value is None or value != value else value
@@ -0,0 +1,181 @@
+"""
+Векторное разложение временных рядов ниш на тренд, сезонность и остаток
+"""
+
+import numpy as np
+
+MONTHS = ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн', 'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек']
+
+
+def _window_sums(values, valid, width):
+    """Суммы и количество валидных значений в скользящих окнах ширины width по оси 1"""
+    n_rows = values.shape[0]
+    zeros = np.zeros((n_rows, 1))
+    value_cumsum = np.concatenate([zeros, np.cumsum(values, axis=1)], axis=1)
+    count_cumsum = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    return (
+        value_cumsum[:, width:] - value_cumsum[:, :-width],
+        count_cumsum[:, width:] - count_cumsum[:, :-width]
+    )
+
+
+def centered_moving_average(values, period=12):
+    """
+    Центрированное скользящее среднее по оси времени для всех рядов сразу
+
+    Для четного периода используется скользящее среднее 2×period (крайние
+    точки окна с весом 1/2), для нечетного - обычное окно period. Значения
+    считаются через кумулятивные суммы; окна с пропусками и края ряда дают NaN.
+
+    Args:
+        values (array-like): Матрица ниши × периоды
+        period (int): Длина сезонного цикла
+
+    Returns:
+        numpy.ndarray: Тренд той же формы
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    valid = np.isfinite(values)
+    filled = np.where(valid, values, 0.0)
+
+    trend = np.full(values.shape, np.nan)
+    half = period // 2
+
+    if period % 2:
+        sums, counts = _window_sums(filled, valid, period)
+        trend[:, half:values.shape[1] - half] = np.where(counts == period, sums / period, np.nan)
+        return trend
+
+    # Окно period + 1 с половинным весом крайних точек = среднее двух соседних окон period
+    sums, counts = _window_sums(filled, valid, period)
+    pair_sums = sums[:, :-1] + sums[:, 1:]
+    complete = (counts[:, :-1] == period) & (counts[:, 1:] == period)
+    trend[:, half:values.shape[1] - half] = np.where(complete, pair_sums / (2 * period), np.nan)
+    return trend
+
+
+def _nanmean(values, axis):
+    """Среднее без NaN без предупреждений для пустых срезов"""
+    valid = np.isfinite(values)
+    counts = valid.sum(axis=axis)
+    sums = np.where(valid, values, 0.0).sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def _nanvar(values):
+    """Дисперсия по оси 1 без NaN"""
+    mean = _nanmean(values, axis=1)
+    return _nanmean((values - mean[:, None]) ** 2, axis=1)
+
+
+def decompose_seasonal(values, period=12, model='multiplicative', start_month=0):
+    """
+    Классическое разложение рядов всех ниш на тренд, сезонность и остаток
+
+    Все вычисления выполняются над матрицей целиком, без цикла по нишам:
+    тренд - центрированное скользящее среднее, сезонные индексы - средние
+    отклонения от тренда по позиции в цикле, нормированные к 1
+    (мультипликативная модель) или к 0 (аддитивная).
+
+    Args:
+        values (array-like): Матрица ниши × периоды (выручка или спрос); пропуски - NaN
+        period (int): Длина сезонного цикла (12 для месячных данных)
+        model (str): 'multiplicative' или 'additive'
+        start_month (int): Позиция первого столбца в цикле (0 - январь)
+
+    Returns:
+        dict: Матрицы trend, seasonal, residual, adjusted (без сезонности),
+            seasonal_indices (ниши × period, позиция 0 - январь),
+            массивы seasonal_strength и trend_strength (0-1) и residual_std
+    """
+    if model not in ('multiplicative', 'additive'):
+        raise ValueError(f"Неизвестная модель сезонности: {model}")
+
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n_rows, n_periods = values.shape
+    if n_periods < 2 * period:
+        raise ValueError(
+            f"Для разложения нужно не меньше двух циклов: {2 * period} периодов, получено {n_periods}"
+        )
+
+    multiplicative = model == 'multiplicative'
+    trend = centered_moving_average(values, period)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        detrended = values / trend if multiplicative else values - trend
+
+    # Позиции в цикле: дополняем NaN до целого числа циклов и усредняем по циклам
+    n_cycles = -(-n_periods // period)
+    padded = np.full((n_rows, n_cycles * period), np.nan)
+    padded[:, :n_periods] = detrended
+    indices = _nanmean(padded.reshape(n_rows, n_cycles, period), axis=1)
+
+    if multiplicative:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indices = indices / _nanmean(indices, axis=1)[:, None]
+    else:
+        indices = indices - _nanmean(indices, axis=1)[:, None]
+
+    seasonal = np.tile(indices, n_cycles)[:, :n_periods]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if multiplicative:
+            residual = values / (trend * seasonal)
+            adjusted = values / seasonal
+            # Сила компонент считается в логарифмах, где модель становится аддитивной
+            log_residual = np.log(residual)
+            seasonal_part = np.log(seasonal) + log_residual
+            trend_part = np.log(trend) + log_residual
+        else:
+            residual = values - trend - seasonal
+            adjusted = values - seasonal
+            log_residual = residual
+            seasonal_part = seasonal + residual
+            trend_part = trend + residual
+
+        residual_var = _nanvar(log_residual)
+        seasonal_strength = np.clip(1 - residual_var / _nanvar(seasonal_part), 0, 1)
+        trend_strength = np.clip(1 - residual_var / _nanvar(trend_part), 0, 1)
+
+    # Индексы по календарным месяцам: столбец j соответствует позиции (start_month + j) % period
+    seasonal_indices = np.roll(indices, start_month % period, axis=1)
+
+    return {
+        'trend': trend,
+        'seasonal': seasonal,
+        'residual': residual,
+        'adjusted': adjusted,
+        'seasonal_indices': seasonal_indices,
+        'seasonal_strength': seasonal_strength,
+        'trend_strength': trend_strength,
+        'residual_std': np.sqrt(residual_var)
+    }
+
+
+def latest_adjusted(decomposition, window=1):
+    """
+    Последнее значение ряда без сезонности для каждой ниши
+
+    Результат можно передать в calculate_ratings_batch (например, как revenue),
+    чтобы рейтинг не зависел от месяца выгрузки.
+
+    Args:
+        decomposition (dict): Результат decompose_seasonal
+        window (int): Количество последних периодов для усреднения
+
+    Returns:
+        numpy.ndarray: Среднее значение без сезонности за последние window периодов
+    """
+    return _nanmean(decomposition['adjusted'][:, -window:], axis=1)
+
+
+def peak_months(decomposition, top=1):
+    """
+    Месяцы с наибольшими сезонными индексами
+
+    Returns:
+        numpy.ndarray: Номера месяцев (0 - январь) формы ниши × top, от наибольшего индекса
+    """
+    indices = np.nan_to_num(decomposition['seasonal_indices'], nan=-np.inf)
+    return np.argsort(-indices, axis=1, kind='stable')[:, :top]
@@ -0,0 +1,256 @@
+"""
+Поиск похожих ниш по оценкам метрик (k ближайших соседей)
+"""
+
+import threading
+
+import numpy as np
+
+# Оценки calculate_rating (шкала 0-100)
+BREAKDOWN_FEATURES = ['demand', 'revenue', 'ad_efficiency', 'organic']
+
+# Исходные метрики и их преобразование перед сравнением
+METRIC_FEATURES = {
+    'demand_ratio': np.log1p,
+    'revenue': np.log1p,
+    'price_ad_ratio': np.log1p,
+    'organic_percent': None
+}
+
+# Размер блока строк при полном переборе: ограничивает память на промежуточные расстояния
+DEFAULT_BLOCK_SIZE = 262144
+
+
+class NicheSimilarityIndex:
+    """
+    Индекс похожих ниш по вектору оценок breakdown (и, при желании, исходных метрик)
+
+    Векторы хранятся в плотной матрице float32, запросы выполняются блочным
+    перебором на NumPy: расстояния считаются через скалярные произведения
+    с заранее вычисленными квадратами норм, а кандидаты каждого блока
+    отбираются argpartition. Для четырех-восьми признаков это быстрее и
+    проще дерева и не требует перестроения при добавлении ниш.
+    """
+
+    def __init__(self, include_metrics=False, standardize=None, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Args:
+            include_metrics (bool): Добавлять ли к оценкам исходные метрики
+            standardize (bool): Приводить ли признаки к z-оценкам (по умолчанию - при include_metrics,
+                так как метрики в разных шкалах). Параметры фиксируются по первому пакету
+            block_size (int): Количество строк в блоке перебора
+        """
+        self.include_metrics = include_metrics
+        self.standardize = include_metrics if standardize is None else standardize
+        self.block_size = block_size
+        self.features = BREAKDOWN_FEATURES + (list(METRIC_FEATURES) if include_metrics else [])
+
+        self._vectors = np.zeros((0, len(self.features)), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._names = []
+        self._rows = {}
+        self._size = 0
+        # Без стандартизации оценки только центрируются в середину шкалы 0-100:
+        # меньше потеря точности float32 при расчете расстояний через нормы
+        self._center = None if self.standardize else np.full(len(self.features), 50.0)
+        self._scale = None if self.standardize else np.ones(len(self.features))
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, name, result, metrics=None):
+        """
+        Добавить (или обновить) одну нишу по результату calculate_rating
+
+        Args:
+            name (str): Название ниши
+            result (dict): Результат calculate_rating
+            metrics (dict): Исходные метрики (нужны при include_metrics)
+        """
+        scores = {key: [result['breakdown'][key]] for key in BREAKDOWN_FEATURES}
+        metric_values = {key: [metrics[key]] for key in METRIC_FEATURES} if self.include_metrics else None
+        self.add_batch([name], scores, metric_values)
+
+    def add_batch(self, names, scores, metrics=None):
+        """
+        Пакетное добавление ниш; существующие названия обновляются
+
+        Args:
+            names (list): Названия ниш
+            scores (dict): Массивы оценок demand, revenue, ad_efficiency, organic
+                (например, результат calculate_ratings_batch)
+            metrics (dict): Массивы исходных метрик (нужны при include_metrics)
+        """
+        names = list(names)
+        vectors = self._to_vectors(scores, metrics, len(names))
+
+        with self._lock:
+            if self.standardize and self._center is None:
+                self._center = vectors.mean(axis=0)
+                std = vectors.std(axis=0)
+                self._scale = np.where(std > 0, std, 1.0)
+            vectors = ((vectors - self._center) / self._scale).astype(np.float32)
+
+            rows = np.empty(len(names), dtype=np.int64)
+            for i, name in enumerate(names):
+                row = self._rows.get(name)
+                if row is None:
+                    row = self._rows[name] = len(self._names)
+                    self._names.append(name)
+                rows[i] = row
+
+            new_size = len(self._names)
+            if new_size > len(self._vectors):
+                capacity = max(new_size, 2 * len(self._vectors), 1024)
+                grown = np.zeros((capacity, len(self.features)), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+                norms = np.zeros(capacity, dtype=np.float32)
+                norms[:self._size] = self._norms[:self._size]
+                self._norms = norms
+
+            self._vectors[rows] = vectors
+            self._norms[rows] = np.einsum('ij,ij->i', vectors, vectors)
+            self._size = new_size
+
+    def vector(self, name):
+        """Вектор признаков ниши в пространстве индекса (или None)"""
+        with self._lock:
+            row = self._rows.get(name)
+            return None if row is None else self._vectors[row].copy()
+
+    def knn(self, vector, k=20, exclude=None):
+        """
+        k ближайших ниш к вектору признаков
+
+        Args:
+            vector (array-like): Вектор в пространстве индекса (см. vector, to_query)
+            k (int): Количество соседей
+            exclude (str): Название ниши, исключаемой из результата
+
+        Returns:
+            list: Пары (название, евклидово расстояние) по возрастанию расстояния
+        """
+        return self.knn_batch(np.asarray(vector, dtype=np.float32)[None, :], k, exclude=[exclude])[0]
+
+    def knn_batch(self, vectors, k=20, exclude=None):
+        """
+        k ближайших ниш для нескольких векторов за один проход по индексу
+
+        Args:
+            vectors (array-like): Матрица запросов × признаки
+            k (int): Количество соседей
+            exclude (list): Для каждого запроса - название исключаемой ниши или None
+
+        Returns:
+            list: Для каждого запроса - пары (название, расстояние)
+        """
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        n_queries = len(queries)
+        exclude_rows = np.full(n_queries, -1)
+
+        with self._lock:
+            for i, name in enumerate(exclude or []):
+                if name is not None and name in self._rows:
+                    exclude_rows[i] = self._rows[name]
+
+            # Лучшие кандидаты: накапливаются по блокам, k + 1 на случай исключения
+            take = k + 1
+            best_d2 = np.full((n_queries, 0), np.inf, dtype=np.float32)
+            best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+            query_norms = np.einsum('ij,ij->i', queries, queries)
+
+            for start in range(0, self._size, self.block_size):
+                stop = min(start + self.block_size, self._size)
+                d2 = (self._norms[start:stop][None, :] - 2 * queries @ self._vectors[start:stop].T +
+                      query_norms[:, None])
+                if d2.shape[1] > take:
+                    idx = np.argpartition(d2, take - 1, axis=1)[:, :take]
+                else:
+                    idx = np.broadcast_to(np.arange(d2.shape[1]), d2.shape)
+                block_d2 = np.take_along_axis(d2, idx, axis=1)
+
+                merged_d2 = np.concatenate([best_d2, block_d2], axis=1)
+                merged_rows = np.concatenate([best_rows, idx + start], axis=1)
+                if merged_d2.shape[1] > take:
+                    keep = np.argpartition(merged_d2, take - 1, axis=1)[:, :take]
+                    merged_d2 = np.take_along_axis(merged_d2, keep, axis=1)
+                    merged_rows = np.take_along_axis(merged_rows, keep, axis=1)
+                best_d2, best_rows = merged_d2, merged_rows
+
+            names = self._names
+
+        results = []
+        for i in range(n_queries):
+            order = np.argsort(best_d2[i], kind='stable')
+            neighbours = []
+            for j in order:
+                row = best_rows[i, j]
+                if row == exclude_rows[i]:
+                    continue
+                neighbours.append((names[row], float(np.sqrt(max(best_d2[i, j], 0.0)))))
+                if len(neighbours) == k:
+                    break
+            results.append(neighbours)
+        return results
+
+    def similar_to(self, name, k=20):
+        """k ниш, наиболее похожих на нишу из индекса (без нее самой)"""
+        vector = self.vector(name)
+        if vector is None:
+            raise ValueError(f"Ниша не найдена в индексе: {name}")
+        return self.knn(vector, k, exclude=name)
+
+    def radius(self, vector, radius, exclude=None):
+        """
+        Все ниши в пределах расстояния radius от вектора
+
+        Returns:
+            list: Пары (название, расстояние) по возрастанию расстояния
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query_norm = float(query @ query)
+        limit = radius ** 2
+
+        rows, distances = [], []
+        with self._lock:
+            exclude_row = self._rows.get(exclude) if exclude is not None else None
+            for start in range(0, self._size, self.block_size):
+                stop = min(start + self.block_size, self._size)
+                d2 = self._norms[start:stop] - 2 * (self._vectors[start:stop] @ query) + query_norm
+                hits = np.flatnonzero(d2 <= limit)
+                rows.append(hits + start)
+                distances.append(d2[hits])
+            names = self._names
+
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        distances = np.concatenate(distances) if distances else np.zeros(0, dtype=np.float32)
+        order = np.argsort(distances, kind='stable')
+        return [
+            (names[rows[i]], float(np.sqrt(max(distances[i], 0.0))))
+            for i in order if rows[i] != exclude_row
+        ]
+
+    def to_query(self, result, metrics=None):
+        """Вектор запроса по результату calculate_rating (в пространстве индекса)"""
+        scores = {key: [result['breakdown'][key]] for key in BREAKDOWN_FEATURES}
+        metric_values = {key: [metrics[key]] for key in METRIC_FEATURES} if self.include_metrics else None
+        vector = self._to_vectors(scores, metric_values, 1)[0]
+        if self._center is None:
+            raise ValueError("Индекс пуст: параметры стандартизации еще не определены")
+        return ((vector - self._center) / self._scale).astype(np.float32)
+
+    def _to_vectors(self, scores, metrics, n):
+        columns = [np.asarray(scores[key], dtype=float) for key in BREAKDOWN_FEATURES]
+        if self.include_metrics:
+            if metrics is None:
+                raise ValueError("Для индекса с исходными метриками нужны значения metrics")
+            for key, transform in METRIC_FEATURES.items():
+                values = np.asarray(metrics[key], dtype=float)
+                columns.append(transform(np.maximum(values, 0)) if transform else values)
+
+        vectors = np.column_stack(columns) if n else np.zeros((0, len(self.features)))
+        if len(vectors) != n:
+            raise ValueError("Количество названий и значений признаков не совпадает")
+        return vectors
@@ -1,40 +1,60 @@
-import plotly.express as px
+import copy
+
+import numpy as np
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
 
-def create_radar_chart(breakdown):
+from .instrumentation import instrumented
+
+# Категории метрик в порядке отображения на диаграммах
+METRIC_CATEGORIES = [
+    'Спрос/Предложение',
+    'Выручка категории',
+    'Эффективность рекламы',
+    'Процент органики'
+]
+
+# Кэш заготовок диаграмм: макет строится и валидируется один раз,
+# при каждом вызове подставляются только данные трасс
+_FIGURE_TEMPLATES = {}
+
+def _get_figure_template(name, builder):
     """
-    Создание радарной диаграммы метрик
+    Получение заготовки диаграммы из кэша
     
     Args:
-        breakdown (dict): Детализация метрик
+        name (str): Имя заготовки
+        builder (callable): Функция построения эталонной диаграммы
     
     Returns:
-        plotly.graph_objects.Figure: Радарная диаграмма
+        dict: Копия словаря диаграммы, которую можно изменять
     """
-    categories = [
-        'Спрос/Предложение',
-        'Выручка категории', 
-        'Эффективность рекламы',
-        'Процент органики'
-    ]
-    
-    values = [
+    template = _FIGURE_TEMPLATES.get(name)
+    if template is None:
+        template = builder().to_dict()
+        _FIGURE_TEMPLATES[name] = template
+    return copy.deepcopy(template)
+
+def _figure_from_template(fig_dict):
+    """Сборка Figure из заполненной заготовки без повторной валидации"""
+    return go.Figure(fig_dict, _validate=False)
+
+def _breakdown_values(breakdown):
+    return [
         breakdown['demand'],
         breakdown['revenue'],
         breakdown['ad_efficiency'],
         breakdown['organic']
     ]
-    
+
+def _build_radar_chart_skeleton():
+    """Построение эталонной радарной диаграммы с нулевыми значениями"""
     # Замыкаем диаграмму
-    values_closed = values + [values[0]]
-    categories_closed = categories + [categories[0]]
+    categories_closed = METRIC_CATEGORIES + [METRIC_CATEGORIES[0]]
     
     fig = go.Figure()
     
     fig.add_trace(go.Scatterpolar(
-        r=values_closed,
+        r=[0] * len(categories_closed),
         theta=categories_closed,
         fill='toself',
         name='Метрики ниши',
@@ -65,52 +85,58 @@ def create_radar_chart(breakdown):
     
     return fig
 
-def create_metrics_bar_chart(result):
+@instrumented('chart.radar')
+def create_radar_chart(breakdown, title=None):
     """
-    Создание столбчатой диаграммы метрик с весами
+    Создание радарной диаграммы метрик
     
     Args:
-        result (dict): Результат расчета рейтинга
+        breakdown (dict): Детализация метрик
+        title (str): Заголовок диаграммы (по умолчанию - стандартный)
     
     Returns:
-        plotly.graph_objects.Figure: Столбчатая диаграмма
+        plotly.graph_objects.Figure: Радарная диаграмма
     """
-    breakdown = result['breakdown']
-    weights = result['weights_used']
+    values = _breakdown_values(breakdown)
     
-    categories = [
-        'Спрос/Предложение',
-        'Выручка категории',
-        'Эффективность рекламы', 
-        'Процент органики'
-    ]
+    fig_dict = _get_figure_template('radar', _build_radar_chart_skeleton)
+    fig_dict['data'][0]['r'] = values + [values[0]]
+    if title is not None:
+        fig_dict['layout']['title']['text'] = title
     
-    values = [
-        breakdown['demand'],
-        breakdown['revenue'],
-        breakdown['ad_efficiency'],
-        breakdown['organic']
-    ]
+    return _figure_from_template(fig_dict)
+
+def create_radar_charts(breakdowns, names=None):
+    """
+    Пакетное создание радарных диаграмм для нескольких ниш с общим макетом
     
-    weight_values = [
-        weights['demand'],
-        weights['revenue'],
-        weights['ads'],
-        weights['organic']
-    ]
+    Если названия переданы, их должно быть столько же, сколько детализаций.
     
-    # Взвешенные значения
-    weighted_values = [
-        values[i] * weight_values[i] / 100 for i in range(len(values))
-    ]
+    Args:
+        breakdowns (list): Детализации метрик ниш
+        names (list): Названия ниш для заголовков (необязательно)
+    
+    Returns:
+        list: Список plotly.graph_objects.Figure в порядке входных данных
+    """
+    if names is not None and len(names) != len(breakdowns):
+        raise ValueError(
+            f"Количество названий ({len(names)}) не совпадает с количеством ниш ({len(breakdowns)})"
+        )
     
-    # Создание DataFrame для удобства
-    df = pd.DataFrame({
-        'Метрика': categories,
-        'Оценка': values,
-        'Вес (%)': weight_values,
-        'Взвешенная оценка': weighted_values
-    })
+    figures = []
+    for i, breakdown in enumerate(breakdowns):
+        title = f"Радарная диаграмма метрик: {names[i]}" if names else None
+        figures.append(create_radar_chart(breakdown, title=title))
+    
+    return figures
+
+def _build_metrics_bar_chart_skeleton():
+    """Построение эталонной столбчатой диаграммы с нулевыми значениями"""
+    # make_subplots импортируется лениво - он нужен только при построении заготовки
+    from plotly.subplots import make_subplots
+    
+    zeros = [0] * len(METRIC_CATEGORIES)
     
     fig = make_subplots(
         rows=1, cols=2,
@@ -121,11 +147,11 @@ def create_metrics_bar_chart(result):
     # Первый график - оценки метрик
     fig.add_trace(
         go.Bar(
-            x=df['Метрика'],
-            y=df['Оценка'],
+            x=METRIC_CATEGORIES,
+            y=zeros,
             name='Оценка',
             marker_color='lightblue',
-            text=df['Оценка'].round(1),
+            text=zeros,
             textposition='outside'
         ),
         row=1, col=1
@@ -135,11 +161,11 @@ def create_metrics_bar_chart(result):
     colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4']
     fig.add_trace(
         go.Bar(
-            x=df['Метрика'],
-            y=df['Взвешенная оценка'],
+            x=METRIC_CATEGORIES,
+            y=zeros,
             name='Взвешенная оценка',
             marker_color=colors,
-            text=df['Взвешенная оценка'].round(1),
+            text=zeros,
             textposition='outside'
         ),
         row=1, col=2
@@ -157,6 +183,44 @@ def create_metrics_bar_chart(result):
     
     return fig
 
+@instrumented('chart.metrics_bar')
+def create_metrics_bar_chart(result):
+    """
+    Создание столбчатой диаграммы метрик с весами
+    
+    Args:
+        result (dict): Результат расчета рейтинга
+    
+    Returns:
+        plotly.graph_objects.Figure: Столбчатая диаграмма
+    """
+    weights = result['weights_used']
+    
+    values = _breakdown_values(result['breakdown'])
+    
+    weight_values = [
+        weights['demand'],
+        weights['revenue'],
+        weights['ads'],
+        weights['organic']
+    ]
+    
+    # Взвешенные значения
+    weighted_values = [
+        values[i] * weight_values[i] / 100 for i in range(len(values))
+    ]
+    
+    fig_dict = _get_figure_template('metrics_bar', _build_metrics_bar_chart_skeleton)
+    
+    scores_trace, weighted_trace = fig_dict['data']
+    scores_trace['y'] = values
+    scores_trace['text'] = [round(value, 1) for value in values]
+    weighted_trace['y'] = weighted_values
+    weighted_trace['text'] = [round(value, 1) for value in weighted_values]
+    
+    return _figure_from_template(fig_dict)
+
+@instrumented('chart.comparison', rows=lambda fig, comparison_data: len(comparison_data or []))
 def create_comparison_chart(comparison_data):
     """
     Создание диаграммы сравнения ниш
@@ -206,12 +270,142 @@ def create_comparison_chart(comparison_data):
     
     return fig
 
-def create_trend_chart(historical_data):
+def _to_numeric_axis(x):
+    """Приведение значений оси X (числа или даты) к float для расчетов"""
+    values = np.asarray(x)
+    if values.dtype.kind in 'iuf':
+        return values.astype(float)
+    if values.dtype.kind != 'M':
+        values = values.astype('datetime64[ns]')
+    return values.astype('datetime64[ns]').astype(np.int64).astype(float)
+
+def _bucket_layout(n, n_buckets):
+    """Разбиение внутренних точек [1, n-1) на корзины: (начала корзин, размеры, номер корзины для точки)"""
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)
+    edges = np.unique(edges)
+    starts = edges[:-1]
+    counts = np.diff(edges)
+    bucket_ids = np.repeat(np.arange(len(starts)), counts)
+    return starts, counts, bucket_ids
+
+def _lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets для ряда с пропусками
+    
+    Пропуски (NaN) не участвуют в выборе точек: корзины строятся только по
+    конечным значениям. Первая точка каждого пропуска сохраняется явно, чтобы
+    линия графика на нем прерывалась; если пропусков больше, чем позволяет
+    n_out, сохраняются равномерно выбранные из них.
+    """
+    finite = np.isfinite(y)
+    if finite.all():
+        return _lttb_finite_indices(x, y, n_out)
+    
+    gap_starts = np.flatnonzero(~finite & np.r_[True, finite[:-1]])
+    finite_idx = np.flatnonzero(finite)
+    
+    budget = max(n_out - len(gap_starts), min(3, n_out))
+    n_breaks = n_out - budget
+    if n_breaks < len(gap_starts):
+        gap_starts = gap_starts[np.linspace(0, len(gap_starts) - 1, n_breaks).round().astype(np.int64)]
+    
+    if len(finite_idx) > budget:
+        finite_idx = finite_idx[_lttb_finite_indices(x[finite_idx], y[finite_idx], budget)]
+    return np.union1d(finite_idx, gap_starts)
+
+def _lttb_finite_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets без цикла по корзинам (ряд без пропусков)
+    
+    В качестве опорной точки предыдущей корзины используется ее среднее
+    (как и для следующей корзины), что позволяет посчитать площади
+    треугольников для всех точек одним векторным выражением.
+    """
+    n = len(x)
+    starts, counts, bucket_ids = _bucket_layout(n, n_out - 2)
+    inner_x, inner_y = x[1:n - 1], y[1:n - 1]
+    
+    avg_x = np.add.reduceat(inner_x, starts - 1) / counts
+    avg_y = np.add.reduceat(inner_y, starts - 1) / counts
+    
+    # Опорные точки: среднее предыдущей и следующей корзины (крайние - первая и последняя точки)
+    prev_x = np.r_[x[0], avg_x[:-1]][bucket_ids]
+    prev_y = np.r_[y[0], avg_y[:-1]][bucket_ids]
+    next_x = np.r_[avg_x[1:], x[-1]][bucket_ids]
+    next_y = np.r_[avg_y[1:], y[-1]][bucket_ids]
+    
+    area = np.abs((prev_x - next_x) * (inner_y - prev_y) - (prev_x - inner_x) * (next_y - prev_y))
+    
+    # Первая точка с максимальной площадью в каждой корзине
+    best = np.maximum.reduceat(area, starts - 1)
+    candidates = np.flatnonzero(area == best[bucket_ids])
+    first = np.r_[True, bucket_ids[candidates[1:]] != bucket_ids[candidates[:-1]]]
+    
+    return np.r_[0, candidates[first] + 1, n - 1]
+
+def _minmax_indices(x, y, n_out):
+    """Минимум и максимум в каждой корзине"""
+    n = len(x)
+    starts, counts, bucket_ids = _bucket_layout(n, max((n_out - 2) // 2, 1))
+    inner_y = y[1:n - 1]
+    missing = np.isnan(inner_y)
+    
+    # Внутри каждой корзины сначала идут значения по возрастанию, затем пропуски (NaN):
+    # первая точка - минимум, последняя непропущенная - максимум
+    order = np.lexsort((inner_y, missing, bucket_ids))
+    starts_sorted = np.cumsum(counts) - counts
+    valid = counts - np.bincount(bucket_ids, weights=missing, minlength=len(counts)).astype(np.int64)
+    selected = np.unique(np.r_[order[starts_sorted], order[starts_sorted + np.maximum(valid, 1) - 1]])
+    
+    indices = np.r_[0, selected + 1, n - 1]
+    if len(indices) > n_out:
+        # При n_out = 3 в единственной корзине помещается только одна из двух точек
+        indices = np.r_[indices[:n_out - 1], indices[-1]]
+    return indices
+
+def downsample_series(x, y, max_points, method='lttb'):
+    """
+    Прореживание временного ряда с сохранением формы
+    
+    Args:
+        x (array-like): Значения оси X (числа или даты)
+        y (array-like): Значения ряда
+        max_points (int): Целевое количество точек
+        method (str): 'lttb' - Largest-Triangle-Three-Buckets, 'minmax' - минимум и максимум в корзине
+    
+    Returns:
+        numpy.ndarray: Индексы сохраненных точек в порядке возрастания
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    
+    x_values = _to_numeric_axis(x)
+    y_values = np.asarray(y, dtype=float)
+    
+    if method == 'lttb':
+        return _lttb_indices(x_values, y_values, max_points)
+    if method == 'minmax':
+        return _minmax_indices(x_values, y_values, max_points)
+    
+    raise ValueError(f"Неизвестный метод прореживания: {method}")
+
+@instrumented('chart.trend', rows=lambda fig, historical_data, *args, **kwargs: len(historical_data['dates']))
+def create_trend_chart(historical_data, chart_width=1000, max_points=None, downsample='lttb', x_range=None):
     """
     Создание графика трендов по времени
     
+    Длинные ряды прореживаются отдельно для каждой метрики до max_points
+    точек (по умолчанию - по точке на пиксель ширины графика). Для
+    приближения передайте x_range: ряд сначала обрезается до диапазона
+    и только затем прореживается, поэтому детализация растет с приближением.
+    
     Args:
         historical_data (dict): Исторические данные
+        chart_width (int): Ширина графика в пикселях
+        max_points (int): Максимум точек на ряд (по умолчанию chart_width)
+        downsample (str): Метод прореживания: 'lttb', 'minmax' или None
+        x_range (tuple): Диапазон (начало, конец) оси X для детального просмотра
     
     Returns:
         plotly.graph_objects.Figure: График трендов
@@ -221,6 +415,17 @@ def create_trend_chart(historical_data):
     
     fig = go.Figure()
     
+    dates = np.asarray(historical_data['dates'])
+    window = slice(None)
+    if x_range is not None:
+        x_numeric = _to_numeric_axis(dates)
+        low, high = _to_numeric_axis(np.asarray(x_range, dtype=dates.dtype))
+        window = (x_numeric >= low) & (x_numeric <= high)
+        dates = dates[window]
+    
+    if max_points is None:
+        max_points = chart_width
+    
     # Добавляем линии для каждой метрики
     metrics = ['demand', 'revenue', 'ads', 'organic']
     metric_names = ['Спрос/Предложение', 'Выручка', 'Реклама', 'Органика']
@@ -228,10 +433,15 @@ def create_trend_chart(historical_data):
     
     for i, metric in enumerate(metrics):
         if metric in historical_data:
+            x, y = dates, np.asarray(historical_data[metric])[window]
+            if downsample and len(y) > max_points:
+                idx = downsample_series(x, y, max_points, method=downsample)
+                x, y = x[idx], y[idx]
+            
             fig.add_trace(go.Scatter(
-                x=historical_data['dates'],
-                y=historical_data[metric],
-                mode='lines+markers',
+                x=x,
+                y=y,
+                mode='lines+markers' if len(y) <= 100 else 'lines',
                 name=metric_names[i],
                 line=dict(color=colors[i], width=2),
                 marker=dict(size=6)
@@ -247,28 +457,101 @@ def create_trend_chart(historical_data):
     
     return fig
 
-def create_distribution_chart(data, metric_name):
+def bin_distribution(data, bins=20, log_bins=False, clip_quantiles=None):
+    """
+    Разбиение значений на интервалы на стороне сервера
+    
+    Args:
+        data (array-like): Значения метрики
+        bins (int): Количество интервалов
+        log_bins (bool): Логарифмические интервалы (учитываются только положительные значения)
+        clip_quantiles (tuple): Квантили (нижний, верхний) для ограничения диапазона,
+            например (0.01, 0.99); значения за пределами диапазона отбрасываются
+    
+    Returns:
+        tuple: (границы интервалов, количество значений в интервалах)
+    """
+    values = np.asarray(data, dtype=float)
+    values = values[np.isfinite(values)]
+    if log_bins:
+        values = values[values > 0]
+    
+    if len(values) == 0:
+        return np.array([0.0, 1.0]), np.array([0])
+    
+    if clip_quantiles is not None:
+        low, high = np.quantile(values, clip_quantiles)
+    else:
+        low, high = values.min(), values.max()
+    
+    if high <= low:
+        high = low + 1
+    
+    if log_bins:
+        edges = np.geomspace(low, high, bins + 1)
+    else:
+        edges = np.linspace(low, high, bins + 1)
+    
+    counts, edges = np.histogram(values, bins=edges)
+    return edges, counts
+
+@instrumented('chart.distribution', rows=lambda fig, data, *args, **kwargs: len(data))
+def create_distribution_chart(data, metric_name, binning='auto', bins=20, log_bins=False,
+                              clip_quantiles=None, server_binning_threshold=10000):
     """
     Создание диаграммы распределения значений
     
+    В режиме серверного разбиения в браузер передаются только границы
+    интервалов и частоты (столбчатая трасса), поэтому объем диаграммы
+    зависит от количества интервалов, а не от количества строк.
+    
     Args:
         data (list): Данные для анализа распределения
         metric_name (str): Название метрики
+        binning (str): 'client' - гистограмма строится в браузере,
+            'server' - разбиение NumPy на сервере,
+            'auto' - серверное разбиение при len(data) > server_binning_threshold
+        bins (int): Количество интервалов
+        log_bins (bool): Логарифмические интервалы (только для серверного разбиения)
+        clip_quantiles (tuple): Квантили для ограничения диапазона (только для серверного разбиения)
+        server_binning_threshold (int): Порог количества значений для режима 'auto'
     
     Returns:
         plotly.graph_objects.Figure: Гистограмма распределения
     """
-    if not data:
+    if data is None or len(data) == 0:
         return go.Figure()
     
-    fig = go.Figure(data=[
-        go.Histogram(
+    if binning == 'auto':
+        use_server = len(data) > server_binning_threshold or log_bins or clip_quantiles is not None
+    elif binning in ('client', 'server'):
+        use_server = binning == 'server'
+    else:
+        raise ValueError(f"Неизвестный режим разбиения: {binning}")
+    
+    if use_server:
+        edges, counts = bin_distribution(data, bins=bins, log_bins=log_bins, clip_quantiles=clip_quantiles)
+        trace = go.Bar(
+            x=edges[:-1],
+            y=counts,
+            width=np.diff(edges),
+            offset=0,
+            customdata=np.column_stack([edges[:-1], edges[1:]]),
+            hovertemplate='%{customdata[0]:.4g} – %{customdata[1]:.4g}<br>' +
+                          'Частота: %{y}<extra></extra>',
+            marker_color='lightblue',
+            marker_line_width=0,
+            opacity=0.7
+        )
+    else:
+        trace = go.Histogram(
             x=data,
-            nbinsx=20,
+            nbinsx=bins,
             marker_color='lightblue',
             opacity=0.7
         )
-    ])
+    
+    fig = go.Figure(data=[trace])
     
     fig.update_layout(
         title=f"Распределение: {metric_name}",
@@ -277,14 +560,101 @@ def create_distribution_chart(data, metric_name):
         height=300
     )
     
+    if use_server:
+        # Столбцы вплотную, как у обычной гистограммы
+        fig.update_layout(bargap=0)
+        if log_bins:
+            fig.update_xaxes(type='log')
+    
     return fig
 
-def create_competitive_analysis_chart(competitive_data):
+def _sample_competitors(prices, sales, market_share, max_points, keep_top, grid_size=64, seed=0):
+    """
+    Прореживание конкурентов с учетом плотности точек
+    
+    Лидеры по доле рынка сохраняются всегда. Остальные точки раскладываются
+    по сетке в логарифмических координатах цена/продажи: в разреженных ячейках
+    сохраняются все точки (выбросы), в плотных - не больше общего лимита на ячейку.
+    Если занятых ячеек больше, чем позволяет лимит, выбирается по одной точке
+    из случайного подмножества ячеек.
+    
+    Args:
+        prices (numpy.ndarray): Цены
+        sales (numpy.ndarray): Продажи
+        market_share (numpy.ndarray): Доли рынка
+        max_points (int): Максимальное количество точек на диаграмме
+        keep_top (int): Сколько лидеров по доле рынка сохранить без прореживания
+        grid_size (int): Размер сетки по каждой оси
+        seed (int): Зерно генератора для воспроизводимого выбора
+    
+    Returns:
+        numpy.ndarray: Отсортированные индексы сохраненных точек
+    """
+    n = len(prices)
+    keep_top = min(keep_top, max_points, n)
+    
+    if keep_top > 0:
+        top_idx = np.argpartition(-market_share, keep_top - 1)[:keep_top]
+    else:
+        top_idx = np.array([], dtype=np.int64)
+    
+    rest_mask = np.ones(n, dtype=bool)
+    rest_mask[top_idx] = False
+    rest_idx = np.flatnonzero(rest_mask)
+    budget = max_points - keep_top
+    
+    if budget <= 0 or len(rest_idx) == 0:
+        return np.sort(top_idx)
+    if len(rest_idx) <= budget:
+        return np.arange(n)
+    
+    # Номер ячейки сетки для каждой точки
+    cells = np.zeros(len(rest_idx), dtype=np.int64)
+    for axis_values in (prices[rest_idx], sales[rest_idx]):
+        scaled = np.log1p(np.clip(np.nan_to_num(axis_values), 0, None))
+        low, high = scaled.min(), scaled.max()
+        bins = np.floor((scaled - low) / ((high - low) or 1) * (grid_size - 1)).astype(np.int64)
+        cells = cells * grid_size + bins
+    
+    # Случайный порядок внутри ячеек, затем ранг точки в своей ячейке
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(cells)), cells))
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, len(sorted_cells)])
+    rank = np.arange(len(sorted_cells)) - np.repeat(starts, counts)
+    
+    # Максимальный лимит на ячейку, при котором укладываемся в бюджет
+    counts_sorted = np.sort(counts)
+    prefix = np.r_[0, np.cumsum(counts_sorted)]
+    limits = np.arange(1, counts_sorted[-1] + 1)
+    covered = np.searchsorted(counts_sorted, limits, side='right')
+    totals = prefix[covered] + limits * (len(counts_sorted) - covered)
+    per_cell = int(np.searchsorted(totals, budget, side='right'))
+    
+    if per_cell == 0:
+        # Занятых ячеек больше бюджета - по одной точке из budget случайных ячеек
+        chosen = rng.choice(len(starts), size=budget, replace=False)
+        sampled_idx = rest_idx[order[starts[chosen]]]
+    else:
+        sampled_idx = rest_idx[order[rank < per_cell]]
+    return np.sort(np.concatenate([top_idx, sampled_idx]))
+
+@instrumented('chart.competitive', rows=lambda fig, competitive_data, *args, **kwargs: len(competitive_data['prices']))
+def create_competitive_analysis_chart(competitive_data, webgl_threshold=5000, max_points=5000, keep_top=200):
     """
     Создание диаграммы конкурентного анализа
     
+    При количестве конкурентов больше webgl_threshold используется WebGL-трасса,
+    а точки прореживаются с учетом плотности до max_points. Лидеры по доле
+    рынка (keep_top) сохраняются без изменений, поэтому размер диаграммы
+    ограничен независимо от размера отчета.
+    
     Args:
         competitive_data (dict): Данные о конкурентах
+        webgl_threshold (int): Порог количества точек для режима больших данных
+        max_points (int): Максимальное количество точек в режиме больших данных
+        keep_top (int): Сколько лидеров по доле рынка сохранять всегда
     
     Returns:
         plotly.graph_objects.Figure: Пузырьковая диаграмма
@@ -292,31 +662,64 @@ def create_competitive_analysis_chart(competitive_data):
     if not competitive_data:
         return go.Figure()
     
+    prices = competitive_data.get('prices', [])
+    sales = competitive_data.get('sales', [])
+    market_share = competitive_data.get('market_share', [])
+    ratings = competitive_data.get('ratings', [])
+    names = competitive_data.get('names', [])
+    
+    total = len(prices)
+    large_data = total > webgl_threshold
+    scatter_cls = go.Scatter
+    
+    # Масштаб пузырьков считается по полным данным до прореживания
+    sizeref = 2.*max(competitive_data.get('market_share', [1]))/40
+    
+    if large_data:
+        scatter_cls = go.Scattergl
+        market_share = np.asarray(market_share, dtype=float)
+        idx = _sample_competitors(
+            np.asarray(prices, dtype=float),
+            np.asarray(sales, dtype=float),
+            market_share,
+            max_points,
+            keep_top
+        )
+        prices = np.asarray(prices)[idx]
+        sales = np.asarray(sales)[idx]
+        market_share = market_share[idx]
+        ratings = np.asarray(ratings)[idx] if len(ratings) else ratings
+        names = np.asarray(names, dtype=object)[idx] if len(names) else names
+    
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(
-        x=competitive_data.get('prices', []),
-        y=competitive_data.get('sales', []),
+    fig.add_trace(scatter_cls(
+        x=prices,
+        y=sales,
         mode='markers',
         marker=dict(
-            size=competitive_data.get('market_share', []),
-            color=competitive_data.get('ratings', []),
+            size=market_share,
+            color=ratings,
             colorscale='Viridis',
             showscale=True,
             colorbar=dict(title="Рейтинг"),
             sizemode='diameter',
-            sizeref=2.*max(competitive_data.get('market_share', [1]))/40,
+            sizeref=sizeref,
             sizemin=4
         ),
-        text=competitive_data.get('names', []),
+        text=names,
         hovertemplate='<b>%{text}</b><br>' +
                       'Цена: %{x}<br>' +
                       'Продажи: %{y}<br>' +
                       '<extra></extra>'
     ))
     
+    title = "Конкурентный анализ"
+    if large_data and len(prices) < total:
+        title += f" (показано {len(prices)} из {total})"
+    
     fig.update_layout(
-        title="Конкурентный анализ",
+        title=title,
         xaxis_title="Цена",
         yaxis_title="Продажи",
         height=500
@@ -324,6 +727,7 @@ def create_competitive_analysis_chart(competitive_data):
     
     return fig
 
+@instrumented('chart.gauge')
 def create_rating_gauge(rating):
     """
     Создание шкалы-индикатора рейтинга
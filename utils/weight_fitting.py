@@ -0,0 +1,364 @@
+"""
+Подбор весов метрик по исходам прошлых ниш
+
+Запуск из корня репозитория (CSV с метриками и столбцом исхода):
+    python -m utils.weight_fitting history.csv --outcome success --output weights.json
+"""
+
+import itertools
+import json
+
+import numpy as np
+
+# Ключи весов калькулятора и соответствующие им оценки calculate_ratings_batch
+WEIGHT_KEYS = ['demand', 'revenue', 'ads', 'organic']
+SCORE_KEYS = ['demand', 'revenue', 'ad_efficiency', 'organic']
+
+METRIC_COLUMNS = ['demand_ratio', 'revenue', 'price_ad_ratio', 'organic_percent']
+
+# Все подмножества признаков: перебор активных ограничений w >= 0
+_SUBSETS = [
+    subset
+    for size in range(len(SCORE_KEYS) + 1)
+    for subset in itertools.combinations(range(len(SCORE_KEYS)), size)
+]
+
+# Регуляризация вырожденных систем (например, постоянной оценки во всей выборке)
+_RIDGE = 1e-9
+
+
+def fit_weights(scores, outcomes, folds=5, seed=0, baseline=None):
+    """
+    Неотрицательные веса метрик с суммой 100 по исходам прошлых ниш
+
+    Исход приближается моделью a + b · рейтинг, где рейтинг - взвешенная
+    сумма оценок с весами на симплексе. Это то же самое, что наименьшие
+    квадраты с неотрицательными коэффициентами при оценках и свободным
+    членом: веса - коэффициенты, нормированные на их сумму. Для четырех
+    признаков задача решается точно перебором 16 наборов активных признаков:
+    по каждому решается система нормальных уравнений, и из допустимых
+    решений берется решение с наименьшей ошибкой.
+
+    Данные проходятся один раз: для каждого блока кросс-валидации
+    считаются матрица Грама и правая часть, а обучающие статистики блока -
+    разность с общими. Системы всех блоков решаются одним пакетным вызовом.
+
+    Args:
+        scores (dict): Массивы оценок demand, revenue, ad_efficiency, organic
+            (например, calculate_ratings_batch(..., decimals=None))
+        outcomes (array-like): Исход ниши: 1/0 (успех/неуспех) или числовой
+            показатель, где больше - лучше; NaN - строка пропускается
+        folds (int): Количество блоков кросс-валидации (0 или 1 - без нее)
+        seed (int): Зерно случайного разбиения на блоки
+        baseline (dict): Веса для сравнения на тех же блоках (например, calculator.weights)
+
+    Returns:
+        dict: weights - целые веса с суммой 100 (формат update_weights),
+            raw_weights - веса без округления, intercept и slope - калибровка
+            рейтинга в шкалу исхода, niches - размер выборки, cv - качество
+            на отложенных блоках (auc для бинарного исхода, r2, веса по блокам
+            и те же показатели для baseline)
+    """
+    features = np.column_stack([np.asarray(scores[key], dtype=float) for key in SCORE_KEYS]) / 100.0
+    y = np.asarray(outcomes, dtype=float)
+    if len(y) != len(features):
+        raise ValueError("Количество исходов и ниш не совпадает")
+
+    valid = np.isfinite(y) & np.isfinite(features).all(axis=1)
+    features, y = features[valid], y[valid]
+    n = len(y)
+    if n < len(SCORE_KEYS) + 1:
+        raise ValueError(f"Недостаточно ниш с известным исходом: {n}")
+
+    folds = int(folds) if folds and folds > 1 else 0
+    if folds > n:
+        raise ValueError("Блоков кросс-валидации больше, чем ниш")
+    fold_of = np.random.default_rng(seed).permutation(n) % folds if folds else np.zeros(n, dtype=np.int64)
+
+    # Достаточные статистики по блокам: Z^T Z, Z^T y и y^T y, где Z = [1, оценки]
+    design = np.column_stack([np.ones(n), features])
+    n_groups = max(folds, 1)
+    order = np.argsort(fold_of, kind='stable')
+    starts = np.searchsorted(fold_of[order], np.arange(n_groups))
+    outer = design[order, :, None] * design[order, None, :]
+    gram_folds = np.add.reduceat(outer, starts, axis=0)
+    rhs_folds = np.add.reduceat(design[order] * y[order, None], starts, axis=0)
+    yy_folds = np.add.reduceat(y[order] ** 2, starts)
+
+    gram_total, rhs_total, yy_total = gram_folds.sum(axis=0), rhs_folds.sum(axis=0), yy_folds.sum()
+
+    # Первая система - вся выборка, далее - обучающие части блоков
+    gram = np.concatenate([gram_total[None], gram_total - gram_folds]) if folds else gram_total[None]
+    rhs = np.concatenate([rhs_total[None], rhs_total - rhs_folds]) if folds else rhs_total[None]
+    yy = np.concatenate([[yy_total], yy_total - yy_folds]) if folds else np.array([yy_total])
+
+    coefficients = _nonnegative_least_squares(gram, rhs, yy)
+    full = coefficients[0]
+    slope = full[1:].sum()
+    if slope <= 0:
+        raise ValueError("Исходы не растут ни с одной из оценок: веса подобрать нельзя")
+
+    raw_weights = full[1:] / slope * 100
+    result = {
+        'weights': dict(zip(WEIGHT_KEYS, _to_percent(raw_weights))),
+        'raw_weights': {key: float(value) for key, value in zip(WEIGHT_KEYS, raw_weights)},
+        # Рейтинг в шкале 0-100 -> ожидаемый исход
+        'intercept': float(full[0]),
+        'slope': float(slope / 100),
+        'niches': int(n),
+        'cv': None
+    }
+
+    if folds:
+        binary = bool(np.isin(y, (0.0, 1.0)).all() and 0 < y.sum() < n)
+        fold_weights = coefficients[1:, 1:]
+        result['cv'] = _cross_validate(features, y, fold_of, folds, coefficients[1:], binary)
+        result['cv']['weights_folds'] = [
+            dict(zip(WEIGHT_KEYS, _to_percent(weights / weights.sum() * 100)))
+            if weights.sum() > 0 else None
+            for weights in fold_weights
+        ]
+        if baseline:
+            baseline_weights = np.array([baseline[key] for key in WEIGHT_KEYS], dtype=float)
+            result['cv']['baseline'] = _cross_validate_fixed(
+                features, y, fold_of, folds, gram_total - gram_folds, rhs_total - rhs_folds,
+                baseline_weights, binary
+            )
+
+    return result
+
+
+def _nonnegative_least_squares(gram, rhs, yy):
+    """
+    Точное решение min |Z θ - y|² при θ[1:] >= 0 для пакета систем
+
+    Args:
+        gram (numpy.ndarray): Матрицы Z^T Z (системы × 5 × 5)
+        rhs (numpy.ndarray): Векторы Z^T y (системы × 5)
+        yy (numpy.ndarray): Суммы квадратов y
+
+    Returns:
+        numpy.ndarray: Коэффициенты (системы × 5): свободный член и коэффициенты оценок
+    """
+    n_systems, size = rhs.shape
+    best_loss = np.full(n_systems, np.inf)
+    best = np.zeros((n_systems, size))
+    ridge = _RIDGE * np.trace(gram, axis1=1, axis2=2)
+
+    for subset in _SUBSETS:
+        index = np.array((0,) + tuple(i + 1 for i in subset))
+        sub_gram = gram[:, index[:, None], index[None, :]].copy()
+        sub_gram[:, np.arange(1, len(index)), np.arange(1, len(index))] += ridge[:, None]
+        sub_rhs = rhs[:, index]
+        theta = np.linalg.solve(sub_gram, sub_rhs[..., None])[..., 0]
+
+        # Ошибка через статистики: y^T y - 2 θ^T Z^T y + θ^T Z^T Z θ
+        loss = (yy - 2 * np.einsum('si,si->s', theta, sub_rhs) +
+                np.einsum('si,sij,sj->s', theta, gram[:, index[:, None], index[None, :]], theta))
+        feasible = (theta[:, 1:] >= 0).all(axis=1)
+        better = feasible & (loss < best_loss)
+
+        best_loss = np.where(better, loss, best_loss)
+        candidate = np.zeros((n_systems, size))
+        candidate[:, index] = theta
+        best[better] = candidate[better]
+
+    return best
+
+
+def _cross_validate(features, y, fold_of, folds, coefficients, binary):
+    """Качество на отложенных блоках: прогноз каждой строки - модель без ее блока"""
+    predictions = coefficients[fold_of, 0] + np.einsum('ni,ni->n', features, coefficients[fold_of, 1:])
+    # Рейтинг по весам блока (для AUC важен только порядок)
+    ratings = np.einsum('ni,ni->n', features, coefficients[fold_of, 1:])
+    return _fold_metrics(y, fold_of, folds, predictions, ratings, binary)
+
+
+def _cross_validate_fixed(features, y, fold_of, folds, gram, rhs, weights, binary):
+    """Качество фиксированных весов: калибровка a + b · рейтинг подбирается на обучающей части"""
+    ratings = features @ (weights / 100.0)
+    # Статистики для [1, рейтинг] получаются из статистик [1, оценки] линейным преобразованием
+    transform = np.zeros((len(weights) + 1, 2))
+    transform[0, 0] = 1.0
+    transform[1:, 1] = weights / 100.0
+    small_gram = transform.T @ gram @ transform
+    small_rhs = rhs @ transform
+    calibration = np.linalg.solve(
+        small_gram + _RIDGE * np.eye(2) * np.trace(small_gram, axis1=1, axis2=2)[:, None, None],
+        small_rhs[..., None]
+    )[..., 0]
+    predictions = calibration[fold_of, 0] + calibration[fold_of, 1] * ratings
+    return _fold_metrics(y, fold_of, folds, predictions, ratings, binary)
+
+
+def _fold_metrics(y, fold_of, folds, predictions, ratings, binary):
+    residual = np.bincount(fold_of, (y - predictions) ** 2, minlength=folds)
+    counts = np.bincount(fold_of, minlength=folds)
+    fold_mean = np.bincount(fold_of, y, minlength=folds) / counts
+    total = np.bincount(fold_of, (y - fold_mean[fold_of]) ** 2, minlength=folds)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(total > 0, 1 - residual / total, np.nan)
+
+    metrics = {
+        'folds': folds,
+        'r2': float(np.nanmean(r2)) if np.isfinite(r2).any() else None,
+        'r2_folds': [float(value) for value in r2]
+    }
+    if binary:
+        auc = _auc_by_fold(ratings, y, fold_of, folds)
+        metrics['auc'] = float(np.nanmean(auc)) if np.isfinite(auc).any() else None
+        metrics['auc_folds'] = [float(value) for value in auc]
+    return metrics
+
+
+def _auc_by_fold(ratings, labels, fold_of, folds):
+    """
+    ROC AUC для всех блоков за одну сортировку
+
+    Ранги считаются внутри блока (сортировка по блоку и рейтингу), равные
+    рейтинги получают средний ранг; AUC - статистика Манна-Уитни.
+    """
+    order = np.lexsort((ratings, fold_of))
+    sorted_fold = fold_of[order]
+    sorted_rating = ratings[order]
+
+    # Группы равных рейтингов внутри блока
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (sorted_fold[1:] != sorted_fold[:-1]) | (sorted_rating[1:] != sorted_rating[:-1])
+    group_id = np.cumsum(new_group) - 1
+    group_start = np.flatnonzero(new_group)
+    group_size = np.diff(np.append(group_start, len(order)))
+
+    fold_start = np.searchsorted(sorted_fold, np.arange(folds))
+    position = np.arange(len(order)) - fold_start[sorted_fold]
+    # Средний ранг группы (ранги с 1)
+    ranks = (position[group_start] + (group_size + 1) / 2.0)[group_id]
+
+    positives = labels[order] == 1
+    n_pos = np.bincount(sorted_fold, positives, minlength=folds)
+    n_neg = np.bincount(sorted_fold, minlength=folds) - n_pos
+    rank_sum = np.bincount(sorted_fold, np.where(positives, ranks, 0.0), minlength=folds)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(
+            (n_pos > 0) & (n_neg > 0),
+            (rank_sum - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg),
+            np.nan
+        )
+
+
+def _to_percent(weights):
+    """Целые проценты с суммой ровно 100 (метод наибольших остатков)"""
+    weights = np.asarray(weights, dtype=float)
+    weights = weights / weights.sum() * 100
+    floors = np.floor(weights).astype(int)
+    remainder = 100 - floors.sum()
+    order = np.argsort(-(weights - floors), kind='stable')
+    floors[order[:remainder]] += 1
+    return [int(value) for value in floors]
+
+
+def fit_weights_from_metrics(calculator, metrics, outcomes, **kwargs):
+    """
+    Подбор весов по исходным метрикам ниш
+
+    Оценки считаются с текущими порогами калькулятора; в качестве baseline
+    используются его текущие веса.
+
+    Args:
+        calculator (ProductRatingCalculator): Калькулятор
+        metrics (dict): Массивы demand_ratio, revenue, price_ad_ratio, organic_percent
+        outcomes (array-like): Исходы ниш
+        **kwargs: Параметры fit_weights
+
+    Returns:
+        dict: Результат fit_weights
+    """
+    scores = calculator.calculate_ratings_batch(*(metrics[column] for column in METRIC_COLUMNS), decimals=None)
+    kwargs.setdefault('baseline', calculator.weights)
+    return fit_weights(scores, outcomes, **kwargs)
+
+
+def weights_config(result):
+    """Конфигурация для сохранения: веса для update_weights и сведения о подборе"""
+    cv = result.get('cv') or {}
+    baseline = cv.get('baseline') or {}
+    return {
+        'weights': result['weights'],
+        'fitted': {
+            'niches': result['niches'],
+            'folds': cv.get('folds'),
+            'cv_auc': cv.get('auc'),
+            'cv_r2': cv.get('r2'),
+            'baseline_auc': baseline.get('auc'),
+            'baseline_r2': baseline.get('r2')
+        }
+    }
+
+
+def save_weights_config(result, path):
+    """Сохранить подобранные веса в JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(weights_config(result), f, ensure_ascii=False, indent=2)
+
+
+def load_weights_config(source):
+    """
+    Загрузить веса из JSON (конфигурация weights_config или просто словарь весов)
+
+    Args:
+        source: Путь к файлу или файловый объект
+
+    Returns:
+        dict: Веса для calculator.update_weights
+    """
+    if hasattr(source, 'read'):
+        content = source.read()
+        config = json.loads(content.decode('utf-8') if isinstance(content, bytes) else content)
+    else:
+        with open(source, encoding='utf-8') as f:
+            config = json.load(f)
+
+    weights = config.get('weights', config) if isinstance(config, dict) else None
+    if not isinstance(weights, dict) or not weights:
+        raise ValueError("В файле нет весов метрик")
+
+    unknown = set(weights) - set(WEIGHT_KEYS)
+    if unknown:
+        raise ValueError(f"Неизвестные веса: {', '.join(sorted(unknown))}")
+    for key, value in weights.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"Вес {key} должен быть неотрицательным числом")
+    return dict(weights)
+
+
+def main(argv=None):
+    import argparse
+
+    import pandas as pd
+
+    from .calculator import ProductRatingCalculator
+
+    parser = argparse.ArgumentParser(description="Подбор весов метрик по исходам прошлых ниш")
+    parser.add_argument('path', help="CSV со столбцами demand_ratio, revenue, price_ad_ratio, "
+                                     "organic_percent и столбцом исхода")
+    parser.add_argument('--outcome', default='outcome', help="Столбец исхода (1/0 или числовой)")
+    parser.add_argument('--folds', type=int, default=5, help="Блоков кросс-валидации")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Файл для сохранения весов (JSON)")
+    args = parser.parse_args(argv)
+
+    data = pd.read_csv(args.path, usecols=METRIC_COLUMNS + [args.outcome])
+    metrics = {column: data[column].to_numpy(dtype=float) for column in METRIC_COLUMNS}
+    result = fit_weights_from_metrics(
+        ProductRatingCalculator(), metrics, data[args.outcome].to_numpy(dtype=float),
+        folds=args.folds, seed=args.seed
+    )
+
+    config = weights_config(result)
+    if args.output:
+        save_weights_config(result, args.output)
+    print(json.dumps(config, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()